@@ -1,13 +1,213 @@
 import re
 import os
 import json
-from langchain.text_splitter import RecursiveCharacterTextSplitter
+from bisect import bisect_left, bisect_right
+from collections import deque
 from utils.log import setup_logger
+from utils.records import iter_records, write_records
 from langchain_core.runnables import RunnableLambda
 logger = setup_logger()
 TEMP_OUTPUT_DIR = "RAG_TENDOR/temp_uploads"
 
 
+DEFAULT_SEPARATORS = ["\n\n\n", "\n\n", "\n", ". ", "! ", "? ", "; ", ", ", " ", ""]
+
+
+class OffsetTextSplitter:
+    """
+    Recursive character splitter with the same separator hierarchy and
+    size/overlap rules as langchain's RecursiveCharacterTextSplitter
+    (keep_separator=True, strip_whitespace=True), but it works on (start, end)
+    spans of the original text and returns those spans. Nothing is copied while
+    splitting, and chunk offsets are exact instead of being re-searched.
+    """
+
+    def __init__(self, chunk_size=2500, chunk_overlap=400, separators=None, strip_whitespace=True):
+        if chunk_overlap > chunk_size:
+            raise ValueError(f"chunk_overlap ({chunk_overlap}) is larger than chunk_size ({chunk_size})")
+        self.chunk_size = chunk_size
+        self.chunk_overlap = chunk_overlap
+        self.strip_whitespace = strip_whitespace
+        separators = DEFAULT_SEPARATORS if separators is None else separators
+        self._separators = [(sep, re.compile(re.escape(sep)) if sep else None) for sep in separators]
+
+    def split_offsets(self, text, start=0, end=None):
+        """Returns the [(start, end), ...] spans of the chunks of text[start:end]."""
+        return self._split(text, start, len(text) if end is None else end, 0)
+
+    def split_text(self, text):
+        return [text[start:end] for start, end in self.split_offsets(text)]
+
+    def _split(self, text, start, end, first_separator):
+        # Pick the first separator present in the span; "" splits into characters
+        separator_idx, has_more = len(self._separators) - 1, False
+        for i in range(first_separator, len(self._separators)):
+            separator, pattern = self._separators[i]
+            if not separator:
+                separator_idx, has_more = i, False
+                break
+            if pattern.search(text, start, end):
+                separator_idx, has_more = i, i + 1 < len(self._separators)
+                break
+
+        pattern = self._separators[separator_idx][1]
+        if pattern is None:
+            splits = [(pos, pos + 1) for pos in range(start, end)]
+        else:
+            # Separators stay attached to the start of the following piece
+            cuts = [start] + [match.start() for match in pattern.finditer(text, start, end)] + [end]
+            splits = [(a, b) for a, b in zip(cuts, cuts[1:]) if b > a]
+
+        chunks = []
+        good_splits = []
+        for split_start, split_end in splits:
+            if split_end - split_start < self.chunk_size:
+                good_splits.append((split_start, split_end))
+                continue
+            if good_splits:
+                chunks.extend(self._merge(text, good_splits))
+                good_splits = []
+            if not has_more:
+                chunks.append((split_start, split_end))
+            else:
+                chunks.extend(self._split(text, split_start, split_end, separator_idx + 1))
+        if good_splits:
+            chunks.extend(self._merge(text, good_splits))
+        return chunks
+
+    def _merge(self, text, splits):
+        """Greedily merges contiguous pieces into chunks, carrying up to chunk_overlap chars over."""
+        chunks = []
+        current = deque()
+        total = 0
+        for split_start, split_end in splits:
+            length = split_end - split_start
+            if total + length > self.chunk_size and current:
+                self._emit(text, current[0][0], current[-1][1], chunks)
+                while total > self.chunk_overlap or (total + length > self.chunk_size and total > 0):
+                    first_start, first_end = current.popleft()
+                    total -= first_end - first_start
+            current.append((split_start, split_end))
+            total += length
+        if current:
+            self._emit(text, current[0][0], current[-1][1], chunks)
+        return chunks
+
+    def _emit(self, text, start, end, chunks):
+        if self.strip_whitespace:
+            while start < end and text[start].isspace():
+                start += 1
+            while end > start and text[end - 1].isspace():
+                end -= 1
+        if end > start:
+            chunks.append((start, end))
+
+
+class _PageLocator:
+    """
+    Maps a chunk's [start, end) char span in the joined text to a 1-based page
+    with binary search over the sorted page start offsets.
+    """
+
+    def __init__(self, page_start_offsets, page_end_offsets):
+        self.starts = page_start_offsets
+        # Page i owns its text plus the "\n\n" that follows it, i.e. up to the next page start
+        self.bounds = page_start_offsets[1:] + page_end_offsets[-1:]
+
+    def page_for(self, start, end):
+        # Page containing the chunk start (defaults to page 1)
+        page_num = 1
+        first = bisect_right(self.starts, start) - 1
+        if first >= 0 and start < self.bounds[first]:
+            page_num = first + 1
+
+        # Dominant page: only pages starting before `end` from `first` on can overlap
+        best_overlap = None
+        for page_idx in range(max(first, 0), bisect_left(self.starts, end)):
+            page_start, page_end = self.starts[page_idx], self.bounds[page_idx]
+            if not (end <= page_start or start >= page_end):
+                overlap = min(end, page_end) - max(start, page_start)
+                if best_overlap is None or overlap > best_overlap:
+                    best_overlap = overlap
+                    page_num = page_idx + 1
+        return page_num
+
+
+class _SectionIndex:
+    """
+    Interval lookup of the index section for a page. Sections are sorted by
+    start; a running max of their end pages makes the first section covering a
+    page a binary search too. Results are memoized per page.
+    """
+
+    def __init__(self, index_sections):
+        self.sections = index_sections
+        self.starts = [section["start"] for section in index_sections]
+        self.max_ends = []
+        for section in index_sections:
+            self.max_ends.append(max(section["end"], self.max_ends[-1]) if self.max_ends else section["end"])
+        self._cache = {}
+
+    def describe(self, page_num):
+        if page_num not in self._cache:
+            self._cache[page_num] = self._lookup(page_num)
+        return self._cache[page_num]
+
+    def _lookup(self, page_num):
+        sections = self.sections
+        if not sections:
+            return ""
+
+        section_desc = ""
+        applicable = bisect_right(self.starts, page_num)  # sections[:applicable] start on/before page
+
+        # Method 1: Direct range match (first section in order whose range covers the page)
+        covering = bisect_left(self.max_ends, page_num, 0, applicable)
+        if covering < applicable:
+            section_desc = sections[covering]["description"]
+
+        # Method 2: Find the most recent applicable section (first one with the latest start)
+        if not section_desc and applicable:
+            latest = bisect_left(self.starts, self.starts[applicable - 1])
+            section_desc = sections[latest]["description"]
+
+        # Method 3: If page is before all sections, use first section
+        if not section_desc and page_num < sections[0]["start"]:
+            section_desc = sections[0]["description"]
+
+        # Method 4: If page is after all sections, use last section
+        if not section_desc and page_num > sections[-1]["end"]:
+            section_desc = sections[-1]["description"]
+
+        return section_desc
+
+
+def _detect_title(first_page_text, title):
+    """Tender/RFP heading on the first page, else its first non-empty line, else `title`."""
+    title_match = re.search(r"(?i)(request for proposal.*|tender.*|rfp.*|bid document.*)", first_page_text)
+    if title_match:
+        return title_match.group(0).strip()
+    lines = [l.strip() for l in first_page_text.splitlines() if l.strip()]
+    return lines[0] if lines else title
+
+
+def _chunk_record(chunk_index, chunk_text, char_start, page_num, section_desc, source_name, doc_date, title):
+    return {
+        "id": f"chunk_{chunk_index}",
+        "text": chunk_text,
+        "metadata": {
+            "source": source_name,
+            "doc_date": doc_date,
+            "title": title,
+            "chunk_index": chunk_index,
+            "page_number": page_num,
+            "char_start": char_start,
+            "char_end": char_start + len(chunk_text),
+            "description": section_desc
+        }
+    }
+
+
 def chunk_pages_to_embedding_ready_format(
     pages, 
     source_name="Unknown", 
@@ -15,23 +215,26 @@ def chunk_pages_to_embedding_ready_format(
     title="Untitled", 
     index_data=None,
     chunk_size=2500,
-    chunk_overlap=400
+    chunk_overlap=400,
+    page_offset=0,
+    char_offset=0,
+    chunk_index_start=0,
+    detect_title=True
 ):
     """
     ENHANCED: More accurate chunk-to-page mapping and section assignment
+
+    page_offset / char_offset / chunk_index_start let a slice of a document be
+    re-chunked with page numbers, char offsets and chunk indices that line up
+    with the full document (used by incremental re-ingestion).
     """
     # Validate input
     if not pages:
         logger.error("No pages provided")
         return []
     
-    first_page_text = pages[0]["text"] if pages else ""
-    title_match = re.search(r"(?i)(request for proposal.*|tender.*|rfp.*|bid document.*)", first_page_text)
-    if title_match:
-        dynamic_title = title_match.group(0).strip()
-    else:
-        lines = [l.strip() for l in first_page_text.splitlines() if l.strip()]
-        dynamic_title = lines[0] if lines else title
+    first_page_text = pages[0]["text"] if pages and detect_title else ""
+    dynamic_title = _detect_title(first_page_text, title)
 
     # Build page mapping with actual character positions
     page_start_offsets = []
@@ -53,15 +256,15 @@ def chunk_pages_to_embedding_ready_format(
 
     all_text = "\n\n".join(page_texts)
     
-    # Enhanced text splitter with better separators
-    splitter = RecursiveCharacterTextSplitter(
+    # Enhanced text splitter with better separators; yields exact char spans
+    splitter = OffsetTextSplitter(
         chunk_size=chunk_size,
         chunk_overlap=chunk_overlap,
-        separators=["\n\n\n", "\n\n", "\n", ". ", "! ", "? ", "; ", ", ", " ", ""]
+        separators=DEFAULT_SEPARATORS
     )
     
-    # Split text and get documents with metadata
-    text_chunks = splitter.split_text(all_text)
+    # Split text into (start, end) offsets of the full text
+    chunk_spans = splitter.split_offsets(all_text)
     
     # Prepare index sections
     index_sections = []
@@ -83,85 +286,25 @@ def chunk_pages_to_embedding_ready_format(
         else:
             visible_page_offset = visible_start - 1
 
+    page_locator = _PageLocator(page_start_offsets, page_end_offsets)
+    section_index = _SectionIndex(index_sections)
+
     chunk_doc = []
-    current_position = 0
     
-    for i, chunk_text in enumerate(text_chunks):
-        # Find the actual position of this chunk in the full text
-        chunk_start_pos = all_text.find(chunk_text, current_position)
-        if chunk_start_pos == -1:
-            # If exact match fails, use approximate position
-            chunk_start_pos = current_position
-        
-        # Update current position for next iteration
-        current_position = chunk_start_pos + len(chunk_text)
-        
-        # Find which page this chunk belongs to
-        chunk_page_num = 1  # Default to page 1
-        for page_idx in range(len(page_start_offsets)):
-            if (page_start_offsets[page_idx] <= chunk_start_pos < 
-                (page_end_offsets[page_idx] + (2 if page_idx < len(pages) - 1 else 0))):
-                chunk_page_num = page_idx + 1  # Convert to 1-based
-                break
-        
-        # Alternative method: if chunk spans multiple pages, find the dominant page
-        chunk_end_pos = chunk_start_pos + len(chunk_text)
-        pages_spanned = []
-        for page_idx in range(len(page_start_offsets)):
-            page_start = page_start_offsets[page_idx]
-            page_end = page_end_offsets[page_idx] + (2 if page_idx < len(pages) - 1 else 0)
-            
-            # Check if chunk overlaps with this page
-            if not (chunk_end_pos <= page_start or chunk_start_pos >= page_end):
-                overlap_start = max(chunk_start_pos, page_start)
-                overlap_end = min(chunk_end_pos, page_end)
-                overlap_length = overlap_end - overlap_start
-                pages_spanned.append((page_idx + 1, overlap_length))
+    for i, (chunk_start_pos, chunk_end_pos) in enumerate(chunk_spans):
+        chunk_text = all_text[chunk_start_pos:chunk_end_pos]
         
-        # Use the page with the most overlap
-        if pages_spanned:
-            chunk_page_num = max(pages_spanned, key=lambda x: x[1])[0]
+        # Find which page this chunk belongs to (dominant page when it spans several)
+        chunk_page_num = page_locator.page_for(chunk_start_pos, chunk_end_pos)
+        chunk_page_num += page_offset
 
         # Find appropriate section description
-        section_desc = ""
-        if index_sections:
-            # Method 1: Direct range match
-            for section in index_sections:
-                if section["start"] <= chunk_page_num <= section["end"]:
-                    section_desc = section["description"]
-                    break
-            
-            # Method 2: Find the most recent applicable section
-            if not section_desc:
-                applicable = [s for s in index_sections if s["start"] <= chunk_page_num]
-                if applicable:
-                    # If there are multiple applicable sections, prefer the one with closer start page
-                    section_desc = max(applicable, key=lambda x: x["start"])["description"]
-            
-            # Method 3: If page is before all sections, use first section
-            if not section_desc and index_sections and chunk_page_num < index_sections[0]["start"]:
-                section_desc = index_sections[0]["description"]
-            
-            # Method 4: If page is after all sections, use last section  
-            if not section_desc and index_sections and chunk_page_num > index_sections[-1]["end"]:
-                section_desc = index_sections[-1]["description"]
-
-        base_metadata = {
-            "source": source_name,
-            "doc_date": doc_date,
-            "title": dynamic_title,
-            "chunk_index": i,
-            "page_number": chunk_page_num,
-            "char_start": chunk_start_pos,
-            "char_end": chunk_start_pos + len(chunk_text),
-            "description": section_desc
-        }
-        
-        chunk_doc.append({
-            "id": f"chunk_{i}",
-            "text": chunk_text,
-            "metadata": base_metadata
-        })
+        section_desc = section_index.describe(chunk_page_num)
+
+        chunk_doc.append(_chunk_record(
+            chunk_index_start + i, chunk_text, char_offset + chunk_start_pos, chunk_page_num,
+            section_desc, source_name, doc_date, dynamic_title
+        ))
         
         # Only log the first chunk for sanity check
         if i == 0:
@@ -174,6 +317,107 @@ def chunk_pages_to_embedding_ready_format(
     
     return chunk_doc
 
+def iter_chunks_from_pages(
+    pages,
+    source_name="Unknown",
+    doc_date="Unknown",
+    title="Untitled",
+    index_data=None,
+    chunk_size=2500,
+    chunk_overlap=400,
+    window_chars=None
+):
+    """
+    Streaming variant of chunk_pages_to_embedding_ready_format: consumes `pages`
+    lazily (any iterable, e.g. iter_records or iter_pdf_pages) and yields chunk
+    dicts with the same metadata as soon as they are final.
+
+    Only a sliding window of text is held. When the window passes
+    `window_chars` it is split, chunks ending at least chunk_size before the
+    window end are emitted, and the window restarts at the first chunk not yet
+    emitted. That chunk already overlaps the last emitted one, so overlap is
+    kept across window boundaries. Offsets, pages and sections are exact; chunk
+    boundaries near a window edge can differ slightly from a one-shot split.
+    """
+    window_chars = window_chars or max(chunk_size * 20, 50000)
+    splitter = OffsetTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=DEFAULT_SEPARATORS)
+    section_index = _SectionIndex(sorted(index_data or [], key=lambda x: x["start"]))
+
+    window_parts = []       # page texts (and separators) in the window
+    window_len = 0
+    window_base = 0         # global char offset of the window start
+    window_pages = deque()  # (page_idx, global_start, global_end) of pages touching the window
+    position = 0            # global length of the text consumed so far
+    dynamic_title = None
+    chunk_index = 0
+
+    def flush(final):
+        nonlocal window_parts, window_len, window_base, chunk_index
+        text = "".join(window_parts)
+        spans = splitter.split_offsets(text)
+        first_page_idx = window_pages[0][0] if window_pages else 0
+        locator = _PageLocator(
+            [start - window_base for _, start, _ in window_pages],
+            [end - window_base for _, _, end in window_pages]
+        )
+
+        keep_from = None
+        for start, end in spans:
+            if not final and end > len(text) - chunk_size:
+                keep_from = start
+                break
+            page_num = first_page_idx + locator.page_for(start, end)
+            yield _chunk_record(
+                chunk_index, text[start:end], window_base + start, page_num,
+                section_index.describe(page_num), source_name, doc_date, dynamic_title
+            )
+            chunk_index += 1
+
+        if final:
+            return
+        # Restart the window at the first chunk that was not emitted
+        if keep_from is None:
+            keep_from = spans[-1][1] if spans else 0
+        window_parts = [text[keep_from:]]
+        window_len = len(text) - keep_from
+        window_base += keep_from
+        while window_pages and window_pages[0][2] + 2 <= window_base:
+            window_pages.popleft()
+
+    for page_idx, page in enumerate(pages):
+        page_text = page["text"]
+        if dynamic_title is None:
+            dynamic_title = _detect_title(page_text, title)
+        if page_idx > 0:
+            window_parts.append("\n\n")
+            window_len += 2
+            position += 2
+
+        window_parts.append(page_text)
+        window_pages.append((page_idx, position, position + len(page_text)))
+        window_len += len(page_text)
+        position += len(page_text)
+
+        if window_len >= window_chars:
+            yield from flush(final=False)
+
+    if window_pages or window_len:
+        yield from flush(final=True)
+    logger.info(f"Total chunks streamed: {chunk_index}")
+
+
+def _guarded_chunk_stream(chunks):
+    """
+    Lazy chunks run inside the embed stage; errors raised while producing them
+    are logged and re-raised here as chunking errors.
+    """
+    try:
+        yield from chunks
+    except Exception as e:
+        logger.exception("❌ Failed in chunking runnable (chunk stream)")
+        raise RuntimeError(f"[chunking.py] ❌ Chunk stream failed: {e}") from e
+
+
 # -------------------------------
 # Runnable Wrapper
 # -------------------------------
@@ -185,26 +429,30 @@ def _chunking_runnable_impl(inputs):
         raw_json_path = inputs.get("raw_json_path")
         index_json_path = inputs.get("index_json_path")
 
-        print(f"[DEBUG] Input keys in chunking: {list(inputs.keys())}")
+        # Prefer the pages/index handed over in memory by the previous stages
+        pages = inputs.get("pages")
+        index_data = inputs.get("index_entries")
 
-        # Ensure both required paths are present
-        if not raw_json_path or not index_json_path:
-            raise ValueError(f"[chunking.py] ❌ Missing 'raw_json_path' or 'index_json_path' in inputs: {list(inputs.keys())}")
+        streaming = inputs.get("chunking_mode") == "stream"
 
-        # Load the full document JSON
-        with open(raw_json_path, "r", encoding="utf-8") as f:
-            pages = json.load(f)
+        if pages is None:
+            if not raw_json_path:
+                raise ValueError(f"[chunking.py] ❌ Missing 'pages' or 'raw_json_path' in inputs: {list(inputs.keys())}")
+            # One-shot chunking joins the whole document, so it is loaded in full (peak memory grows
+            # with document size); streaming reads it page by page and holds one window at a time
+            pages = iter_records(raw_json_path) if streaming else list(iter_records(raw_json_path))
 
         # Load index if it exists
-        index_data = []
-        if os.path.exists(index_json_path):
-            with open(index_json_path, "r", encoding="utf-8") as f:
-                index_data = json.load(f)
-        else:
-            logger.warning(f"[chunking.py] ⚠️ Index file not found at {index_json_path}. Proceeding without index.")
+        if index_data is None:
+            index_data = []
+            if index_json_path and os.path.exists(index_json_path):
+                index_data = list(iter_records(index_json_path))
+            else:
+                logger.warning(f"[chunking.py] ⚠️ Index file not found at {index_json_path}. Proceeding without index.")
 
         # Perform chunking
-        chunks = chunk_pages_to_embedding_ready_format(
+        chunk_fn = iter_chunks_from_pages if streaming else chunk_pages_to_embedding_ready_format
+        chunks = chunk_fn(
             pages,
             source_name=inputs.get("source_name", "Unknown"),
             doc_date=inputs.get("doc_date", "Unknown"),
@@ -214,7 +462,14 @@ def _chunking_runnable_impl(inputs):
             chunk_overlap=inputs.get("chunk_overlap", 400)
         )
 
-        logger.info(f"✅ Chunking complete. Total chunks: {len(chunks)}")
+        if streaming:
+            # The embed stage consumes the iterator (embed_chunk_stream) as chunks are produced.
+            # Extraction has finished by now: the overlap is between reading the page
+            # artifact, chunking and embedding, not PDF extraction
+            chunks = _guarded_chunk_stream(chunks)
+            logger.info("✅ Chunk stream handed to the embed stage")
+        else:
+            logger.info(f"✅ Chunking complete. Total chunks: {len(chunks)}")
 
         return {
             **inputs,  # ✅ Carry forward everything to next stage
@@ -273,12 +528,10 @@ if __name__ == "__main__":
     runnable = chunking_runnable()
     output = runnable.invoke(inputs)
 
-    out_file = os.path.splitext(os.path.basename(basic_json_path))[0] + "_chunks.json"
+    out_file = os.path.splitext(os.path.basename(basic_json_path))[0] + "_chunks.jsonl"
     out_path = os.path.join(TEMP_OUTPUT_DIR, out_file)
-    os.makedirs(TEMP_OUTPUT_DIR, exist_ok=True)
 
-    with open(out_path, "w", encoding="utf-8") as out:
-        json.dump(output["chunks"], out, indent=2, ensure_ascii=False)
+    write_records(output["chunks"], out_path)
 
     logger.info(f"💾 Chunks saved to: {out_path}")
     print(f"✅ All done! Output written to: {out_path}")
\ No newline at end of file
@@ -0,0 +1,148 @@
+from qdrant_client.models import (
+    VectorParams, Distance, HnswConfigDiff, OptimizersConfigDiff, ScalarQuantization, ScalarQuantizationConfig,
+    ScalarType, SearchParams, QuantizationSearchParams, VectorParamsDiff, CollectionParamsDiff, Disabled
+)
+from utils.log import setup_logger
+
+logger = setup_logger("collection_profiles_logger")
+
+DEFAULT_COLLECTION_PROFILE = "default"
+# Indexing threshold restored after a bulk load (the value Qdrant's bulk upload guide re-enables with)
+INDEXING_THRESHOLD_KB = 20000
+# Qdrant's HNSW defaults, restored when a collection moves to a profile that does not set them
+DEFAULT_HNSW = {"m": 16, "ef_construct": 100, "on_disk": False}
+
+# Named collection tunings, applied when a collection is created (profile_updates moves existing ones):
+#   hnsw          - HNSW graph degree `m` / `ef_construct` (and `on_disk` for the graph)
+#   quantization  - int8 scalar quantization; `always_ram` keeps the quantized vectors in RAM
+#   on_disk_vectors / on_disk_payload - keep the full-precision vectors / chunk text on disk
+#   bulk_load     - indexing is switched off while points are uploaded and switched back on after
+#   search        - query-time `hnsw_ef` and rescoring of quantized candidates with the original
+#                   vectors, fetching `oversampling` x limit candidates first
+COLLECTION_PROFILES = {
+    "default": {},
+    "low_latency": {
+        "hnsw": {"m": 32, "ef_construct": 256},
+        "quantization": {"always_ram": True},
+        "on_disk_payload": False,
+        "search": {"hnsw_ef": 128, "rescore": True, "oversampling": 2.0},
+    },
+    "low_memory": {
+        "hnsw": {"m": 16, "ef_construct": 100, "on_disk": True},
+        "quantization": {"always_ram": True},
+        "on_disk_vectors": True,
+        "on_disk_payload": True,
+        "search": {"hnsw_ef": 64, "rescore": True, "oversampling": 1.5},
+    },
+    "bulk_ingest": {
+        "hnsw": {"m": 16, "ef_construct": 100},
+        "quantization": {"always_ram": True},
+        "on_disk_payload": True,
+        "bulk_load": True,
+        "search": {"rescore": True, "oversampling": 2.0},
+    },
+}
+
+
+def get_profile(name):
+    profile = COLLECTION_PROFILES.get(name or DEFAULT_COLLECTION_PROFILE)
+    if profile is None:
+        raise ValueError(f"Unknown collection profile '{name}' (expected one of {sorted(COLLECTION_PROFILES)})")
+    return profile
+
+
+def collection_config(name, vector_size, distance=Distance.COSINE):
+    """
+    Keyword arguments of VectorStore.create_collection for profile `name`:
+    vectors_config plus the HNSW, quantization, optimizer and on-disk payload settings it sets.
+    """
+    profile = get_profile(name)
+    config = {
+        "vectors_config": VectorParams(size=vector_size, distance=distance, on_disk=profile.get("on_disk_vectors"))
+    }
+    if "hnsw" in profile:
+        config["hnsw_config"] = HnswConfigDiff(**profile["hnsw"])
+    if "quantization" in profile:
+        config["quantization_config"] = _quantization(profile)
+    if "on_disk_payload" in profile:
+        config["on_disk_payload"] = profile["on_disk_payload"]
+    if profile.get("bulk_load"):
+        # Created with indexing off; the first upload switches it back on
+        config["optimizers_config"] = OptimizersConfigDiff(indexing_threshold=0)
+    return config
+
+
+def _quantization(profile):
+    return ScalarQuantization(
+        scalar=ScalarQuantizationConfig(type=ScalarType.INT8, quantile=0.99, **profile["quantization"])
+    )
+
+
+def profile_updates(name, config):
+    """
+    update_collection keyword arguments that bring an existing collection (its
+    qdrant CollectionConfig) to profile `name`: HNSW params, quantization and
+    on-disk vectors/payload. Empty when the collection already matches.
+    """
+    profile = get_profile(name)
+    updates = {}
+
+    hnsw = {**DEFAULT_HNSW, **profile.get("hnsw", {})}
+    current = config.hnsw_config
+    if current.m != hnsw["m"] or current.ef_construct != hnsw["ef_construct"] or bool(current.on_disk) != hnsw["on_disk"]:
+        updates["hnsw_config"] = HnswConfigDiff(**hnsw)
+
+    quantization = config.quantization_config
+    if "quantization" in profile:
+        scalar = getattr(quantization, "scalar", None)
+        if scalar is None or bool(scalar.always_ram) != bool(profile["quantization"].get("always_ram")):
+            updates["quantization_config"] = _quantization(profile)
+    elif quantization is not None:
+        updates["quantization_config"] = Disabled.DISABLED
+
+    on_disk_vectors = bool(profile.get("on_disk_vectors"))
+    if bool(getattr(config.params.vectors, "on_disk", None)) != on_disk_vectors:
+        # The unnamed default vector is addressed as ""
+        updates["vectors_config"] = {"": VectorParamsDiff(on_disk=on_disk_vectors)}
+    if "on_disk_payload" in profile and bool(config.params.on_disk_payload) != profile["on_disk_payload"]:
+        updates["collection_params"] = CollectionParamsDiff(on_disk_payload=profile["on_disk_payload"])
+    return updates
+
+
+def search_params(name):
+    """SearchParams for queries against a collection created with profile `name`, or None for the defaults."""
+    search = get_profile(name).get("search")
+    if not search:
+        return None
+    return SearchParams(
+        hnsw_ef=search.get("hnsw_ef"),
+        quantization=QuantizationSearchParams(rescore=search.get("rescore", True), oversampling=search.get("oversampling")),
+    )
+
+
+def matching_profile(config):
+    """Name of the profile an existing collection (its qdrant CollectionConfig) is tuned to, or None."""
+    for name in COLLECTION_PROFILES:
+        if not profile_updates(name, config):
+            return name
+    return None
+
+
+def config_search_params(config):
+    """
+    SearchParams for a collection from its actual CollectionConfig: those of
+    the profile it matches, else rescoring when it is quantized, else None.
+    """
+    name = matching_profile(config)
+    if name is not None:
+        return search_params(name)
+    if config.quantization_config is not None:
+        return SearchParams(quantization=QuantizationSearchParams(rescore=True))
+    return None
+
+
+def set_indexing(store, collection_name, enabled):
+    """Switches HNSW indexing of a collection off (bulk load) or back on."""
+    threshold = INDEXING_THRESHOLD_KB if enabled else 0
+    store.update_collection(collection_name, optimizers_config=OptimizersConfigDiff(indexing_threshold=threshold))
+    logger.info(f"{'🏗️ Enabled' if enabled else '⏸️ Disabled'} indexing of '{collection_name}'")
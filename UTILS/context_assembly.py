@@ -0,0 +1,127 @@
+from utils.log import setup_logger
+
+logger = setup_logger("context_assembly_logger")
+
+# Chunks whose offsets are at most this many characters apart (dropped
+# whitespace/page separators between splitter chunks) count as adjacent
+ADJACENT_GAP = 4
+
+
+def _hit_fields(hit):
+    """(text, metadata, score) of a ScoredPoint/Record or a {"text", "metadata"} dict."""
+    if hasattr(hit, "payload"):
+        payload = hit.payload or {}
+        return payload.get("text", ""), payload.get("metadata", {}), getattr(hit, "score", None)
+    return hit.get("text", ""), hit.get("metadata", {}), hit.get("score")
+
+
+def _has_offsets(metadata):
+    return isinstance(metadata.get("char_start"), int) and isinstance(metadata.get("char_end"), int)
+
+
+def _label(values):
+    values = sorted(set(v for v in values if v is not None), key=lambda v: (not isinstance(v, int), v))
+    if not values:
+        return None
+    return values[0] if len(values) == 1 else f"{values[0]}-{values[-1]}"
+
+
+def _span(members):
+    """One context dict from hits sorted by char_start whose texts overlap or touch."""
+    text, metadata, _ = members[0]
+    parts, end = [text], metadata["char_end"]
+    for member_text, member_metadata, _ in members[1:]:
+        start = member_metadata["char_start"]
+        if start < end:
+            # Overlapping neighbour: keep only the part past what is already in the span
+            member_text = member_text[end - start:]
+        elif start > end:
+            parts.append("\n")
+        parts.append(member_text)
+        end = max(end, member_metadata["char_end"])
+
+    scores = [score for _, _, score in members if score is not None]
+    duplicate_pages = [p for _, m, _ in members for p in m.get("duplicate_pages", [])]
+    merged = {
+        **metadata,
+        "chunk_index": _label(m.get("chunk_index") for _, m, _ in members),
+        "page_number": _label(m.get("page_number") for _, m, _ in members),
+        "chunk_indices": [m.get("chunk_index") for _, m, _ in members],
+        "char_start": metadata["char_start"],
+        "char_end": end,
+    }
+    if duplicate_pages:
+        merged["duplicate_pages"] = sorted(set(duplicate_pages))
+    return {"text": "".join(parts), "metadata": merged, "score": max(scores) if scores else None}
+
+
+def assemble_context(hits, neighbours=()):
+    """
+    Merges retrieved chunks whose char offsets overlap or touch (same source)
+    into contiguous spans, so text shared by overlapping chunks appears once
+    and a clause cut at a chunk boundary is whole again. `neighbours` are
+    extra chunks (see expand_neighbours) that are only used when they join a
+    span of a retrieved hit. Spans keep the order of their best-ranked hit and
+    are returned as {"text", "metadata", "score"} dicts for build_prompt;
+    merged spans carry chunk/page ranges such as "12-13" as their citation labels.
+    """
+    ranked = [_hit_fields(hit) for hit in hits]
+    extra = [_hit_fields(hit) for hit in neighbours]
+
+    by_source, spans = {}, []
+    for rank, (text, metadata, score) in enumerate(ranked):
+        if _has_offsets(metadata):
+            by_source.setdefault(metadata.get("source"), []).append((rank, (text, metadata, score)))
+        else:
+            spans.append((rank, {"text": text, "metadata": metadata, "score": score}))
+    for text, metadata, score in extra:
+        if _has_offsets(metadata) and metadata.get("source") in by_source:
+            by_source[metadata["source"]].append((None, (text, metadata, None)))
+
+    for members in by_source.values():
+        seen, unique = set(), []
+        for rank, member in sorted(members, key=lambda m: (m[1][1]["char_start"], m[0] is None, m[0] or 0)):
+            key = (member[1]["char_start"], member[1]["char_end"])
+            if key not in seen:
+                seen.add(key)
+                unique.append((rank, member))
+
+        group = [unique[0]]
+        for rank, member in unique[1:]:
+            group_end = max(m[1]["char_end"] for _, m in group)
+            if member[1]["char_start"] <= group_end + ADJACENT_GAP:
+                group.append((rank, member))
+                continue
+            spans.extend(_finish(group))
+            group = [(rank, member)]
+        spans.extend(_finish(group))
+
+    spans.sort(key=lambda span: span[0])
+    return [span for _, span in spans]
+
+
+def _finish(group):
+    """A finished group becomes a span if it holds at least one retrieved hit."""
+    ranks = [rank for rank, _ in group if rank is not None]
+    if not ranks:
+        return []
+    return [(min(ranks), _span([member for _, member in group]))]
+
+
+def neighbour_keys(hits):
+    """(source, chunk_index) of the chunks right before and after every hit."""
+    keys = set()
+    for hit in hits:
+        _, metadata, _ = _hit_fields(hit)
+        index = metadata.get("chunk_index")
+        if isinstance(index, int):
+            keys.update({(metadata.get("source"), index - 1), (metadata.get("source"), index + 1)})
+    present = {(_hit_fields(hit)[1].get("source"), _hit_fields(hit)[1].get("chunk_index")) for hit in hits}
+    return sorted(keys - present, key=str)
+
+
+def context_stats(hits, spans):
+    """Characters handed to the prompt before and after assembly."""
+    before = sum(len(_hit_fields(hit)[0]) for hit in hits)
+    after = sum(len(span["text"]) for span in spans)
+    return {"hits": len(hits), "spans": len(spans), "chars_before": before, "chars_after": after}
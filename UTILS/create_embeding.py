@@ -1,54 +1,221 @@
-from sentence_transformers import SentenceTransformer
+import threading
+import numpy as np
 from langchain_core.runnables import RunnableLambda
+from utils.model_registry import get_model, get_embedder, embedder_id, DEFAULT_EMBEDDING_MODEL
+from utils.embedding_cache import encode_with_cache
+from utils.embed_pool import use_embed_pool
+from utils.query_cache import embed_query
+from utils.log import setup_logger
+
+logger = setup_logger("embedding_logger")
+
+# Batching defaults: at most DEFAULT_BATCH_SIZE texts per batch and at most
+# DEFAULT_TOKEN_BUDGET tokens once every text is padded to the longest one
+DEFAULT_BATCH_SIZE = 64
+DEFAULT_TOKEN_BUDGET = 8192
+# Chunks taken from a chunk stream per embedding call (length-bucketed within the call)
+STREAM_BATCH_SIZE = 256
+
+
+def _token_lengths(model, texts):
+    """Tokens per text as the model will see them (truncated to max_seq_length)."""
+    max_len = getattr(model, "max_seq_length", None) or 512
+    try:
+        ids = model.tokenizer(texts, add_special_tokens=True, truncation=False)["input_ids"]
+        return [min(len(i), max_len) for i in ids]
+    except Exception:
+        # ~4 characters per token for English text
+        return [min(len(text) // 4 + 2, max_len) for text in texts]
+
+
+def length_bucketed_batches(lengths, batch_size=DEFAULT_BATCH_SIZE, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Groups text indices into batches of similar length, longest first, so little
+    compute goes to padding. A batch closes when it holds `batch_size` texts or
+    when one more text would push (texts x longest length) past `token_budget`.
+    """
+    order = sorted(range(len(lengths)), key=lambda i: lengths[i], reverse=True)
+    batches, batch, longest = [], [], 0
+    for i in order:
+        longest_if_added = max(longest, lengths[i])
+        if batch and (len(batch) == batch_size or (len(batch) + 1) * longest_if_added > token_budget):
+            batches.append(batch)
+            batch, longest_if_added = [], lengths[i]
+        batch.append(i)
+        longest = longest_if_added
+    if batch:
+        batches.append(batch)
+    return batches
+
+
+_torch_threads = None
+_threads_lock = threading.Lock()
+
+
+def set_torch_threads(threads):
+    """
+    Sets the torch intra-op thread count of this process. torch's setting is
+    process-wide, so it is applied once per value (at pipeline or pool-worker
+    start), not per encode call.
+    """
+    global _torch_threads
+    if not threads:
+        return
+    with _threads_lock:
+        if _torch_threads == int(threads):
+            return
+        try:
+            import torch
+        except ImportError:
+            return
+        torch.set_num_threads(int(threads))
+        _torch_threads = int(threads)
+    logger.info(f"🧵 torch uses {threads} threads")
+
+
+def encode_bucketed(model, texts, batch_size=DEFAULT_BATCH_SIZE, token_budget=DEFAULT_TOKEN_BUDGET):
+    """
+    Encodes `texts` in length-bucketed batches and returns the vectors in the
+    original order.
+    """
+    if not texts:
+        return np.zeros((0, model.get_sentence_embedding_dimension()), dtype=np.float32)
+
+    embeddings = None
+    for batch in length_bucketed_batches(_token_lengths(model, texts), batch_size, token_budget):
+        vectors = model.encode(
+            [texts[i] for i in batch], batch_size=len(batch), show_progress_bar=False, convert_to_numpy=True
+        )
+        if embeddings is None:
+            embeddings = np.empty((len(texts), vectors.shape[1]), dtype=vectors.dtype)
+        embeddings[batch] = vectors
+    return embeddings
 
-# 🔁 Keep the model loaded globally to avoid reloading every time
-_model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
 
 def embed_text(chunks, model=None):
     """Generates embeddings for a list of text chunks."""
-    model = model or _model
+    model = model or get_model()
     texts = [chunk["text"] for chunk in chunks]
     
     try:
-        embeddings = model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
+        embeddings = encode_bucketed(model, texts)
         return embeddings
     except Exception as e:
-        print(f"[❌] Error in embedding text: {e}")
+        logger.error(f"❌ Error in embedding text: {e}")
         return None
 
 def embed_text_chain_fn(inputs):
-    model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
+    model_name = inputs.get("embedding_model") or DEFAULT_EMBEDDING_MODEL
+    backend = inputs.get("embed_backend", "torch")
 
     chunks = inputs.get("chunks")
-    if not chunks:
+    # chunking_mode="stream" hands over a chunk iterator instead of a list
+    streamed = chunks is not None and not isinstance(chunks, list)
+    if not streamed and not chunks:
         raise ValueError("[embed_text_chain_fn] ❌ No 'chunks' found in inputs")
 
-    texts = [chunk["text"] for chunk in chunks]
+    batch_size = inputs.get("embed_batch_size", DEFAULT_BATCH_SIZE)
+    token_budget = inputs.get("embed_token_budget", DEFAULT_TOKEN_BUDGET)
+
+    if (inputs.get("embed_workers") or 1) <= 1:
+        set_torch_threads(inputs.get("embed_threads"))
+
+    def encode_local(batch):
+        # Shared with the query path; loaded once per process by the registry
+        return encode_bucketed(get_embedder(model_name, backend), batch, batch_size=batch_size, token_budget=token_budget)
+
+    def encode(batch):
+        workers = inputs.get("embed_workers") or 1
+        if workers <= 1:
+            return encode_local(batch)
+        try:
+            with use_embed_pool(workers, model_name, inputs.get("embed_threads"), backend=backend) as pool:
+                return pool.encode(batch, batch_size=batch_size, token_budget=token_budget)
+        except Exception as e:
+            logger.warning(f"⚠️ Embedding pool failed, encoding in-process: {e}")
+            return encode_local(batch)
 
-    embeddings = model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
+    def embed(batch):
+        if inputs.get("embedding_cache", True):
+            # Standard clauses shared across tenders are only encoded the first time
+            return encode_with_cache(batch, embedder_id(model_name, backend), encode)
+        return encode(batch), None
+
+    if streamed:
+        # Batches are embedded as chunking produces them, while the page artifact is still being read and chunked
+        chunks, parts, cache_stats = [], [], None
+        for batch, (vectors, stats) in embed_chunk_stream(
+            inputs["chunks"], embed, batch_size=inputs.get("embed_stream_batch", STREAM_BATCH_SIZE)
+        ):
+            chunks.extend(batch)
+            parts.append(vectors)
+            cache_stats = _merge_cache_stats(cache_stats, stats)
+        if not chunks:
+            raise ValueError("[embed_text_chain_fn] ❌ The chunk stream was empty")
+        embeddings = np.concatenate(parts)
+        texts = [chunk["text"] for chunk in chunks]
+        logger.info(f"✅ Embedded {len(chunks)} streamed chunks in {len(parts)} batches")
+    else:
+        texts = [chunk["text"] for chunk in chunks]
+        embeddings, cache_stats = embed(texts)
     
-    # Create embedding entries with metadata
+    # Create embedding entries with metadata; vectors stay in the numpy array
+    # (row i belongs to embed_data[i]) and are only converted when persisted
     embed_data = [
         {
             "text": text,
-            "embedding": embedding.tolist(),  # convert numpy to list
             "metadata": chunk.get("metadata", {})
         }
-        for text, embedding, chunk in zip(texts, embeddings, chunks)
+        for text, chunk in zip(texts, chunks)
     ]
 
     return {
         **inputs,
+        "chunks": chunks,
         "embed_data": embed_data,  # This should be used by save_to_json
+        "embeddings": embeddings,
+        "embeddings_count": len(embed_data),
+        "embedding_cache_stats": cache_stats
     }
 
+def embed_chunk_stream(chunks, encode=None, batch_size=STREAM_BATCH_SIZE):
+    """
+    Embeds an iterable of chunk dicts batch by batch, yielding (batch, encode(texts)).
+    `encode` defaults to encode_bucketed with the default model. Fed from
+    iter_chunks_from_pages, embedding starts before the document is fully chunked.
+    """
+    if encode is None:
+        model = get_model()
+        encode = lambda texts: encode_bucketed(model, texts)
+    batch = []
+    for chunk in chunks:
+        batch.append(chunk)
+        if len(batch) == batch_size:
+            yield batch, encode([c["text"] for c in batch])
+            batch = []
+    if batch:
+        yield batch, encode([c["text"] for c in batch])
+
+
+def _merge_cache_stats(total, stats):
+    """Adds the embedding cache stats of one streamed batch to the running totals."""
+    if stats is None:
+        return total
+    if total is None:
+        return dict(stats)
+    merged = {key: total[key] + stats[key] for key in ("texts", "hits", "misses")}
+    merged["hit_rate"] = round(merged["hits"] / merged["texts"], 3) if merged["texts"] else 0.0
+    merged["time_saved_s"] = round(total["time_saved_s"] + stats["time_saved_s"], 3)
+    return merged
+
+
 def embed_query_chain_fn(inputs):
     query = inputs.get("query", "")
     if not query:
         raise ValueError("[embed_query_chain_fn] ❌ No 'query' found in inputs")
 
     try:
-        embedding = _model.encode(query, convert_to_numpy=True)
+        embedding = embed_query(query, inputs.get("embedding_model") or DEFAULT_EMBEDDING_MODEL, inputs.get("embed_backend", "torch"))
         inputs["query_vector"] = embedding.tolist()
         return inputs
     except Exception as e:
@@ -0,0 +1,192 @@
+import re
+import zlib
+import numpy as np
+from collections import Counter, defaultdict
+from langchain_core.runnables import RunnableLambda
+from utils.log import setup_logger
+from utils.records import iter_records
+
+logger = setup_logger("dedup_logger")
+
+# MinHash / LSH parameters: 64 permutations in 16 bands of 4 rows put the LSH
+# candidate threshold around Jaccard 0.5; candidates are then checked against
+# NEAR_DUPLICATE_THRESHOLD on the full signature.
+NUM_PERMUTATIONS = 64
+LSH_BANDS = 16
+SHINGLE_SIZE = 5
+NEAR_DUPLICATE_THRESHOLD = 0.85
+_MERSENNE_PRIME = (1 << 61) - 1
+_MAX_HASH = (1 << 32) - 1
+
+_rng = np.random.RandomState(42)
+_PERM_A = _rng.randint(1, 1 << 31, size=NUM_PERMUTATIONS).astype(np.uint64)
+_PERM_B = _rng.randint(0, 1 << 31, size=NUM_PERMUTATIONS).astype(np.uint64)
+
+
+# -------------------------------
+# Repeated lines across pages (headers, footers, disclaimers)
+# -------------------------------
+_PAGE_MARKER = re.compile(r"(page\s*)?#(\s*(of|/)\s*#)?|-\s*#\s*-")
+
+
+def _normalize_line(line):
+    """
+    Case/space-insensitive form of a line. Digits are only masked for page
+    markers ('Page 3 of 120', '- 7 -'), so numbered clauses never look repeated.
+    """
+    normalized = re.sub(r"\s+", " ", line.lower()).strip()
+    masked = re.sub(r"\d+", "#", normalized)
+    return masked if _PAGE_MARKER.fullmatch(masked) else normalized
+
+
+def find_boilerplate_lines(pages, min_page_fraction=0.5, min_pages=3):
+    """Normalized lines that occur on at least `min_page_fraction` of the pages (and `min_pages`)."""
+    counts = Counter()
+    for page in pages:
+        counts.update({_normalize_line(line) for line in page["text"].splitlines()} - {""})
+    threshold = max(min_pages, int(len(pages) * min_page_fraction))
+    return {line for line, count in counts.items() if count >= threshold}
+
+
+def strip_boilerplate(pages, min_page_fraction=0.5, min_pages=3):
+    """
+    Removes repeated lines from every page. Page numbering is untouched, and
+    each page records how many lines were dropped under "boilerplate_removed".
+    Returns (pages, stats).
+    """
+    boilerplate = find_boilerplate_lines(pages, min_page_fraction, min_pages)
+    if not boilerplate:
+        return pages, {"boilerplate_lines": 0, "boilerplate_lines_removed": 0}
+
+    stripped, removed_total = [], 0
+    for page in pages:
+        kept, removed = [], 0
+        for line in page["text"].splitlines():
+            if _normalize_line(line) in boilerplate:
+                removed += 1
+            else:
+                kept.append(line)
+        removed_total += removed
+        stripped.append({**page, "text": "\n".join(kept), "boilerplate_removed": removed})
+
+    logger.info(f"🧽 Stripped {removed_total} boilerplate lines ({len(boilerplate)} distinct) from {len(pages)} pages")
+    return stripped, {"boilerplate_lines": len(boilerplate), "boilerplate_lines_removed": removed_total}
+
+
+# -------------------------------
+# Near-duplicate chunks (MinHash + LSH)
+# -------------------------------
+def _shingle_hashes(text, size=SHINGLE_SIZE):
+    tokens = re.findall(r"\w+", text.lower())
+    if len(tokens) < size:
+        tokens = tokens or [""]
+        return np.array([zlib.crc32(" ".join(tokens).encode("utf-8"))], dtype=np.uint64)
+    return np.array(
+        [zlib.crc32(" ".join(tokens[i:i + size]).encode("utf-8")) for i in range(len(tokens) - size + 1)],
+        dtype=np.uint64
+    )
+
+
+def minhash_signature(text):
+    """NUM_PERMUTATIONS min-hashes of the word shingles of `text`."""
+    shingles = _shingle_hashes(text)
+    hashed = (np.outer(_PERM_A, shingles) + _PERM_B[:, None]) % _MERSENNE_PRIME & _MAX_HASH
+    return hashed.min(axis=1)
+
+
+def collapse_near_duplicates(chunks, threshold=NEAR_DUPLICATE_THRESHOLD):
+    """
+    Drops chunks whose MinHash similarity to an earlier kept chunk is at least
+    `threshold`. The kept chunk lists the pages and chunk indices it stands in
+    for under metadata "duplicate_pages" / "duplicate_chunks", so citations can
+    still point at every page the text appeared on. Returns (kept, collapsed_count).
+    """
+    rows = NUM_PERMUTATIONS // LSH_BANDS
+    buckets = defaultdict(list)
+    kept, signatures = [], []
+    collapsed = 0
+
+    for chunk in chunks:
+        signature = minhash_signature(chunk["text"])
+        bands = [(b, signature[b * rows:(b + 1) * rows].tobytes()) for b in range(LSH_BANDS)]
+
+        candidates = {idx for band in bands for idx in buckets.get(band, ())}
+        match = None
+        for idx in sorted(candidates):
+            if np.mean(signatures[idx] == signature) >= threshold:
+                match = idx
+                break
+
+        if match is not None:
+            metadata = kept[match]["metadata"]
+            metadata.setdefault("duplicate_pages", [])
+            metadata.setdefault("duplicate_chunks", [])
+            page = chunk["metadata"].get("page_number")
+            if page != metadata.get("page_number") and page not in metadata["duplicate_pages"]:
+                metadata["duplicate_pages"].append(page)
+            metadata["duplicate_chunks"].append(chunk["metadata"].get("chunk_index"))
+            collapsed += 1
+            continue
+
+        for band in bands:
+            buckets[band].append(len(kept))
+        kept.append({**chunk, "metadata": dict(chunk["metadata"])})
+        signatures.append(signature)
+
+    return kept, collapsed
+
+
+# -------------------------------
+# Runnable Wrappers
+# -------------------------------
+def strip_boilerplate_runnable():
+    return RunnableLambda(lambda inputs: strip_boilerplate_chain_fn(inputs))
+
+def strip_boilerplate_chain_fn(inputs):
+    """Pipeline step behind strip_boilerplate_runnable: cleans inputs["pages"] when `dedup` is on."""
+    if not inputs.get("dedup"):
+        return inputs
+    try:
+        pages = inputs.get("pages")
+        if pages is None:
+            pages = list(iter_records(inputs["raw_json_path"]))
+
+        pages, stats = strip_boilerplate(
+            pages,
+            min_page_fraction=inputs.get("boilerplate_min_page_fraction", 0.5)
+        )
+        # Chunking picks the cleaned pages up from memory
+        return {
+            **inputs,
+            "pages": pages,
+            "dedup_stats": {**inputs.get("dedup_stats", {}), **stats}
+        }
+    except Exception as e:
+        logger.exception(f"❌ Error in strip_boilerplate_runnable: {e}")
+        return inputs
+
+
+def dedup_chunks_runnable():
+    return RunnableLambda(lambda inputs: _dedup_chunks_runnable_impl(inputs))
+
+def _dedup_chunks_runnable_impl(inputs):
+    if not inputs.get("dedup") or not inputs.get("chunks"):
+        return inputs
+    try:
+        # Duplicate page lists are final only once every chunk is seen, so a chunk stream is collected here
+        chunks = list(inputs["chunks"])
+        kept, collapsed = collapse_near_duplicates(chunks, threshold=inputs.get("dedup_threshold", NEAR_DUPLICATE_THRESHOLD))
+        logger.info(f"🧬 Collapsed {collapsed} near-duplicate chunks, {len(kept)}/{len(chunks)} left to embed")
+        return {
+            **inputs,
+            "chunks": kept,
+            "dedup_stats": {
+                **inputs.get("dedup_stats", {}),
+                "chunks_in": len(chunks),
+                "chunks_collapsed": collapsed,
+                "embeddings_saved": collapsed
+            }
+        }
+    except Exception as e:
+        logger.exception(f"❌ Error in dedup_chunks_runnable: {e}")
+        return inputs
@@ -0,0 +1,175 @@
+import os
+import atexit
+import threading
+import multiprocessing
+import numpy as np
+from contextlib import contextmanager
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
+from multiprocessing import shared_memory
+from utils.log import setup_logger
+
+logger = setup_logger("embed_pool_logger")
+
+# Slices per worker: enough to balance uneven chunk lengths across processes
+TASKS_PER_WORKER = 4
+
+_worker_model = None
+
+
+# -------------------------------
+# Worker side (runs in the spawned processes)
+# -------------------------------
+def _init_worker(model_name, threads, backend):
+    global _worker_model
+    os.environ["TOKENIZERS_PARALLELISM"] = "false"
+    from utils.model_registry import get_embedder
+    from utils.create_embeding import set_torch_threads
+    set_torch_threads(threads)
+    _worker_model = get_embedder(model_name, backend)
+
+
+def _dimension():
+    return _worker_model.get_sentence_embedding_dimension()
+
+
+def _encode_into(shm_name, shape, rows, texts, batch_size, token_budget):
+    """Encodes `texts` and writes them to `rows` of the shared (n, dim) float32 array."""
+    from utils.create_embeding import encode_bucketed
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        out = np.ndarray(shape, dtype=np.float32, buffer=shm.buf)
+        out[rows] = encode_bucketed(_worker_model, texts, batch_size=batch_size, token_budget=token_budget)
+        del out
+    finally:
+        shm.close()
+    return len(rows)
+
+
+# -------------------------------
+# Parent side
+# -------------------------------
+class EmbeddingPool:
+    """
+    Persistent pool of spawned worker processes, each holding one copy of the
+    model. Texts are fanned out in length-sorted slices and every worker writes
+    its vectors straight into a shared-memory array, so nothing is pickled back.
+    """
+
+    def __init__(self, workers, model_name, threads_per_worker=1, backend="torch"):
+        self.workers = workers
+        self.model_name = model_name
+        self.backend = backend
+        self.threads_per_worker = threads_per_worker
+        self._dim = None
+        self._executor = self._start()
+
+    def _start(self):
+        logger.info(f"🚀 Starting embedding pool: {self.workers} workers x {self.threads_per_worker} threads ({self.model_name}, {self.backend})")
+        return ProcessPoolExecutor(
+            max_workers=self.workers,
+            mp_context=multiprocessing.get_context("spawn"),
+            initializer=_init_worker,
+            initargs=(self.model_name, self.threads_per_worker, self.backend)
+        )
+
+    @property
+    def dimension(self):
+        if self._dim is None:
+            self._dim = self._executor.submit(_dimension).result()
+        return self._dim
+
+    def encode(self, texts, batch_size=64, token_budget=8192):
+        """Returns an (n, dim) float32 array of embeddings in the order of `texts`."""
+        try:
+            return self._encode(texts, batch_size, token_budget)
+        except BrokenProcessPool:
+            # A worker died (e.g. OOM); restart once so the pool keeps serving later requests
+            logger.warning("⚠️ Embedding pool broke; restarting it")
+            self._executor.shutdown(wait=False, cancel_futures=True)
+            self._executor = self._start()
+            return self._encode(texts, batch_size, token_budget)
+
+    def _encode(self, texts, batch_size, token_budget):
+        shape = (len(texts), self.dimension)
+        if not texts:
+            return np.zeros(shape, dtype=np.float32)
+
+        # Similar lengths per slice keeps each worker's batches tight
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]), reverse=True)
+        n_tasks = min(len(texts), self.workers * TASKS_PER_WORKER)
+        slices = [order[k::n_tasks] for k in range(n_tasks)]
+
+        shm = shared_memory.SharedMemory(create=True, size=max(1, shape[0] * shape[1] * 4))
+        try:
+            futures = [
+                self._executor.submit(
+                    _encode_into, shm.name, shape, rows, [texts[i] for i in rows], batch_size, token_budget
+                )
+                for rows in slices
+            ]
+            for future in futures:
+                future.result()
+            return np.ndarray(shape, dtype=np.float32, buffer=shm.buf).copy()
+        finally:
+            shm.close()
+            shm.unlink()
+
+    def shutdown(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+        logger.info("🛑 Embedding pool shut down")
+
+
+# Pools by (workers, model, threads per worker, backend), how many callers hold each,
+# and the settings asked for last (the pool kept when the others go idle)
+_pools = {}
+_pool_users = {}
+_current = None
+_pool_lock = threading.Lock()
+
+
+def _retire_idle_pools():
+    """Shuts down every pool but the current one that no caller holds; runs under _pool_lock."""
+    for settings in [s for s in _pools if s != _current and not _pool_users.get(s)]:
+        _pools.pop(settings).shutdown()
+        _pool_users.pop(settings, None)
+
+
+@contextmanager
+def use_embed_pool(workers, model_name, threads_per_worker=None, backend="torch"):
+    """
+    Process-wide pool for these settings, kept across requests and held for the
+    duration of the with block. Pools are kept per configuration: asking for
+    other settings starts another pool, and a pool that is no longer the latest
+    is only shut down once no caller holds it, so no encode loses its workers.
+    """
+    global _current
+    threads_per_worker = threads_per_worker or max(1, (os.cpu_count() or 1) // workers)
+    settings = (workers, model_name, threads_per_worker, backend)
+    with _pool_lock:
+        pool = _pools.get(settings)
+        if pool is None:
+            pool = _pools[settings] = EmbeddingPool(workers, model_name, threads_per_worker, backend)
+        _pool_users[settings] = _pool_users.get(settings, 0) + 1
+        _current = settings
+        _retire_idle_pools()
+    try:
+        yield pool
+    finally:
+        with _pool_lock:
+            _pool_users[settings] -= 1
+            _retire_idle_pools()
+
+
+def shutdown_embed_pool():
+    """Shuts down every pool (process exit / API shutdown)."""
+    global _current
+    with _pool_lock:
+        for pool in _pools.values():
+            pool.shutdown()
+        _pools.clear()
+        _pool_users.clear()
+        _current = None
+
+
+atexit.register(shutdown_embed_pool)
@@ -0,0 +1,323 @@
+import os
+import re
+import time
+import zlib
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from utils.log import setup_logger
+
+logger = setup_logger("embedding_cache_logger")
+
+EMBED_CACHE_DIR = os.getenv("EMBED_CACHE_DIR", "embedding_cache")
+EMBED_CACHE_MAX_ENTRIES = int(os.getenv("EMBED_CACHE_MAX_ENTRIES", 200_000))
+
+INDEX_NAME = "index.sqlite"
+
+# Lookups only rewrite last_used for entries not refreshed for this long, and
+# queue those writes until LRU_FLUSH_SECONDS pass or LRU_FLUSH_BATCH are pending
+LRU_REFRESH_SECONDS = 60
+LRU_FLUSH_SECONDS = 5
+LRU_FLUSH_BATCH = 1000
+
+
+def normalize_text(text):
+    """Whitespace-insensitive form of a chunk, so re-extracted clauses hash the same."""
+    return re.sub(r"\s+", " ", text).strip()
+
+
+def text_hash(text):
+    return hashlib.sha1(normalize_text(text).encode("utf-8", errors="replace")).hexdigest()
+
+
+def _model_slug(model_name):
+    return re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name)
+
+
+class EmbeddingCache:
+    """
+    Persistent store of chunk embeddings keyed by (model id, normalized text hash).
+    A SQLite index maps each key to a slot in a per-model memory-mapped float32
+    vector file of `max_entries` rows; once a model's file is full the least
+    recently used slots are reused. The cache directory can be shared by
+    several processes. Writes run in an IMMEDIATE transaction, so slot
+    allocation and the vector writes of one process never interleave with
+    another's. Lookups only read (a deferred transaction, concurrent with
+    other readers and writers) and check each vector against the checksum
+    stored with its entry, so a slot reused by another process while it is
+    read counts as a miss. LRU timestamps are refreshed in batches.
+    """
+
+    def __init__(self, root=EMBED_CACHE_DIR, max_entries=EMBED_CACHE_MAX_ENTRIES):
+        self.root = root
+        self.max_entries = max_entries
+        os.makedirs(root, exist_ok=True)
+        self._lock = threading.Lock()
+        self._vectors = {}
+        self._pending_lru = {}
+        self._pending_since = None
+        self._db = sqlite3.connect(os.path.join(root, INDEX_NAME), timeout=30, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS models (
+                model TEXT PRIMARY KEY, dim INTEGER, capacity INTEGER, encode_s_per_text REAL
+            );
+            CREATE TABLE IF NOT EXISTS entries (
+                model TEXT, text_hash TEXT, slot INTEGER, last_used REAL, checksum INTEGER,
+                PRIMARY KEY (model, text_hash)
+            );
+            CREATE INDEX IF NOT EXISTS entries_lru ON entries (model, last_used);
+        """)
+        columns = {row[1] for row in self._db.execute("PRAGMA table_info(entries)")}
+        if "checksum" not in columns:
+            # Entries written before checksums cannot be validated; drop them (they are only a cache)
+            with self._db:
+                self._db.execute("ALTER TABLE entries ADD COLUMN checksum INTEGER")
+                self._db.execute("DELETE FROM entries")
+
+    def _model_info(self, model_name):
+        return self._db.execute(
+            "SELECT dim, capacity, encode_s_per_text FROM models WHERE model = ?", (model_name,)
+        ).fetchone()
+
+    def _vector_file(self, model_name, dim, capacity, create=False):
+        vectors = self._vectors.get(model_name)
+        if vectors is not None:
+            return vectors
+        path = os.path.join(self.root, f"{_model_slug(model_name)}.f32")
+        if not os.path.exists(path):
+            if not create:
+                return None
+            # Sparse file: disk is only used for the rows actually written
+            with open(path, "wb") as f:
+                f.truncate(capacity * dim * 4)
+        vectors = np.memmap(path, dtype=np.float32, mode="r+", shape=(capacity, dim))
+        self._vectors[model_name] = vectors
+        return vectors
+
+    def _begin(self):
+        """Takes the database write lock; held across processes until commit/rollback."""
+        self._db.execute("BEGIN IMMEDIATE")
+
+    def get_many(self, model_name, hashes):
+        """Returns {hash: vector} for the cached hashes and queues their LRU refresh."""
+        with self._lock:
+            # Deferred transaction: one consistent snapshot of the index, no write lock
+            self._db.execute("BEGIN")
+            try:
+                found, refresh = self._get_many(model_name, hashes)
+            finally:
+                self._db.commit()
+            self._touch(model_name, refresh)
+            return found
+
+    def _get_many(self, model_name, hashes):
+        info = self._model_info(model_name)
+        if info is None:
+            return {}, []
+        dim, capacity, _ = info
+        vectors = self._vector_file(model_name, dim, capacity)
+        if vectors is None:
+            return {}, []
+
+        found, refresh, torn = {}, [], 0
+        stale_before = time.time() - LRU_REFRESH_SECONDS
+        unique = list(dict.fromkeys(hashes))
+        for start in range(0, len(unique), 500):
+            batch = unique[start:start + 500]
+            rows = self._db.execute(
+                f"SELECT text_hash, slot, last_used, checksum FROM entries "
+                f"WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                (model_name, *batch)
+            ).fetchall()
+            for h, slot, last_used, checksum in rows:
+                vector = np.array(vectors[slot])
+                # Another process may have evicted the entry and reused the slot since the snapshot
+                if zlib.crc32(vector.tobytes()) != checksum:
+                    torn += 1
+                    continue
+                found[h] = vector
+                if last_used < stale_before:
+                    refresh.append(h)
+        if torn:
+            logger.info(f"🔁 {torn} cached embeddings of '{model_name}' changed while read; treated as misses")
+        return found, refresh
+
+    def _touch(self, model_name, hashes):
+        if hashes:
+            if not self._pending_lru:
+                self._pending_since = time.time()
+            now = time.time()
+            self._pending_lru.update({(model_name, h): now for h in hashes})
+        if self._pending_lru and (
+            len(self._pending_lru) >= LRU_FLUSH_BATCH or time.time() - self._pending_since >= LRU_FLUSH_SECONDS
+        ):
+            try:
+                self._begin()
+                self._write_pending_lru()
+                self._db.commit()
+            except sqlite3.OperationalError as e:
+                # Busy writers: keep the refreshes queued for the next flush or put_many
+                self._db.rollback()
+                logger.debug(f"LRU refresh postponed: {e}")
+
+    def _write_pending_lru(self):
+        """Writes the queued last_used refreshes; runs inside a write transaction."""
+        if not self._pending_lru:
+            return
+        self._db.executemany(
+            "UPDATE entries SET last_used = MAX(last_used, ?) WHERE model = ? AND text_hash = ?",
+            [(used, model, h) for (model, h), used in self._pending_lru.items()]
+        )
+        self._pending_lru.clear()
+        self._pending_since = None
+
+    def _allocate_slots(self, model_name, count, capacity):
+        # Slots are handed out in order and only ever reused, so rows [0, used) are taken
+        used = self._db.execute("SELECT COUNT(*) FROM entries WHERE model = ?", (model_name,)).fetchone()[0]
+        free = list(range(used, min(capacity, used + count)))
+
+        evict = count - len(free)
+        if evict > 0:
+            victims = self._db.execute(
+                "SELECT text_hash, slot FROM entries WHERE model = ? ORDER BY last_used LIMIT ?",
+                (model_name, evict)
+            ).fetchall()
+            self._db.executemany(
+                "DELETE FROM entries WHERE model = ? AND text_hash = ?",
+                [(model_name, h) for h, _ in victims]
+            )
+            free.extend(slot for _, slot in victims)
+            logger.info(f"🧹 Evicted {len(victims)} cached embeddings of '{model_name}'")
+        return free
+
+    def put_many(self, model_name, hashes, embeddings, encode_seconds=None):
+        """Stores one vector per hash; `encode_seconds` updates the per-text encode cost estimate."""
+        embeddings = np.asarray(embeddings, dtype=np.float32)
+        if not len(hashes):
+            return 0
+        with self._lock:
+            # Slots are allocated and written under the write lock: a second process
+            # sharing the directory waits here instead of picking the same slots
+            self._begin()
+            try:
+                # Queued refreshes go first, so eviction below sees them
+                self._write_pending_lru()
+                stored = self._put_many(model_name, hashes, embeddings, encode_seconds)
+                self._db.commit()
+            except Exception:
+                self._db.rollback()
+                raise
+            return stored
+
+    def _put_many(self, model_name, hashes, embeddings, encode_seconds):
+        info = self._model_info(model_name)
+        dim = embeddings.shape[1]
+        if info is None:
+            capacity, per_text = self.max_entries, None
+            self._db.execute("INSERT INTO models VALUES (?, ?, ?, NULL)", (model_name, dim, capacity))
+        else:
+            cached_dim, capacity, per_text = info
+            if cached_dim != dim:
+                raise ValueError(f"Cached '{model_name}' vectors have dim {cached_dim}, got {dim}")
+
+        if encode_seconds is not None:
+            sample = encode_seconds / len(hashes)
+            per_text = sample if per_text is None else 0.8 * per_text + 0.2 * sample
+            self._db.execute("UPDATE models SET encode_s_per_text = ? WHERE model = ?", (per_text, model_name))
+
+        rows = dict(zip(hashes, embeddings))
+        keys = list(rows)
+        existing = set()
+        for start in range(0, len(keys), 500):
+            batch = keys[start:start + 500]
+            existing.update(h for (h,) in self._db.execute(
+                f"SELECT text_hash FROM entries WHERE model = ? AND text_hash IN ({','.join('?' * len(batch))})",
+                (model_name, *batch)
+            ))
+        new = [h for h in rows if h not in existing][:capacity]
+
+        vectors = self._vector_file(model_name, dim, capacity, create=True)
+        slots = self._allocate_slots(model_name, len(new), capacity)
+        now = time.time()
+        for h, slot in zip(new, slots):
+            vectors[slot] = rows[h]
+        vectors.flush()
+        self._db.executemany(
+            "INSERT INTO entries (model, text_hash, slot, last_used, checksum) VALUES (?, ?, ?, ?, ?)",
+            [(model_name, h, slot, now, zlib.crc32(np.array(vectors[slot]).tobytes())) for h, slot in zip(new, slots)]
+        )
+        return len(new)
+
+    def encode_cost(self, model_name):
+        """Average seconds spent encoding one text with `model_name`, if known."""
+        with self._lock:
+            info = self._model_info(model_name)
+        return info[2] if info and info[2] else None
+
+    def clear(self):
+        with self._lock:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM models")
+            self._db.commit()
+            self._vectors.clear()
+            self._pending_lru.clear()
+            for name in os.listdir(self.root):
+                if name.endswith(".f32"):
+                    os.remove(os.path.join(self.root, name))
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+def get_embedding_cache():
+    """Process-wide cache instance shared by the API and the Streamlit app."""
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            _cache = EmbeddingCache()
+    return _cache
+
+
+def encode_with_cache(texts, model_name, encode, cache=None):
+    """
+    Embeds `texts`, sending only cache misses (each distinct text once) to
+    `encode(list_of_texts) -> np.ndarray`. Returns (embeddings, stats) where stats
+    holds the hit rate and the encode time saved, estimated from the measured
+    per-text cost of this or earlier runs.
+    """
+    cache = cache or get_embedding_cache()
+    hashes = [text_hash(text) for text in texts]
+    found = cache.get_many(model_name, hashes)
+
+    missing = {}
+    for text, h in zip(texts, hashes):
+        if h not in found and h not in missing:
+            missing[h] = text
+
+    encode_seconds = 0.0
+    if missing:
+        start = time.perf_counter()
+        fresh = np.asarray(encode(list(missing.values())), dtype=np.float32)
+        encode_seconds = time.perf_counter() - start
+        found.update(zip(missing, fresh))
+        try:
+            cache.put_many(model_name, list(missing), fresh, encode_seconds=encode_seconds)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not store embeddings in cache: {e}")
+
+    embeddings = np.stack([found[h] for h in hashes]) if hashes else np.zeros((0, 0), dtype=np.float32)
+
+    hits = len(texts) - len(missing)
+    per_text = encode_seconds / len(missing) if missing else cache.encode_cost(model_name) or 0.0
+    stats = {
+        "texts": len(texts),
+        "hits": hits,
+        "misses": len(missing),
+        "hit_rate": round(hits / len(texts), 3) if texts else 0.0,
+        "time_saved_s": round(hits * per_text, 3),
+    }
+    logger.info(f"🗃️ Embedding cache: {hits}/{len(texts)} hits, {len(missing)} encoded, ~{stats['time_saved_s']}s saved")
+    return embeddings, stats
@@ -1,26 +1,30 @@
 import json
 import re
 import os
+from itertools import islice
 
 
 TEMP_OUTPUT_DIR = "/temp_uploads"
 from langchain_core.runnables import Runnable, RunnableLambda
 from utils.log import setup_logger
+from utils.records import iter_records
+from utils.persist import persist_records
 
 logger = setup_logger("index_extractor")
 
-def extract_des_via_index(json_path, index_output_path):
+def extract_des_via_index(json_path, index_output_path, pages=None, persist="sync"):
     try:
-        with open(json_path, "r", encoding="utf-8", errors="replace") as f:
-            pdf_pages = json.load(f)
-        logger.info(f"Loaded {len(pdf_pages)} pages from {json_path}")
+        # Only the first 15 pages can hold the index, so stop reading there;
+        # pages already in memory are used as is instead of re-reading the file
+        pdf_pages = list(islice(pages if pages is not None else iter_records(json_path), 15))
+        logger.info(f"Loaded {len(pdf_pages)} pages from {'memory' if pages is not None else json_path}")
     except Exception as e:
         logger.error(f"Error loading JSON: {e}")
         return []
 
     index_text = ""
     # Check first 15 pages for index-like content
-    for page in pdf_pages[:15]:
+    for page in pdf_pages:
         page_text = page.get("text", "")
         if re.search(r'\b(contents?|index|table\s+of\s+contents?)\b', page_text, re.IGNORECASE):
             index_text = page_text
@@ -80,8 +84,7 @@ def extract_des_via_index(json_path, index_output_path):
     index_data.sort(key=lambda x: x["start"])
 
     try:
-        with open(index_output_path, "w", encoding="utf-8") as out:
-            json.dump(index_data, out, indent=2, ensure_ascii=False)
+        persist_records(index_data, index_output_path, persist)
         logger.info(f"Saved {len(index_data)} entries to {index_output_path}")
     except Exception as e:
         logger.error(f"Error writing output JSON: {e}")
@@ -100,15 +103,20 @@ def _extract_index_runnable_impl(inputs):
         if not input_json_path:
             raise ValueError("Missing input_json_path")
         
-        filename = os.path.splitext(os.path.basename(input_json_path))[0]
+        filename, ext = os.path.splitext(os.path.basename(input_json_path))
         
-        output_index_path = os.path.join(TEMP_OUTPUT_DIR, f"{filename}_index.json")
+        output_index_path = os.path.join(TEMP_OUTPUT_DIR, f"{filename}_index{ext}")
 
         logger.info(f"🔎 Extracting index from {input_json_path} -> {output_index_path}")
 
         os.makedirs(os.path.dirname(output_index_path), exist_ok=True)
         
-        index_data = extract_des_via_index(input_json_path, output_index_path)
+        index_data = extract_des_via_index(
+            input_json_path,
+            output_index_path,
+            pages=inputs.get("pages"),
+            persist=inputs.get("persist", "sync")
+        )
 
         if not index_data:
             raise ValueError("❌ No index entries extracted.")
@@ -124,8 +132,9 @@ def _extract_index_runnable_impl(inputs):
     except Exception as e:
         logger.exception(f"❌ Error in extract_index_runnable: {e}")
         return {
+            **inputs,  # Keep pages/paths flowing so chunking can proceed without an index
             "index_entries": [],
-            "index_json_path": os.path.join(TEMP_OUTPUT_DIR, f"{filename}_index.json")
+            "index_json_path": inputs.get("index_json_path")
         }
 
 # Optional CLI test
@@ -0,0 +1,259 @@
+import os
+import json
+import hashlib
+from datetime import datetime
+from langchain_core.runnables import RunnableLambda
+from utils.log import setup_logger
+from utils.records import iter_records
+from utils.pdf_to_json import pdf_to_basic_json_runnable
+from utils.extract_index import extract_index_runnable
+from utils.chunking import chunk_pages_to_embedding_ready_format
+from utils.create_embeding import embed_text_chain_fn
+from utils.qdrant import delete_page_range_points, upsert_embed_data, build_search_filter
+from utils.vector_store import open_vector_store
+from utils.dedup import strip_boilerplate_chain_fn, collapse_near_duplicates
+
+logger = setup_logger("incremental_logger")
+
+MANIFEST_DIR = os.getenv("REINGEST_MANIFEST_DIR", "temp_uploads/manifests")
+
+# Pages are joined with "\n\n" before splitting, see chunk_pages_to_embedding_ready_format
+PAGE_SEPARATOR_LEN = 2
+
+
+def hash_page(text):
+    return hashlib.sha1(text.encode("utf-8", errors="replace")).hexdigest()
+
+
+def _manifest_path(collection_name, source_name):
+    # One manifest per document, since several documents can share a collection
+    return os.path.join(MANIFEST_DIR, f"{collection_name}.{source_name}.pages.json")
+
+
+def load_page_manifest(collection_name, source_name):
+    path = _manifest_path(collection_name, source_name)
+    if not os.path.exists(path):
+        return None
+    with open(path, "r", encoding="utf-8") as f:
+        return json.load(f)
+
+
+def save_page_manifest(collection_name, inputs, pages, page_chunk_starts, title=None):
+    """
+    Records the page hashes and lengths of an ingestion, and `page_chunk_starts`:
+    for each page the chunk_index of the first chunk starting on or after it,
+    followed by the next free chunk_index (see page_chunk_starts).
+    """
+    os.makedirs(MANIFEST_DIR, exist_ok=True)
+    manifest = {
+        "collection_name": collection_name,
+        "source_name": inputs.get("source_name", "Unknown"),
+        "title": title or inputs.get("title", "Untitled"),
+        "chunk_size": inputs.get("chunk_size", 2500),
+        "chunk_overlap": inputs.get("chunk_overlap", 400),
+        "page_hashes": [hash_page(page["text"]) for page in pages],
+        "page_lengths": [len(page["text"]) for page in pages],
+        "page_chunk_starts": page_chunk_starts,
+        "next_chunk_index": page_chunk_starts[-1],
+        "updated_at": datetime.now().isoformat(),
+    }
+    with open(_manifest_path(collection_name, manifest["source_name"]), "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    return manifest
+
+
+def page_chunk_starts(chunks, page_count, first_page=0, end=None):
+    """
+    chunk_index of the first chunk starting on each page from `first_page` on
+    (the next page's value for pages where no chunk starts), plus `end`, the
+    chunk_index after the last chunk. Chunk indices follow document order, so
+    the chunks of pages [a, b] are exactly the indices [starts[a], starts[b + 1]).
+    """
+    if end is None:
+        end = max((chunk["metadata"]["chunk_index"] for chunk in chunks), default=-1) + 1
+    starts = [end] * (page_count - first_page + 1)
+    for chunk in chunks:
+        page = chunk["metadata"]["page_number"] - 1 - first_page
+        starts[page] = min(starts[page], chunk["metadata"]["chunk_index"])
+    for i in range(len(starts) - 2, -1, -1):
+        starts[i] = min(starts[i], starts[i + 1])
+    return starts
+
+
+def changed_pages(old_hashes, pages):
+    """0-based indices of pages whose text hash differs from the previous version."""
+    return [i for i, page in enumerate(pages) if hash_page(page["text"]) != old_hashes[i]]
+
+
+def affected_page_runs(changed, pages, reach):
+    """
+    Expands each changed page by the neighbours that lie within `reach` characters
+    (chunk_size + chunk_overlap), since chunks overlapping a changed page can start
+    or end there. Returns sorted, merged inclusive (first, last) page index runs.
+    """
+    runs = []
+    for idx in changed:
+        first, budget = idx, reach
+        while first > 0 and budget > 0:
+            first -= 1
+            budget -= len(pages[first]["text"]) + PAGE_SEPARATOR_LEN
+        last, budget = idx, reach
+        while last < len(pages) - 1 and budget > 0:
+            last += 1
+            budget -= len(pages[last]["text"]) + PAGE_SEPARATOR_LEN
+
+        if runs and first <= runs[-1][1] + 1:
+            runs[-1] = (runs[-1][0], max(runs[-1][1], last))
+        else:
+            runs.append((first, last))
+    return runs
+
+
+def _page_char_offsets(pages):
+    offsets, position = [], 0
+    for page in pages:
+        offsets.append(position)
+        position += len(page["text"]) + PAGE_SEPARATOR_LEN
+    return offsets
+
+
+def _can_reingest(manifest, inputs, pages):
+    if not manifest:
+        return False
+    if manifest["chunk_size"] != inputs.get("chunk_size", 2500) or manifest["chunk_overlap"] != inputs.get("chunk_overlap", 400):
+        logger.info("🔁 Chunk settings changed since last ingestion; doing a full re-ingestion")
+        return False
+    if len(manifest["page_hashes"]) != len(pages):
+        # Inserted/removed pages shift every later page number, so patching is not safe
+        logger.info("🔁 Page count changed since last ingestion; doing a full re-ingestion")
+        return False
+    if "page_chunk_starts" not in manifest:
+        logger.info("🔁 Manifest predates per-page chunk indices; doing a full re-ingestion")
+        return False
+    return True
+
+
+def _chunk_runs(inputs, pages, manifest, runs):
+    """Chunks each page run with char offsets and chunk indices that line up with the whole document."""
+    char_offsets = _page_char_offsets(pages)
+    starts = manifest["page_chunk_starts"]
+    chunked = []
+    for first, last in runs:
+        chunked.append(chunk_pages_to_embedding_ready_format(
+            pages[first:last + 1],
+            source_name=inputs.get("source_name", "Unknown"),
+            doc_date=inputs.get("doc_date", "Unknown"),
+            title=manifest.get("title") or inputs.get("title", "Untitled"),
+            index_data=inputs.get("index_entries"),
+            chunk_size=inputs.get("chunk_size", 2500),
+            chunk_overlap=inputs.get("chunk_overlap", 400),
+            page_offset=first,
+            char_offset=char_offsets[first],
+            chunk_index_start=starts[first],
+            detect_title=False
+        ))
+    return chunked
+
+
+def reingest_changed_pages(inputs, pages, manifest, client):
+    """
+    Re-chunks and re-embeds only the runs of pages affected by a revision and
+    swaps their points in the existing collection. A run keeps the chunk_index
+    range of the chunks it replaces; when a changed page has a new length (so
+    every later char offset, and point id, moves) or a run's chunk count changes
+    (so every later chunk_index moves), the run is extended to the end of the
+    document. Returns the new chunks and the updated page_chunk_starts.
+    """
+    collection_name = inputs["collection_name"]
+    source_name = inputs.get("source_name", "Unknown")
+    starts = manifest["page_chunk_starts"]
+
+    changed = changed_pages(manifest["page_hashes"], pages)
+    if not changed:
+        logger.info("✅ No page changed since last ingestion; collection left untouched")
+        return [], starts
+
+    runs = affected_page_runs(changed, pages, inputs.get("chunk_size", 2500) + inputs.get("chunk_overlap", 400))
+    last_page = len(pages) - 1
+    to_end = [(runs[0][0], last_page)]
+    if any(len(pages[i]["text"]) != manifest["page_lengths"][i] for i in changed):
+        runs = to_end
+    chunked = _chunk_runs(inputs, pages, manifest, runs)
+    if runs != to_end and any(
+        len(run_chunks) != starts[last + 1] - starts[first]
+        for (first, last), run_chunks in zip(runs, chunked) if last < last_page
+    ):
+        runs = to_end
+        chunked = _chunk_runs(inputs, pages, manifest, runs)
+    logger.info(f"📝 {len(changed)} changed pages -> re-ingesting page runs {[(a + 1, b + 1) for a, b in runs]}")
+
+    new_starts = list(starts)
+    for (first, last), run_chunks in zip(runs, chunked):
+        end = starts[first] + len(run_chunks) if last == last_page else starts[last + 1]
+        new_starts[first:last + 2] = page_chunk_starts(run_chunks, last + 1, first_page=first, end=end)
+    new_chunks = [chunk for run_chunks in chunked for chunk in run_chunks]
+
+    if inputs.get("dedup"):
+        new_chunks, collapsed = collapse_near_duplicates(new_chunks)
+        logger.info(f"🧬 Collapsed {collapsed} near-duplicate chunks among re-ingested pages")
+
+    embedded = embed_text_chain_fn({**inputs, "chunks": new_chunks}) if new_chunks else {}
+
+    # Chunk page numbers are 1-based; drop the old points of each run, then add the new ones
+    for first, last in runs:
+        delete_page_range_points(client, collection_name, source_name, first + 1, last + 1)
+    upserted = upsert_embed_data(client, collection_name, embedded.get("embed_data", []), embedded.get("embeddings"))
+    logger.info(f"✅ Re-ingested {upserted} chunks across {len(runs)} page runs in '{collection_name}'")
+    return new_chunks, new_starts
+
+
+def ingest_incremental(pipeline, inputs):
+    """
+    Runs `pipeline` for a first ingestion, and for a revised document with the
+    same collection only patches the pages that changed since the last run.
+    """
+    if not inputs.get("incremental", True):
+        return pipeline.invoke(inputs)
+
+    collection_name = inputs["collection_name"]
+    manifest = load_page_manifest(collection_name, inputs.get("source_name", "Unknown"))
+
+    if manifest:
+        # The index stage drops the other inputs when it finds no index, so merge them back
+        prepared = {**inputs, **(pdf_to_basic_json_runnable() | extract_index_runnable()).invoke(inputs)}
+        # Page hashes are taken after boilerplate stripping, as in the full pipeline
+        prepared = strip_boilerplate_chain_fn(prepared)
+        pages = prepared.get("pages") or list(iter_records(prepared["raw_json_path"]))
+        client = open_vector_store(
+            inputs.get("vector_backend", "qdrant"),
+            qdrant_url=inputs.get("qdrant_url") or os.getenv("QDRANT_URL"),
+            qdrant_api_key=inputs.get("qdrant_api_key") or os.getenv("QDRANT_API_KEY")
+        )
+        if _can_reingest(manifest, inputs, pages) and client.collection_exists(collection_name):
+            chunks, starts = reingest_changed_pages(prepared, pages, manifest, client)
+            save_page_manifest(collection_name, prepared, pages, starts, title=manifest.get("title"))
+            return {
+                **prepared,
+                "chunks": chunks,
+                "chunks_count": client.count(
+                    collection_name, count_filter=build_search_filter(sources=manifest["source_name"]), exact=True
+                ).count,
+                # The embed artifact of the earlier full run no longer matches the collection
+                "embed_json_path": None,
+                "embed_vectors_path": None,
+                "qdrant_client": client,
+                "reingested": True,
+            }
+
+    # First ingestion (or unsafe to patch): sync this document's points with the fresh chunks
+    result = pipeline.invoke({**inputs, "upload_mode": "sync"})
+    if result.get("qdrant_client") is not None and result.get("chunks"):
+        pages = result.get("pages") or list(iter_records(result["raw_json_path"]))
+        title = result["chunks"][0]["metadata"].get("title")
+        starts = page_chunk_starts(result["chunks"], len(pages))
+        save_page_manifest(collection_name, result, pages, starts, title=title)
+    return result
+
+
+def incremental_pipeline_runnable(pipeline):
+    return RunnableLambda(lambda inputs: ingest_incremental(pipeline, inputs))
@@ -0,0 +1,323 @@
+import os
+import json
+import time
+import shutil
+import hashlib
+from datetime import datetime
+from langchain_core.runnables import RunnableLambda
+from utils.log import setup_logger
+from utils.persist import wait_for_persistence
+from utils.model_registry import DEFAULT_EMBEDDING_MODEL
+from utils.create_embeding import DEFAULT_BATCH_SIZE, DEFAULT_TOKEN_BUDGET
+from utils.vector_store import open_vector_store
+from utils.qdrant import build_search_filter, upload_qdrant_runnable
+
+logger = setup_logger("ingest_cache_logger")
+
+CACHE_DIR = os.getenv("INGEST_CACHE_DIR", "ingest_cache")
+CACHE_MAX_BYTES = int(os.getenv("INGEST_CACHE_MAX_BYTES", 2 * 1024 ** 3))
+
+# Pipeline inputs that change the stored chunks and vectors; any difference means a new cache entry.
+# chunking_mode moves chunk boundaries, and the embedding batch shape changes padding and so the
+# vectors' low bits. Where they are uploaded (backend, collection, profile) is not part of the key:
+# see ingest_with_cache
+CACHE_SETTING_KEYS = (
+    "chunk_size", "chunk_overlap", "chunking_mode", "embedding_model", "embed_backend", "embed_batch_size",
+    "embed_token_budget", "vector_size", "dedup"
+)
+# Values the pipeline uses when an input is left out, so leaving it out and passing the default share a key
+CACHE_SETTING_DEFAULTS = {
+    "chunking_mode": "default",
+    "embedding_model": DEFAULT_EMBEDDING_MODEL,
+    "embed_backend": "torch",
+    "embed_batch_size": DEFAULT_BATCH_SIZE,
+    "embed_token_budget": DEFAULT_TOKEN_BUDGET,
+    "vector_size": 384,
+    "dedup": False,
+}
+
+# Artifact paths carried in the pipeline inputs that are copied into an entry
+CACHED_ARTIFACT_KEYS = ("raw_json_path", "index_json_path", "embed_json_path", "embed_vectors_path")
+
+MANIFEST_NAME = "manifest.json"
+
+
+def hash_pdf(pdf_path, block_size=1 << 20):
+    """SHA-256 of the PDF bytes, read in blocks. Accepts a path or an UploadedFile."""
+    digest = hashlib.sha256()
+    if hasattr(pdf_path, "getbuffer"):
+        digest.update(pdf_path.getbuffer())
+        return digest.hexdigest()
+
+    with open(pdf_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def cache_key(pdf_hash, inputs):
+    """Combines the PDF hash with the chunking/embedding settings that shaped the output."""
+    settings = {key: inputs.get(key) for key in CACHE_SETTING_KEYS}
+    settings = {
+        key: CACHE_SETTING_DEFAULTS.get(key) if value is None else value for key, value in settings.items()
+    }
+    payload = pdf_hash + json.dumps(settings, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+def upload_target(inputs):
+    """Where a pipeline run uploads its points: vector backend, server URL and collection."""
+    backend = inputs.get("vector_backend", "qdrant")
+    return {
+        "vector_backend": backend,
+        "qdrant_url": (inputs.get("qdrant_url") or os.getenv("QDRANT_URL")) if backend == "qdrant" else None,
+        "collection_name": inputs.get("collection_name"),
+    }
+
+
+def _write_manifest(path, manifest):
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(manifest, f, indent=2)
+    os.replace(tmp_path, path)
+
+
+def _link_or_copy(src, dst):
+    """Hard-links an artifact into the cache (free on the same filesystem), copying otherwise."""
+    try:
+        os.link(src, dst)
+    except OSError:
+        shutil.copy2(src, dst)
+
+
+class IngestionCache:
+    """
+    Content-addressed store of finished ingestions. Each entry is a directory
+    named by its cache key holding the pipeline artifacts and a manifest listing
+    the collections they were uploaded to. Entries are evicted least recently
+    used first once the directory grows past `max_bytes`.
+    """
+
+    def __init__(self, root=CACHE_DIR, max_bytes=CACHE_MAX_BYTES):
+        self.root = root
+        self.max_bytes = max_bytes
+        os.makedirs(root, exist_ok=True)
+
+    def _entry_dir(self, key):
+        return os.path.join(self.root, key)
+
+    def lookup(self, key):
+        """Returns the manifest for `key`, or None. A hit refreshes the entry's LRU position."""
+        manifest_path = os.path.join(self._entry_dir(key), MANIFEST_NAME)
+        if not os.path.exists(manifest_path):
+            return None
+        try:
+            with open(manifest_path, "r", encoding="utf-8") as f:
+                manifest = json.load(f)
+        except Exception as e:
+            logger.warning(f"⚠️ Unreadable cache manifest {manifest_path}: {e}")
+            self.remove(key)
+            return None
+
+        missing = [p for p in manifest["artifacts"].values() if not os.path.exists(p)]
+        if missing:
+            logger.warning(f"⚠️ Cache entry {key[:12]} lost artifacts {missing}; dropping it")
+            self.remove(key)
+            return None
+
+        os.utime(manifest_path)
+        return manifest
+
+    def store(self, key, result, pdf_hash):
+        """Copies the artifacts of a finished pipeline run into the cache and evicts if needed."""
+        entry_dir = self._entry_dir(key)
+        tmp_dir = entry_dir + ".tmp"
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        os.makedirs(tmp_dir)
+
+        artifacts = {}
+        for artifact_key in CACHED_ARTIFACT_KEYS:
+            src = result.get(artifact_key)
+            if not src or not os.path.exists(src):
+                continue
+            name = f"{artifact_key}{os.path.splitext(src)[1]}"
+            _link_or_copy(src, os.path.join(tmp_dir, name))
+            # Keep the JSONL offset sidecar alongside so seeking still works
+            if os.path.exists(src + ".idx"):
+                _link_or_copy(src + ".idx", os.path.join(tmp_dir, name + ".idx"))
+            artifacts[artifact_key] = os.path.join(entry_dir, name)
+
+        manifest = {
+            "key": key,
+            "pdf_hash": pdf_hash,
+            "source_name": result.get("source_name"),
+            "chunks_count": result.get("chunks_count"),
+            "settings": {k: result.get(k) for k in CACHE_SETTING_KEYS},
+            "artifacts": artifacts,
+            "collections": [upload_target(result)],
+            "created_at": datetime.now().isoformat(),
+        }
+        _write_manifest(os.path.join(tmp_dir, MANIFEST_NAME), manifest)
+
+        # Swap the finished entry into place so readers never see a partial one
+        shutil.rmtree(entry_dir, ignore_errors=True)
+        os.replace(tmp_dir, entry_dir)
+        logger.info(f"💾 Cached ingestion {key[:12]} ({len(artifacts)} artifacts)")
+
+        self.evict(keep=key)
+        return manifest
+
+    def add_collection(self, key, target):
+        """Records another collection the artifacts of `key` were uploaded to."""
+        manifest = self.lookup(key)
+        if manifest is None:
+            return None
+        if target not in manifest["collections"]:
+            manifest["collections"].append(target)
+            _write_manifest(os.path.join(self._entry_dir(key), MANIFEST_NAME), manifest)
+        return manifest
+
+    def remove(self, key):
+        shutil.rmtree(self._entry_dir(key), ignore_errors=True)
+
+    def _entries(self):
+        """Yields (last_used, size_bytes, key) for every complete entry."""
+        for key in os.listdir(self.root):
+            manifest_path = os.path.join(self.root, key, MANIFEST_NAME)
+            if not os.path.exists(manifest_path):
+                continue
+            entry_dir = os.path.join(self.root, key)
+            size = sum(
+                os.path.getsize(os.path.join(entry_dir, name))
+                for name in os.listdir(entry_dir)
+            )
+            yield os.path.getmtime(manifest_path), size, key
+
+    def evict(self, keep=None):
+        """Drops least recently used entries until the cache fits in max_bytes."""
+        entries = sorted(self._entries())
+        total = sum(size for _, size, _ in entries)
+        for _, size, key in entries:
+            if total <= self.max_bytes:
+                break
+            if key == keep:
+                continue
+            self.remove(key)
+            total -= size
+            logger.info(f"🧹 Evicted cached ingestion {key[:12]} ({size / 1024 / 1024:.1f} MB)")
+
+
+_cache = None
+
+
+def get_ingest_cache():
+    """Process-wide cache instance shared by the API and the Streamlit app."""
+    global _cache
+    if _cache is None:
+        _cache = IngestionCache()
+    return _cache
+
+
+def _cached_result(inputs, manifest, client, upload_stats=None):
+    return {
+        **inputs,
+        **manifest["artifacts"],
+        "source_name": manifest.get("source_name") or inputs.get("source_name"),
+        "qdrant_client": client,
+        "chunks_count": manifest.get("chunks_count"),
+        "upload_stats": upload_stats,
+        "cache_hit": True,
+        "cache_key": manifest["key"],
+    }
+
+
+def _restore_from_cache(inputs, manifest):
+    """Reuses the points already in the target collection, or returns None if they are gone."""
+    if upload_target(inputs) not in manifest["collections"]:
+        return None
+    client = open_vector_store(
+        inputs.get("vector_backend", "qdrant"), upload_target(inputs)["qdrant_url"],
+        inputs.get("qdrant_api_key") or os.getenv("QDRANT_API_KEY")
+    )
+
+    collection_name = inputs["collection_name"]
+    if not client.collection_exists(collection_name):
+        return None
+    # A shared collection can outlive this document's points, so count those
+    source_name = manifest.get("source_name")
+    count_filter = build_search_filter(sources=source_name) if source_name else None
+    if client.count(collection_name, count_filter=count_filter, exact=False).count == 0:
+        return None
+    return _cached_result(inputs, manifest, client)
+
+
+def _upload_from_cache(inputs, manifest):
+    """Uploads the cached embed artifact into the target collection; None if that fails."""
+    artifacts = manifest["artifacts"]
+    if "embed_json_path" not in artifacts:
+        return None
+    uploaded = upload_qdrant_runnable().invoke({
+        **inputs,
+        "embed_json_path": artifacts["embed_json_path"],
+        "embed_vectors_path": artifacts.get("embed_vectors_path"),
+        "embed_data": None,
+        "embeddings": None,
+    })
+    if uploaded.get("qdrant_client") is None:
+        return None
+    return _cached_result(inputs, manifest, uploaded["qdrant_client"], uploaded.get("upload_stats"))
+
+
+def ingest_with_cache(pipeline, inputs, cache=None):
+    """
+    Runs `pipeline` unless an identical PDF with the same settings was ingested
+    before, in which case the stored artifacts are reused: the points already in
+    the target collection are kept, and a collection the PDF was not uploaded to
+    yet (e.g. the same PDF re-uploaded under another filename) is filled from the
+    cached embed artifact without extracting, chunking or embedding again.
+    """
+    cache = cache or get_ingest_cache()
+    start = time.perf_counter()
+
+    try:
+        pdf_hash = hash_pdf(inputs["pdf_path"])
+        key = cache_key(pdf_hash, inputs)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not hash PDF, running without cache: {e}")
+        return pipeline.invoke(inputs)
+
+    manifest = cache.lookup(key)
+    if manifest:
+        try:
+            result = _restore_from_cache(inputs, manifest)
+            if result is None:
+                logger.info(f"📤 Uploading cached ingestion {key[:12]} into '{inputs.get('collection_name')}'")
+                result = _upload_from_cache(inputs, manifest)
+                if result is not None:
+                    cache.add_collection(key, upload_target(inputs))
+        except Exception as e:
+            logger.warning(f"⚠️ Cached ingestion unavailable: {e}")
+            result = None
+        if result:
+            logger.info(f"⚡ Ingestion cache hit {key[:12]} in {(time.perf_counter() - start) * 1000:.1f} ms")
+            return result
+        logger.info(f"♻️ Cache entry {key[:12]} could not be uploaded; re-ingesting")
+        cache.remove(key)
+
+    result = pipeline.invoke(inputs)
+    result.setdefault("chunks_count", len(result.get("chunks") or []))
+    result["cache_hit"] = False
+    result["cache_key"] = key
+
+    if result.get("qdrant_client") is not None and not result.get("error"):
+        try:
+            # Artifacts may still be written in the background (persist="async")
+            wait_for_persistence()
+            cache.store(key, result, pdf_hash)
+        except Exception as e:
+            logger.warning(f"⚠️ Failed to store ingestion cache entry: {e}")
+    return result
+
+
+def cached_pipeline_runnable(pipeline, cache=None):
+    return RunnableLambda(lambda inputs: ingest_with_cache(pipeline, inputs, cache))
@@ -65,6 +65,9 @@ def build_prompt(query, chunks, system_message=None, max_words=4000):
         # Get chunk index and page number, defaulting if not present
         chunk_id = metadata.get("chunk_index", idx)
         page_num = metadata.get("page_number", "N/A")
+        # Near-duplicate chunks collapsed into this one keep their pages citable
+        if metadata.get("duplicate_pages"):
+            page_num = f"{page_num} (also {', '.join(str(p) for p in metadata['duplicate_pages'])})"
 
         words = text.split()
         if total_words + len(words) > max_words:
@@ -0,0 +1,115 @@
+import time
+import threading
+from utils.log import setup_logger
+
+logger = setup_logger("model_registry_logger")
+
+DEFAULT_EMBEDDING_MODEL = "sentence-transformers/all-MiniLM-L6-v2"
+
+_models = {}
+_stats = {}
+_load_locks = {}
+_lock = threading.Lock()
+
+
+def _load_sentence_transformer(name):
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(name)
+
+
+def _load_onnx(name):
+    from utils.onnx_backend import OnnxEmbedder
+    return OnnxEmbedder(name)
+
+
+def _load_onnx_int8(name):
+    from utils.onnx_backend import OnnxEmbedder
+    return OnnxEmbedder(name, quantize=True)
+
+
+# kind -> loader(name); other model types (e.g. cross-encoders) register their own
+_LOADERS = {
+    "sentence-transformer": _load_sentence_transformer,
+    "onnx": _load_onnx,
+    "onnx-int8": _load_onnx_int8,
+}
+
+# embed_backend pipeline input -> registry kind
+EMBED_BACKENDS = {"torch": "sentence-transformer", "onnx": "onnx", "onnx-int8": "onnx-int8"}
+
+
+def register_loader(kind, loader):
+    """Makes `get_model(name, kind=kind)` load models with `loader(name)`."""
+    _LOADERS[kind] = loader
+
+
+def _model_memory_bytes(model):
+    """Bytes held by the model's parameters and buffers (0 if it is not a torch module)."""
+    if hasattr(model, "memory_bytes"):
+        return model.memory_bytes
+    try:
+        tensors = list(model.parameters()) + list(model.buffers())
+    except Exception:
+        return 0
+    return sum(t.numel() * t.element_size() for t in tensors)
+
+
+def get_model(name=DEFAULT_EMBEDDING_MODEL, kind="sentence-transformer"):
+    """
+    Process-wide model instance for (kind, name), loaded on first use. Concurrent
+    first calls wait for a single load instead of each loading their own copy.
+    """
+    key = (kind, name)
+    model = _models.get(key)
+    if model is not None:
+        return model
+
+    with _lock:
+        load_lock = _load_locks.setdefault(key, threading.Lock())
+
+    with load_lock:
+        model = _models.get(key)
+        if model is not None:
+            return model
+
+        start = time.perf_counter()
+        model = _LOADERS[kind](name)
+        load_time = time.perf_counter() - start
+        memory = _model_memory_bytes(model)
+
+        with _lock:
+            _models[key] = model
+            _stats[key] = {
+                "kind": kind,
+                "model": name,
+                "load_time_s": round(load_time, 3),
+                "memory_mb": round(memory / 1024 / 1024, 1),
+                "loaded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            }
+        logger.info(f"🧠 Loaded {kind} '{name}' in {load_time:.2f}s ({memory / 1024 / 1024:.1f} MB)")
+        return model
+
+
+def get_embedder(name=DEFAULT_EMBEDDING_MODEL, backend="torch"):
+    """Embedding model for an `embed_backend` value ("torch", "onnx" or "onnx-int8")."""
+    if backend not in EMBED_BACKENDS:
+        raise ValueError(f"Unknown embed_backend '{backend}', expected one of {tuple(EMBED_BACKENDS)}")
+    return get_model(name, kind=EMBED_BACKENDS[backend])
+
+
+def embedder_id(name=DEFAULT_EMBEDDING_MODEL, backend="torch"):
+    """Cache identity of a model's vectors; int8 vectors differ from the fp32 ones."""
+    return name if backend in ("torch", "onnx") else f"{name}@{backend}"
+
+
+def registry_stats():
+    """Load time and memory of every model loaded so far in this process."""
+    with _lock:
+        return [dict(stats) for stats in _stats.values()]
+
+
+def unload_model(name=DEFAULT_EMBEDDING_MODEL, kind="sentence-transformer"):
+    """Drops a model from the registry so the next get_model() reloads it."""
+    with _lock:
+        _stats.pop((kind, name), None)
+        return _models.pop((kind, name), None) is not None
@@ -0,0 +1,166 @@
+import os
+import re
+import json
+import inspect
+import numpy as np
+from utils.log import setup_logger
+
+logger = setup_logger("onnx_backend_logger")
+
+ONNX_DIR = os.getenv("ONNX_MODEL_DIR", "onnx_models")
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_FILE = "model.int8.onnx"
+CONFIG_FILE = "embedder.json"
+
+
+def _model_dir(model_name, root=ONNX_DIR):
+    return os.path.join(root, re.sub(r"[^A-Za-z0-9_.-]+", "_", model_name))
+
+
+def export_onnx(model_name, out_dir):
+    """
+    Exports the transformer of a sentence-transformers model to ONNX along with
+    its tokenizer and the pooling/normalization settings needed to reproduce
+    SentenceTransformer.encode() outputs.
+    """
+    import torch
+    from sentence_transformers import SentenceTransformer
+    from sentence_transformers.models import Normalize
+
+    st = SentenceTransformer(model_name, device="cpu")
+    transformer = st[0].auto_model.eval()
+    tokenizer = st.tokenizer
+    sample = tokenizer(["export sample text"], return_tensors="pt")
+    input_names = [name for name in ("input_ids", "attention_mask", "token_type_ids") if name in sample]
+
+    class _HiddenStates(torch.nn.Module):
+        def __init__(self, model):
+            super().__init__()
+            self.model = model
+
+        def forward(self, *args):
+            return self.model(**dict(zip(input_names, args))).last_hidden_state
+
+    os.makedirs(out_dir, exist_ok=True)
+    axes = {0: "batch", 1: "sequence"}
+    # Newer torch defaults to the dynamo exporter (needs onnxscript); the
+    # TorchScript exporter handles dynamic_axes on every supported version
+    extra = {"dynamo": False} if "dynamo" in inspect.signature(torch.onnx.export).parameters else {}
+    with torch.no_grad():
+        torch.onnx.export(
+            _HiddenStates(transformer),
+            tuple(sample[name] for name in input_names),
+            os.path.join(out_dir, MODEL_FILE),
+            input_names=input_names,
+            output_names=["last_hidden_state"],
+            dynamic_axes={**{name: axes for name in input_names}, "last_hidden_state": axes},
+            opset_version=14,
+            **extra
+        )
+    tokenizer.save_pretrained(out_dir)
+
+    pooling = st[1]
+    config = {
+        "model_name": model_name,
+        "pooling": "cls" if getattr(pooling, "pooling_mode_cls_token", False) else "mean",
+        "normalize": any(isinstance(module, Normalize) for module in st),
+        "max_seq_length": st.max_seq_length,
+        "dimension": st.get_sentence_embedding_dimension(),
+        "input_names": input_names,
+    }
+    with open(os.path.join(out_dir, CONFIG_FILE), "w", encoding="utf-8") as f:
+        json.dump(config, f, indent=2)
+    logger.info(f"📦 Exported '{model_name}' to ONNX in {out_dir}")
+    return config
+
+
+def quantize_onnx(out_dir):
+    """Writes an int8 dynamically quantized copy of the exported model."""
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(
+        os.path.join(out_dir, MODEL_FILE),
+        os.path.join(out_dir, QUANTIZED_FILE),
+        weight_type=QuantType.QInt8
+    )
+    logger.info(f"📦 Quantized ONNX model to int8 in {out_dir}")
+
+
+class OnnxEmbedder:
+    """
+    Runs a sentence-transformers model through ONNX Runtime on CPU. Exports (and
+    optionally int8-quantizes) the model on first use, then mirrors the parts of
+    the SentenceTransformer interface the pipeline uses: encode(),
+    get_sentence_embedding_dimension(), max_seq_length and tokenizer.
+    """
+
+    def __init__(self, model_name, quantize=False, root=ONNX_DIR, threads=None):
+        import onnxruntime as ort
+        from transformers import AutoTokenizer
+
+        self.model_name = model_name
+        self.quantize = quantize
+        out_dir = _model_dir(model_name, root)
+        if not os.path.exists(os.path.join(out_dir, CONFIG_FILE)):
+            export_onnx(model_name, out_dir)
+        model_file = QUANTIZED_FILE if quantize else MODEL_FILE
+        if quantize and not os.path.exists(os.path.join(out_dir, QUANTIZED_FILE)):
+            quantize_onnx(out_dir)
+
+        with open(os.path.join(out_dir, CONFIG_FILE), "r", encoding="utf-8") as f:
+            self.config = json.load(f)
+        self.max_seq_length = self.config["max_seq_length"]
+        self.tokenizer = AutoTokenizer.from_pretrained(out_dir)
+
+        # Reported by the model registry in place of torch parameter memory
+        self.memory_bytes = os.path.getsize(os.path.join(out_dir, model_file))
+        options = ort.SessionOptions()
+        if threads:
+            options.intra_op_num_threads = int(threads)
+        self.session = ort.InferenceSession(
+            os.path.join(out_dir, model_file), sess_options=options, providers=["CPUExecutionProvider"]
+        )
+
+    def get_sentence_embedding_dimension(self):
+        return self.config["dimension"]
+
+    def _encode_batch(self, texts):
+        tokens = self.tokenizer(
+            texts, padding=True, truncation=True, max_length=self.max_seq_length, return_tensors="np"
+        )
+        feed = {name: tokens[name].astype(np.int64) for name in self.config["input_names"]}
+        hidden = self.session.run(None, feed)[0]
+
+        if self.config["pooling"] == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = feed["attention_mask"][..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.config["normalize"]:
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled.astype(np.float32)
+
+    def encode(self, sentences, batch_size=32, show_progress_bar=False, convert_to_numpy=True, **kwargs):
+        """Same call shape as SentenceTransformer.encode; a single string returns a 1-D vector."""
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.get_sentence_embedding_dimension()), dtype=np.float32)
+        vectors = np.concatenate([
+            self._encode_batch(texts[i:i + batch_size]) for i in range(0, len(texts), batch_size)
+        ])
+        return vectors[0] if single else vectors
+
+
+def parity_check(model_name, texts, quantize=False):
+    """
+    Cosine similarity between PyTorch and ONNX embeddings of `texts`.
+    Returns {"min": ..., "mean": ...}; fp32 exports should be ~1.0, int8 >= ~0.98.
+    """
+    from utils.model_registry import get_model
+    reference = get_model(model_name).encode(texts, show_progress_bar=False, convert_to_numpy=True)
+    candidate = OnnxEmbedder(model_name, quantize=quantize).encode(texts)
+    reference = reference / np.linalg.norm(reference, axis=1, keepdims=True)
+    candidate = candidate / np.linalg.norm(candidate, axis=1, keepdims=True)
+    cosine = (reference * candidate).sum(axis=1)
+    return {"min": float(cosine.min()), "mean": float(cosine.mean())}
@@ -1,8 +1,11 @@
 import os
 import json
 import fitz
+from concurrent.futures import ProcessPoolExecutor
 from langchain_core.runnables.base import Runnable  # PyMuPDF
 from utils.log import setup_logger  # or your correct logger import
+from utils.records import is_jsonl, write_records
+from utils.persist import persist_records
 from langchain_core.runnables import RunnableLambda
 
 TEMP_OUTPUT_DIR = "/Users/ssris/Desktop/RIMSAB/AI-MANTRA/RAG_TENDOR/temp_uploads"
@@ -10,48 +13,133 @@ os.makedirs(TEMP_OUTPUT_DIR, exist_ok=True)
 
 logger = setup_logger()
 
-def pdf_to_basic_json(pdf_path, output_json_path):
-    """Extracts text from each page of a PDF and saves as a JSON list."""
+def _extract_page_range(task):
+    """Worker: opens its own fitz document and extracts pages [start, end)."""
+    pdf_path, start, end = task
+    pages = []
+    with fitz.open(pdf_path) as doc:
+        for page_num in range(start, end):
+            try:
+                page = doc.load_page(page_num)
+                pages.append({
+                    "page_number": page_num,
+                    "text": page.get_text("text")
+                })
+            except Exception as e:
+                logger.warning(f"⚠️ Error extracting page {page_num + 1}: {e}")
+    return pages
+
+
+def _page_ranges(total_pages, workers, pages_per_range=None):
+    """Splits [0, total_pages) into contiguous ranges, a few per worker for load balancing."""
+    if not pages_per_range:
+        pages_per_range = max(1, -(-total_pages // (workers * 4)))
+    return [
+        (start, min(start + pages_per_range, total_pages))
+        for start in range(0, total_pages, pages_per_range)
+    ]
+
+
+def extract_pages_parallel(pdf_path, total_pages, workers, pages_per_range=None):
+    """
+    Extracts pages with a process pool, yielding them in page order. Each worker
+    opens the PDF itself so no fitz objects cross process boundaries.
+    """
+    ranges = _page_ranges(total_pages, workers, pages_per_range)
+    logger.info(f"⚙️ Extracting {total_pages} pages in {len(ranges)} ranges with {workers} workers")
+
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        # map() yields in submission order, so ranges stay ordered
+        for pages in pool.map(_extract_page_range, [(pdf_path, s, e) for s, e in ranges]):
+            if pages:
+                logger.info(f"✅ Extracted Pages {pages[0]['page_number']}-{pages[-1]['page_number']}")
+            yield from pages
+
+
+def _resolve_pdf_path(pdf_path):
+    """Returns a filesystem path for a path string or a Streamlit UploadedFile."""
     import tempfile
 
     # Handle UploadedFile from Streamlits
     if hasattr(pdf_path, "read"):  # Likely a Streamlit UploadedFile
         with tempfile.NamedTemporaryFile(delete=False, suffix=".pdf") as tmp:
             tmp.write(pdf_path.read())
-            tmp_path = tmp.name
-    elif isinstance(pdf_path, str) and os.path.exists(pdf_path):
-        tmp_path = pdf_path
-    else:
-        logger.error("❌ Invalid PDF path or file not found.")
-        return []
+            return tmp.name
+    if isinstance(pdf_path, str) and os.path.exists(pdf_path):
+        return pdf_path
+    logger.error("❌ Invalid PDF path or file not found.")
+    return None
+
+
+def iter_pdf_pages(pdf_path, workers=1, pages_per_range=None):
+    """
+    Yields {"page_number", "text"} dicts in page order without holding the
+    document in memory. With workers > 1 page ranges come from a process pool.
+    """
+    tmp_path = _resolve_pdf_path(pdf_path)
+    if not tmp_path:
+        return
 
     logger.info(f"📄 Loading PDF: {tmp_path}")
     try:
         doc = fitz.open(tmp_path)
     except Exception as e:
         logger.exception(f"Error opening PDF: {e}")
-        return []
+        return
 
-    logger.info(f"📄 Total Pages: {len(doc)}")
-    
-    json_data = []
-    for page_num in range(len(doc)):
+    total_pages = len(doc)
+    logger.info(f"📄 Total Pages: {total_pages}")
+
+    next_page = 0
+    workers = min(workers or 1, total_pages)
+    if workers > 1:
+        try:
+            for page in extract_pages_parallel(tmp_path, total_pages, workers, pages_per_range):
+                next_page = page["page_number"] + 1
+                yield page
+            next_page = total_pages
+        except Exception as e:
+            logger.exception(f"Parallel extraction failed, continuing serially from page {next_page}: {e}")
+
+    for page_num in range(next_page, total_pages):
         try:
             page = doc.load_page(page_num)
             text = page.get_text("text")
             if page_num % 100 == 0:
                 logger.info(f"✅ Extracted Page {page_num}")
-            json_data.append({
+            yield {
                 "page_number": page_num,
                 "text": text
-            })
+            }
         except Exception as e:
             logger.warning(f"⚠️ Error extracting page {page_num + 1}: {e}")
             continue
-        
+    doc.close()
+
+
+def stream_pdf_to_records(pdf_path, output_path, workers=1, pages_per_range=None):
+    """Streams pages straight into `output_path` and returns the page count."""
+    try:
+        count = write_records(iter_pdf_pages(pdf_path, workers, pages_per_range), output_path)
+        logger.info(f"✅ Successfully streamed {count} pages to: {output_path}")
+        return count
+    except Exception as e:
+        logger.exception(f"Error streaming pages: {e}")
+        return 0
+
+
+def pdf_to_basic_json(pdf_path, output_json_path, workers=1, pages_per_range=None):
+    """
+    Extracts text from each page of a PDF, saves it (JSONL or JSON, by extension)
+    and returns the page list. With workers > 1 the page ranges are extracted in
+    a process pool.
+    """
+    json_data = list(iter_pdf_pages(pdf_path, workers, pages_per_range))
+    if not json_data:
+        return []
+
     try:
-        with open(output_json_path, "w", encoding="utf-8") as f:
-            json.dump(json_data, f, indent=2, ensure_ascii=False)
+        write_records(json_data, output_json_path)
         logger.info(f"✅ Successfully written JSON to: {output_json_path}")
     except Exception as e:
         logger.exception(f"Error writing JSON: {e}")
@@ -73,8 +161,41 @@ def _pdf_to_basic_json_runnable_impl(inputs):
         # Ensure output directory exists
         os.makedirs(os.path.dirname(raw_json_path), exist_ok=True)
         
-        # Run conversion
-        pages = pdf_to_basic_json(pdf_path, raw_json_path)
+        workers = inputs.get("extract_workers", 1)
+        pages_per_range = inputs.get("pages_per_range")
+        persist = inputs.get("persist", "sync")
+
+        # In-memory handoff: later stages take "pages" from the inputs, the
+        # artifact is written in the background (or not at all)
+        if persist != "sync":
+            pages = list(iter_pdf_pages(pdf_path, workers, pages_per_range))
+            if not pages:
+                raise ValueError("❌ PDF to JSON returned no pages!")
+
+            persist_records(pages, raw_json_path, persist)
+            logger.info(f"✅ Extracted {len(pages)} pages from {pdf_path} (persist={persist})")
+            return {
+                **inputs,
+                "pages": pages,
+                "page_count": len(pages),
+                "raw_json_path": raw_json_path
+            }
+
+        # JSONL artifacts are streamed page by page; downstream stages read them back lazily
+        if is_jsonl(raw_json_path):
+            page_count = stream_pdf_to_records(pdf_path, raw_json_path, workers, pages_per_range)
+            if not page_count:
+                raise ValueError("❌ PDF to JSON returned no pages!")
+
+            logger.info(f"✅ Extracted {page_count} pages from {pdf_path}")
+            return {
+                **inputs,
+                "page_count": page_count,
+                "raw_json_path": raw_json_path
+            }
+
+        # Run conversion (extract_workers > 1 enables the process pool)
+        pages = pdf_to_basic_json(pdf_path, raw_json_path, workers=workers, pages_per_range=pages_per_range)
 
         if not pages:
             raise ValueError("❌ PDF to JSON returned no pages!")
@@ -84,6 +205,7 @@ def _pdf_to_basic_json_runnable_impl(inputs):
         return {
             **inputs,
             "pages": pages,
+            "page_count": len(pages),
             "raw_json_path": raw_json_path
         }
 
@@ -0,0 +1,66 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor, wait
+from utils.log import setup_logger
+from utils.records import write_records, write_vectors
+
+logger = setup_logger("persist_logger")
+
+# persist modes: "sync" writes before the stage returns, "async" hands the write
+# to a background thread, "off" keeps artifacts in memory only
+PERSIST_MODES = ("sync", "async", "off")
+
+_executor = ThreadPoolExecutor(max_workers=2, thread_name_prefix="persist")
+_pending = set()
+_lock = threading.Lock()
+
+
+def _finished(future, path):
+    with _lock:
+        _pending.discard(future)
+    error = future.exception()
+    if error:
+        logger.error(f"❌ Background write of {path} failed: {error}")
+    else:
+        logger.info(f"💾 Persisted {future.result()} records to {path}")
+
+
+def _submit(write, path, *args):
+    future = _executor.submit(write, *args)
+    with _lock:
+        _pending.add(future)
+    future.add_done_callback(lambda f: _finished(f, path))
+    return future
+
+
+def persist_records(records, path, mode="sync"):
+    """
+    Writes `records` to `path` according to `mode`. Returns the record count for
+    sync writes, a Future for async writes and None when persistence is off.
+    """
+    if mode not in PERSIST_MODES:
+        raise ValueError(f"Unknown persist mode '{mode}', expected one of {PERSIST_MODES}")
+    if mode == "off" or not path:
+        return None
+    if mode == "sync":
+        return write_records(records, path)
+    return _submit(write_records, path, records, path)
+
+
+def persist_vectors(embeddings, path, mode="sync", dtype="float32"):
+    """Same as persist_records for an embedding matrix written with write_vectors."""
+    if mode not in PERSIST_MODES:
+        raise ValueError(f"Unknown persist mode '{mode}', expected one of {PERSIST_MODES}")
+    if mode == "off" or not path:
+        return None
+    if mode == "sync":
+        return write_vectors(embeddings, path, dtype)
+    return _submit(write_vectors, path, embeddings, path, dtype)
+
+
+def wait_for_persistence(timeout=None):
+    """Blocks until every queued background write has finished (e.g. before reading artifacts back)."""
+    with _lock:
+        pending = list(_pending)
+    if pending:
+        wait(pending, timeout=timeout)
+    return len(pending)
@@ -1,8 +1,14 @@
 import json
 import sys
-from qdrant_client import QdrantClient
-from qdrant_client.models import VectorParams, Distance, PointStruct
-from sentence_transformers import SentenceTransformer
+from qdrant_client.models import VectorParams, Distance, PointStruct, ScoredPoint, Filter, FieldCondition, MatchValue, MatchAny, Range, FilterSelector, PointIdsList, PayloadSchemaType
+import uuid
+import hashlib
+import time
+import random
+import threading
+import numpy as np
+from concurrent.futures import ThreadPoolExecutor, wait, FIRST_COMPLETED
+from itertools import islice
 from langchain_core.runnables import Runnable
 from dotenv import load_dotenv
 import os
@@ -13,94 +19,410 @@ os.environ["TOKENIZERS_PARALLELISM"] = "false"
 
 from utils.log import setup_logger
 from utils.llm import get_groq_response, build_prompt
+from utils.records import read_records, load_vectors, vectors_path
+from utils.model_registry import DEFAULT_EMBEDDING_MODEL
+from utils.query_cache import embed_query
+from utils.vector_store import open_vector_store, as_vector_store
+from utils.collection_profiles import (
+    DEFAULT_COLLECTION_PROFILE, collection_config, get_profile, profile_updates, matching_profile, config_search_params,
+    set_indexing
+)
+from utils.sparse_index import index_points, delete_points, count_points, sparse_search
+from utils.retrieval import rrf_fuse, mmr_select, MMR_LAMBDA
+from utils.context_assembly import assemble_context, neighbour_keys, context_stats
+from utils.rerank import rerank as rerank_hits, DEFAULT_RERANK_MODEL, RERANK_CANDIDATES, RERANK_BUDGET_MS
 
 # Setup
 load_dotenv()
 
 logger = setup_logger("qdrant_logger")
-model = SentenceTransformer("sentence-transformers/all-MiniLM-L6-v2")
 
-def upload_in_batches(client, collection_name, points, batch_size=50):
-    """Uploads points to Qdrant in batches."""
-    total_batches = (len(points) + batch_size - 1) // batch_size  # Ceiling division
+# Upload engine defaults: points per request, concurrent in-flight requests, retries per batch
+UPLOAD_BATCH_SIZE = 256
+UPLOAD_PARALLEL = 4
+UPLOAD_RETRIES = 3
+UPLOAD_BACKOFF = 0.5
 
-    for i in range(0, len(points), batch_size):
-        batch = points[i:i + batch_size]
+# Payload fields filtered on at query time; indexed so filters are applied inside the HNSW search
+PAYLOAD_INDEXES = {
+    "metadata.source": PayloadSchemaType.KEYWORD,
+    "metadata.page_number": PayloadSchemaType.INTEGER,
+    "metadata.chunk_index": PayloadSchemaType.INTEGER,
+    "metadata.description": PayloadSchemaType.KEYWORD,
+}
+
+# Candidates taken from each of the dense and BM25 searches before fusion
+HYBRID_FETCH_K = 20
+_search_executor = ThreadPoolExecutor(max_workers=4, thread_name_prefix="hybrid-search")
+
+# Query SearchParams per (store location, collection), read from the collection's tuning once
+_search_params = {}
+_search_params_lock = threading.Lock()
+
+# Namespace of the point ids derived from a chunk's source, offsets and text
+POINT_ID_NAMESPACE = uuid.UUID("6f1c2b8e-3f0a-5d4e-9b7a-2c1d0e8f4a63")
+
+
+def _upsert_with_retry(client, collection_name, batch, wait, retries, backoff):
+    """Upserts one batch, retrying with exponential backoff (plus jitter) on failure."""
+    for attempt in range(retries + 1):
+        try:
+            client.upsert(collection_name, batch, wait=wait)
+            return len(batch)
+        except Exception as e:
+            if attempt == retries:
+                raise
+            delay = backoff * (2 ** attempt) * (1 + random.random() / 2)
+            logger.warning(f"⚠️ Upsert of {len(batch)} points failed ({e}); retry {attempt + 1}/{retries} in {delay:.1f}s")
+            time.sleep(delay)
+
+
+def upload_in_batches(client, collection_name, points, batch_size=UPLOAD_BATCH_SIZE, parallel=UPLOAD_PARALLEL,
+                      retries=UPLOAD_RETRIES, backoff=UPLOAD_BACKOFF):
+    """
+    Streams points (a list or any iterable, consumed lazily) to a vector store
+    (or bare QdrantClient) in batches with up to `parallel` requests in flight.
+    Batches are sent with wait=False so the server acknowledges them before
+    indexing; the last batch
+    is held back and sent with wait=True once the others are acknowledged, as a
+    consistency barrier (updates are applied in order). Failed batches are
+    retried with backoff and counted in the returned stats.
+    """
+    client = as_vector_store(client)
+    if not client.concurrent_writes:
+        parallel = 1
+    points = iter(points)
+    start = time.perf_counter()
+    stats = {"points": 0, "batches": 0, "failed_batches": 0, "failed_points": 0}
+
+    def collect(done):
+        for future in done:
+            size = in_flight.pop(future)
+            try:
+                stats["points"] += future.result()
+            except Exception as e:
+                stats["failed_batches"] += 1
+                stats["failed_points"] += size
+                logger.error(f"❌ Giving up on a batch of {size} points for '{collection_name}': {e}")
+
+    in_flight = {}
+    with ThreadPoolExecutor(max_workers=max(1, parallel), thread_name_prefix="qdrant-upload") as executor:
+        batch = list(islice(points, batch_size))
+        while batch:
+            next_batch = list(islice(points, batch_size))
+            if not next_batch:
+                break
+            if len(in_flight) >= max(1, parallel):
+                done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+                collect(done)
+            future = executor.submit(_upsert_with_retry, client, collection_name, batch, False, retries, backoff)
+            in_flight[future] = len(batch)
+            stats["batches"] += 1
+            batch = next_batch
+
+        collect(wait(in_flight).done)
+
+    # Barrier: returns once this batch, and every update queued before it, is applied
+    if batch:
+        stats["batches"] += 1
         try:
-            client.upsert(collection_name=collection_name, points=batch)
+            stats["points"] += _upsert_with_retry(client, collection_name, batch, True, retries, backoff)
         except Exception as e:
-            logger.error(f"Error uploading batch {i // batch_size + 1}: {e}")
+            stats["failed_batches"] += 1
+            stats["failed_points"] += len(batch)
+            logger.error(f"❌ Giving up on the final batch of {len(batch)} points for '{collection_name}': {e}")
+
+    stats["seconds"] = round(time.perf_counter() - start, 3)
+    stats["points_per_sec"] = round(stats["points"] / stats["seconds"], 1) if stats["seconds"] else 0.0
+    logger.info(
+        f"✅ Uploaded {stats['points']} points in {stats['batches']} batches to '{collection_name}' "
+        f"({stats['points_per_sec']} points/sec, {stats['failed_batches']} failed batches)"
+    )
+    return stats
+
 
-    logger.info(f"✅ Uploaded all {total_batches} batches to collection '{collection_name}'")
+def _source_filter(sources):
+    return Filter(must=[FieldCondition(key="metadata.source", match=MatchAny(any=list(sources)))])
 
 
-def upload_embed_to_qdrant(json_path, collection_name, qdrant_url, qdrant_api_key=None, vector_size=384):
+def build_search_filter(sources=None, page_range=None, sections=None):
     """
-    Uploads embedded chunks from JSON to a Qdrant collection.
-    Only uploads if collection doesn't exist or has different vector parameters.
+    Payload filter scoping a search to documents (`sources`), an inclusive
+    (first, last) page_number range and/or section descriptions (`sections`).
+    Either end of `page_range` may be None. Returns None when nothing is set.
     """
-    with open(json_path, "r", encoding="utf-8") as f:
-        data = json.load(f)
-    logger.info(f"Loaded {len(data)} chunks from {json_path}")
+    if isinstance(sources, str):
+        sources = [sources]
+    if isinstance(sections, str):
+        sections = [sections]
+    conditions = []
+    if sources:
+        conditions.append(FieldCondition(key="metadata.source", match=MatchAny(any=list(sources))))
+    if page_range and any(page is not None for page in page_range):
+        first, last = page_range
+        conditions.append(FieldCondition(key="metadata.page_number", range=Range(gte=first, lte=last)))
+    if sections:
+        conditions.append(FieldCondition(key="metadata.description", match=MatchAny(any=list(sections))))
+    return Filter(must=conditions) if conditions else None
+
+
+def ensure_payload_indexes(client, collection_name):
+    """Creates the PAYLOAD_INDEXES on a collection; existing indexes are left as they are."""
+    client = as_vector_store(client)
+    for field_name, field_schema in PAYLOAD_INDEXES.items():
+        try:
+            client.create_payload_index(collection_name, field_name, field_schema)
+        except Exception as e:
+            logger.warning(f"⚠️ Could not index payload field '{field_name}' on '{collection_name}': {e}")
+
+
+def _sha1(value):
+    return hashlib.sha1(str(value).encode("utf-8", errors="replace")).hexdigest()
+
+
+def point_id(metadata, text):
+    """
+    Point id of a chunk derived from its content: a UUID of the source hash,
+    the chunk's char offsets and the text hash. Unchanged chunks keep their id
+    across re-ingestions and ids never collide across the documents sharing a collection.
+    """
+    key = f"{_sha1(metadata.get('source'))}:{metadata.get('char_start')}:{metadata.get('char_end')}:{_sha1(text)}"
+    return str(uuid.uuid5(POINT_ID_NAMESPACE, key))
+
+
+def delete_page_range_points(client, collection_name, source, first_page, last_page):
+    """Deletes the points of `source` whose chunk page_number falls in [first_page, last_page]."""
+    page_filter = Filter(must=[
+        FieldCondition(key="metadata.source", match=MatchValue(value=source)),
+        FieldCondition(key="metadata.page_number", range=Range(gte=first_page, lte=last_page)),
+    ])
+    store = as_vector_store(client)
+    store.delete(collection_name, FilterSelector(filter=page_filter), wait=True)
+    delete_points(collection_name, query_filter=page_filter, location=store.location)
+
+
+def _sparse_points(data):
+    return ((point_id(chunk["metadata"], chunk["text"]), chunk["text"], {"text": chunk["text"], "metadata": chunk["metadata"]}) for chunk in data)
+
+
+def _vector_at(data, embeddings, i):
+    """Vector of record i: a row of the in-memory/memory-mapped array, or the list stored in the record."""
+    if embeddings is not None:
+        return np.asarray(embeddings[i], dtype=np.float32).tolist()
+    return data[i]["embedding"]
+
+
+def load_embed_artifact(json_path, vectors_file=None):
+    """
+    Reads an embed artifact: metadata records plus, when present, the memory-mapped
+    .npy vectors written next to them. Legacy artifacts carry "embedding" lists
+    in the records and return None for the vectors.
+    """
+    data = read_records(json_path)
+    vectors_file = vectors_file or vectors_path(json_path)
+    if data and "embedding" not in data[0] and os.path.exists(vectors_file):
+        embeddings = load_vectors(vectors_file)
+        if len(embeddings) != len(data):
+            raise ValueError(f"{vectors_file} holds {len(embeddings)} vectors for {len(data)} records")
+        return data, embeddings
+    return data, None
+
+
+def upsert_embed_data(client, collection_name, embed_data, embeddings=None, batch_size=UPLOAD_BATCH_SIZE):
+    """
+    Upserts embedded chunks into the collection and its BM25 index. Ids are
+    derived from the chunk content, so a chunk that is already stored is overwritten in place.
+    """
+    points = (
+        PointStruct(
+            id=point_id(chunk["metadata"], chunk["text"]),
+            vector=_vector_at(embed_data, embeddings, i),
+            payload={"text": chunk["text"], "metadata": chunk["metadata"]}
+        )
+        for i, chunk in enumerate(embed_data)
+    )
+    stats = upload_in_batches(client, collection_name, points, batch_size=batch_size)
+    index_points(collection_name, _sparse_points(embed_data), location=as_vector_store(client).location)
+    return stats["points"]
+
+
+def upload_embed_to_qdrant(json_path, collection_name, qdrant_url, qdrant_api_key=None, vector_size=384, mode="sync",
+                           data=None, embeddings=None, vectors_file=None, batch_size=UPLOAD_BATCH_SIZE,
+                           parallel=UPLOAD_PARALLEL, retries=UPLOAD_RETRIES, upload_stats=None,
+                           vector_backend="qdrant", sparse_index=True, collection_profile=DEFAULT_COLLECTION_PROFILE):
+    """
+    Uploads embedded chunks to a collection of the `vector_backend` store
+    ("qdrant" server or the in-process "local" store), from `data`/`embeddings` when
+    they are handed over in memory, otherwise from the JSONL/JSON artifact and
+    its memory-mapped .npy vectors.
+    Nothing is uploaded if the collection exists with different vector parameters.
+
+    Several documents can share one collection: point ids are derived from the
+    chunk content (see point_id) and the filtered payload fields are indexed.
+    The ids already stored for the uploaded sources are fetched in one scroll;
+    mode="sync" uploads only the new ids and then deletes the stale ones,
+    mode="replace" re-uploads every chunk and deletes the stale ones, and
+    mode="append" uploads the new ids and keeps the stale ones. The legacy
+    mode="skip" behaves as "sync".
+    With `sparse_index` the chunks are also added to the collection's BM25
+    index for hybrid retrieval.
+    A new collection is created with the `collection_profile` tuning (see
+    utils.collection_profiles) and an existing one is updated to it; profiles
+    with bulk_load upload with indexing switched off.
+    Upload throughput is written into the `upload_stats` dict when one is given.
+    Returns the store, which search_qdrant/rag_query accept as the client.
+    """
+    if data is None:
+        data, embeddings = load_embed_artifact(json_path, vectors_file)
+        logger.info(f"Loaded {len(data)} chunks from {json_path}")
+
+    if mode == "skip":
+        mode = "sync"
+    if mode not in ("sync", "replace", "append"):
+        raise ValueError(f"Unknown upload mode '{mode}'")
+    profile = get_profile(collection_profile)
+
+    client = open_vector_store(vector_backend, qdrant_url, qdrant_api_key)
+    sources = {chunk["metadata"].get("source") for chunk in data}
+    existing, created = set(), False
 
-    client = QdrantClient(url=qdrant_url, api_key=qdrant_api_key)
-    
     # Check if collection exists and has the same configuration
     if client.collection_exists(collection_name):
-        collection_info = client.get_collection(collection_name)
-        existing_config = collection_info.config.params.vectors
+        existing_config = client.vectors_config(collection_name)
         
         # Check if vector size and distance match
-        if (hasattr(existing_config, 'size') and 
-            existing_config.size == vector_size and 
-            existing_config.distance == Distance.COSINE):
-            
-            existing_count = client.count(collection_name=collection_name, exact=True).count
-            if existing_count > 0:
-                logger.info(f"✅ Collection '{collection_name}' already exists with {existing_count} points and matching configuration. Skipping upload.")
-                return client
-            else:
-                logger.info(f"📝 Collection '{collection_name}' exists with matching configuration but is empty. Proceeding to upload.")
-        else:
+        if not (hasattr(existing_config, 'size') and 
+                existing_config.size == vector_size and 
+                existing_config.distance == Distance.COSINE):
             logger.warning(f"⚠️ Collection '{collection_name}' exists but with different vector configuration. Skipping upload.")
             logger.warning(f"   Existing: size={existing_config.size}, distance={existing_config.distance}")
             logger.warning(f"   Requested: size={vector_size}, distance={Distance.COSINE}")
             return client
+        current = client.collection_config(collection_name)
+        updates = profile_updates(collection_profile, current) if current is not None else {}
+        if updates:
+            client.update_collection(collection_name, **updates)
+            forget_search_params(client, collection_name)
+            logger.info(f"🛠️ Moved '{collection_name}' to the {collection_profile} profile ({', '.join(sorted(updates))})")
+        # Bulk existence pre-check: one scroll over the ids stored for these sources
+        existing = {str(record.id) for record in client.scroll(collection_name, scroll_filter=_source_filter(sources))}
     else:
         # Create new collection
-        client.create_collection(
-            collection_name=collection_name,
-            vectors_config=VectorParams(size=vector_size, distance=Distance.COSINE)
-        )
-        logger.info(f"🆕 Created collection '{collection_name}' with vector size {vector_size}")
-    
-    # Upload points
-    points = [
+        client.create_collection(collection_name, **collection_config(collection_profile, vector_size))
+        forget_search_params(client, collection_name)
+        created = True
+        logger.info(f"🆕 Created collection '{collection_name}' with vector size {vector_size} ({collection_profile} profile)")
+    ensure_payload_indexes(client, collection_name)
+
+    ids = [point_id(chunk["metadata"], chunk["text"]) for chunk in data]
+    upload_rows = [i for i, pid in enumerate(ids) if mode == "replace" or pid not in existing]
+    stale = [] if mode == "append" else sorted(existing - set(ids))
+    logger.info(
+        f"🔁 '{collection_name}' holds {len(existing)} points for {sorted(sources, key=str)}: "
+        f"uploading {len(upload_rows)} of {len(ids)} chunks, {len(stale)} stale"
+    )
+
+    # Upload points; vectors are converted batch by batch straight from the (memory-mapped) array
+    points = (
         PointStruct(
-            id=i,
-            vector=chunk["embedding"],
-            payload={"text": chunk["text"], "metadata": chunk["metadata"]}
+            id=ids[i],
+            vector=_vector_at(data, embeddings, i),
+            payload={"text": data[i]["text"], "metadata": data[i]["metadata"]}
         )
-        for i, chunk in enumerate(data)
-    ]
-    
-    client.upsert(
-        collection_name=collection_name,
-        points=points
+        for i in upload_rows
     )
-    logger.info(f"✅ Uploaded {len(points)} points to collection '{collection_name}'")
+    # Bulk load: the HNSW index is built once after the upload instead of while segments fill
+    if profile.get("bulk_load") and upload_rows and not created:
+        set_indexing(client, collection_name, False)
+    try:
+        stats = upload_in_batches(client, collection_name, points, batch_size=batch_size, parallel=parallel, retries=retries)
+    finally:
+        if profile.get("bulk_load") and (upload_rows or created):
+            set_indexing(client, collection_name, True)
+    stats["skipped_points"] = len(ids) - len(upload_rows)
+    stats["deleted_points"] = 0
+    if stats["failed_points"]:
+        if upload_stats is not None:
+            upload_stats.update(stats)
+        raise RuntimeError(f"{stats['failed_points']} of {len(upload_rows)} points failed to upload to '{collection_name}'")
+    # Stale points go only once every new one is stored, so a failed upload never loses the old version
+    if stale:
+        client.delete(collection_name, PointIdsList(points=stale), wait=True)
+        stats["deleted_points"] = len(stale)
+    if upload_stats is not None:
+        upload_stats.update(stats)
+
+    if sparse_index:
+        location = client.location
+        if mode == "replace" or count_points(collection_name, _source_filter(sources), location) != len(existing):
+            # Full re-index of these sources, also when the BM25 index is out of step with the store
+            keep = _source_filter(sources) if mode != "append" else None
+            indexed = index_points(collection_name, _sparse_points(data), replace_filter=keep, location=location)
+        else:
+            if stale:
+                delete_points(collection_name, point_ids=stale, location=location)
+            indexed = index_points(
+                collection_name, (chunk for chunk in _sparse_points(data) if chunk[0] not in existing), location=location
+            )
+        logger.info(f"🔤 BM25 index of '{collection_name}' holds {indexed} chunks")
     
     return client
  
-def search_qdrant(query_text, client: QdrantClient, collection_name: str, top_k: int = 5):
+def collection_search_params(client, collection_name, collection_profile=None):
+    """
+    Query SearchParams for a collection, derived from its actual tuning (read
+    once per collection and cached) rather than from what the caller expects.
+    A `collection_profile` that the collection is not tuned to is logged and
+    ignored. Stores that keep no tuning (the local backend, qdrant's embedded
+    mode) take no search params, so None is returned for them.
+    """
+    store = as_vector_store(client)
+    key = (store.location, collection_name)
+    with _search_params_lock:
+        if key in _search_params:
+            return _search_params[key]
+    try:
+        config = store.collection_config(collection_name)
+    except Exception as e:
+        logger.warning(f"⚠️ Could not read the tuning of '{collection_name}', searching with defaults: {e}")
+        return None
+
+    if config is None:
+        params = None
+        if collection_profile not in (None, DEFAULT_COLLECTION_PROFILE):
+            logger.info(f"ℹ️ '{collection_name}' is on a store without tuning; the {collection_profile} profile has no effect on search")
+    else:
+        params = config_search_params(config)
+        actual = matching_profile(config)
+        if collection_profile and actual != collection_profile:
+            logger.warning(
+                f"⚠️ '{collection_name}' is tuned to the {actual or 'custom'} profile, not {collection_profile}; "
+                f"searching with its actual settings"
+            )
+    with _search_params_lock:
+        _search_params[key] = params
+    return params
+
+
+def forget_search_params(client, collection_name):
+    """Drops the cached SearchParams of a collection after its tuning changed."""
+    with _search_params_lock:
+        _search_params.pop((as_vector_store(client).location, collection_name), None)
+
+
+def search_qdrant(query_text, client, collection_name: str, top_k: int = 5, model_name=DEFAULT_EMBEDDING_MODEL, backend="torch",
+                  sources=None, page_range=None, sections=None, with_vectors=False, search_params=None):
     """
-    Searches Qdrant for the most similar chunks to the query text.
+    Searches the vector store (or a bare QdrantClient) for the most similar chunks to the query text.
+    `sources`, `page_range` and `sections` restrict the search to documents,
+    pages and sections (see build_search_filter); the filter is applied by the store.
+    `search_params` (HNSW ef, quantization rescoring) are passed to qdrant as they are.
     """
-    query_vector = model.encode([query_text], show_progress_bar=False, convert_to_numpy=True)
-    result = client.search(
-        collection_name=collection_name,
-        query_vector=query_vector[0].tolist(),
-        limit=top_k
+    query_vector = embed_query(query_text, model_name, backend)
+    query_filter = build_search_filter(sources, page_range, sections)
+    result = as_vector_store(client).search(
+        collection_name, query_vector.tolist(), limit=top_k, query_filter=query_filter, with_vectors=with_vectors,
+        search_params=search_params
     )
 
     logger.info(f"Retrieved {len(result)} results for query: '{query_text}'")
@@ -115,26 +437,156 @@ def search_qdrant(query_text, client: QdrantClient, collection_name: str, top_k:
     return result
 
 
-def rag_query(client, collection_name, query_text, top_k=5):
+def _attach_vectors(client, collection_name, hits):
+    """Fills in the vectors of hits that came without one (BM25-only hits)."""
+    missing = [hit.id for hit in hits if hit.vector is None]
+    if not missing:
+        return hits
+    vectors = {record.id: record.vector for record in as_vector_store(client).retrieve(collection_name, missing, with_vectors=True)}
+    return [
+        hit if hit.vector is not None else ScoredPoint(
+            id=hit.id, version=hit.version, score=hit.score, payload=hit.payload, vector=vectors.get(hit.id)
+        )
+        for hit in hits
+    ]
+
+
+def hybrid_search(query_text, client, collection_name, top_k=5, model_name=DEFAULT_EMBEDDING_MODEL, backend="torch",
+                  sources=None, page_range=None, sections=None, fetch_k=HYBRID_FETCH_K, with_vectors=False,
+                  search_params=None):
+    """
+    Dense and BM25 search run concurrently, `fetch_k` candidates each, fused
+    with reciprocal rank fusion into the best `top_k`. BM25 catches exact
+    tokens (clause numbers, annexure IDs, amounts) the embedding misses.
+    Collections without a BM25 index get the dense results.
+    """
+    fetch_k = max(fetch_k, top_k)
+    query_filter = build_search_filter(sources, page_range, sections)
+    sparse_future = _search_executor.submit(
+        sparse_search, collection_name, query_text, fetch_k, query_filter, as_vector_store(client).location
+    )
+    dense = search_qdrant(
+        query_text, client, collection_name, top_k=fetch_k, model_name=model_name, backend=backend,
+        sources=sources, page_range=page_range, sections=sections, with_vectors=with_vectors,
+        search_params=search_params
+    )
+    try:
+        sparse = sparse_future.result()
+    except Exception as e:
+        logger.warning(f"⚠️ BM25 search failed, using dense results only: {e}")
+        sparse = []
+    if not sparse:
+        return dense[:top_k]
+    fused = rrf_fuse([dense, sparse], top_k)
+    logger.info(f"🔀 Fused {len(dense)} dense + {len(sparse)} BM25 candidates into {len(fused)} results")
+    return _attach_vectors(client, collection_name, fused) if with_vectors else fused
+
+
+def fetch_neighbours(client, collection_name, hits):
+    """The chunks right before and after each hit (same source), looked up by chunk_index."""
+    by_source = {}
+    for source, index in neighbour_keys(hits):
+        by_source.setdefault(source, []).append(index)
+    store = as_vector_store(client)
+    neighbours = []
+    for source, indices in by_source.items():
+        neighbour_filter = Filter(must=[
+            FieldCondition(key="metadata.source", match=MatchValue(value=source)),
+            FieldCondition(key="metadata.chunk_index", match=MatchAny(any=indices)),
+        ])
+        neighbours.extend(store.scroll(collection_name, scroll_filter=neighbour_filter, with_payload=True))
+    return neighbours
+
+
+def _elapsed_ms(start):
+    return round((time.perf_counter() - start) * 1000, 1)
+
+
+def rag_query(client, collection_name, query_text, top_k=5, model_name=DEFAULT_EMBEDDING_MODEL, backend="torch",
+              sources=None, page_range=None, sections=None, retrieval="dense", fetch_k=HYBRID_FETCH_K,
+              rerank=False, rerank_model=DEFAULT_RERANK_MODEL, rerank_candidates=RERANK_CANDIDATES,
+              rerank_budget_ms=RERANK_BUDGET_MS, mmr=False, mmr_lambda=MMR_LAMBDA, merge_context=True,
+              context_neighbours=False, collection_profile=DEFAULT_COLLECTION_PROFILE):
     """
-    Full RAG workflow: Qdrant search -> Prompt build -> LLM response.
+    Full RAG workflow: Qdrant search (dense, or hybrid dense + BM25) -> optional
+    MMR diversity selection -> optional cross-encoder rerank -> Prompt build -> LLM response.
+    With `mmr`, `fetch_k` candidates are retrieved with their vectors and MMR
+    (`mmr_lambda`) picks a non-redundant subset of them.
+    With `rerank`, `rerank_candidates` chunks are retrieved (or picked by MMR)
+    and the cross-encoder keeps the best `top_k` (see utils.rerank.rerank for
+    the time budget).
+    With `merge_context`, overlapping/adjacent chunks are merged into spans
+    before the prompt is built (utils.context_assembly); `context_neighbours`
+    also pulls in the chunks right before and after each hit when they join it.
+    Dense search uses the query settings of the collection's actual tuning
+    (see collection_search_params); `collection_profile` is only checked
+    against it, and has no effect on stores that keep no tuning (local).
+    Per-stage milliseconds are returned under "timings".
     """
     logger.info(f"Running RAG query for: {query_text}")
+    timings = {}
     try:
-        chunks = search_qdrant(query_text, client, collection_name, top_k=top_k)
+        start = time.perf_counter()
+        pool = max(top_k, rerank_candidates) if rerank else top_k
+        limit = max(pool, fetch_k) if mmr else pool
+        params = collection_search_params(client, collection_name, collection_profile)
+        if retrieval == "hybrid":
+            chunks = hybrid_search(
+                query_text, client, collection_name, top_k=limit, model_name=model_name, backend=backend,
+                sources=sources, page_range=page_range, sections=sections, fetch_k=fetch_k, with_vectors=mmr,
+                search_params=params
+            )
+        else:
+            chunks = search_qdrant(
+                query_text, client, collection_name, top_k=limit, model_name=model_name, backend=backend,
+                sources=sources, page_range=page_range, sections=sections, with_vectors=mmr, search_params=params
+            )
+        timings["retrieval_ms"] = _elapsed_ms(start)
         logger.debug(f"Chunks received for prompt: {[res.payload['metadata'] for res in chunks]}")
         if not chunks:
             logger.warning("No relevant chunks found.")
             return "No relevant information found in the document."
 
-        prompt = build_prompt(query_text, chunks)
+        if mmr:
+            start = time.perf_counter()
+            chunks = mmr_select(embed_query(query_text, model_name, backend), chunks, pool, lambda_=mmr_lambda)
+            timings["mmr_ms"] = _elapsed_ms(start)
+
+        rerank_stats = None
+        if rerank:
+            start = time.perf_counter()
+            chunks, rerank_stats = rerank_hits(
+                query_text, chunks, top_k=top_k, model_name=rerank_model, budget_ms=rerank_budget_ms
+            )
+            timings["rerank_ms"] = _elapsed_ms(start)
+
+        contexts, assembly_stats = chunks, None
+        if merge_context:
+            start = time.perf_counter()
+            neighbours = fetch_neighbours(client, collection_name, chunks) if context_neighbours else []
+            contexts = assemble_context(chunks, neighbours)
+            assembly_stats = context_stats(chunks, contexts)
+            timings["assembly_ms"] = _elapsed_ms(start)
+            logger.info(
+                f"🧩 Assembled {assembly_stats['hits']} chunks into {assembly_stats['spans']} spans "
+                f"({assembly_stats['chars_before']} -> {assembly_stats['chars_after']} chars)"
+            )
+
+        start = time.perf_counter()
+        prompt = build_prompt(query_text, contexts)
+        timings["prompt_ms"] = _elapsed_ms(start)
         logger.debug(f"Generated prompt:\n{prompt[:300]}{'...' if len(prompt) > 300 else ''}")
+        start = time.perf_counter()
         response = get_groq_response(prompt)
-        context_texts = [chunk.payload["text"] for chunk in chunks]
-        logger.info("LLM response generated successfully.")
+        timings["llm_ms"] = _elapsed_ms(start)
+        context_texts = [context["text"] for context in contexts] if merge_context else [chunk.payload["text"] for chunk in chunks]
+        logger.info(f"LLM response generated successfully. Stage timings: {timings}")
         return {
             "response":response,
-            "contexts":context_texts
+            "contexts":context_texts,
+            "timings": timings,
+            "rerank": rerank_stats,
+            "assembly": assembly_stats
         }
 
     except Exception as e:
@@ -152,17 +604,30 @@ def upload_qdrant_runnable():
     return RunnableLambda(lambda inputs: _upload_qdrant_runnable_impl(inputs))
 
 def _upload_qdrant_runnable_impl(inputs):
+    upload_stats = {}
     try:
         client = upload_embed_to_qdrant(
-            json_path=inputs["embed_json_path"],
+            json_path=inputs.get("embed_json_path"),
             collection_name=inputs["collection_name"],
             qdrant_url=inputs.get("qdrant_url") or os.getenv("QDRANT_URL"),
             qdrant_api_key=inputs.get("qdrant_api_key") or os.getenv("QDRANT_API_KEY"),
-            vector_size=inputs.get("vector_size", 384)
+            vector_size=inputs.get("vector_size", 384),
+            mode=inputs.get("upload_mode", "sync"),
+            data=inputs.get("embed_data"),
+            embeddings=inputs.get("embeddings"),
+            vectors_file=inputs.get("embed_vectors_path"),
+            batch_size=inputs.get("upload_batch_size", UPLOAD_BATCH_SIZE),
+            parallel=inputs.get("upload_parallel", UPLOAD_PARALLEL),
+            retries=inputs.get("upload_retries", UPLOAD_RETRIES),
+            upload_stats=upload_stats,
+            vector_backend=inputs.get("vector_backend", "qdrant"),
+            sparse_index=inputs.get("sparse_index", True),
+            collection_profile=inputs.get("collection_profile") or DEFAULT_COLLECTION_PROFILE
         )
         return {
             **inputs,
-            "qdrant_client": client
+            "qdrant_client": client,
+            "upload_stats": upload_stats
         }
     except Exception as e:
         logger.exception(f"❌ Error in upload_qdrant_runnable: {e}")
@@ -181,12 +646,31 @@ def _rag_query_runnable_impl(inputs):
             client=inputs["qdrant_client"],
             collection_name=inputs["collection_name"],
             query_text=inputs["query"],
-            top_k=inputs.get("top_k", 5)
+            top_k=inputs.get("top_k", 5),
+            model_name=inputs.get("embedding_model") or DEFAULT_EMBEDDING_MODEL,
+            backend=inputs.get("embed_backend", "torch"),
+            sources=inputs.get("sources"),
+            page_range=inputs.get("page_range"),
+            sections=inputs.get("sections"),
+            retrieval=inputs.get("retrieval_mode", "dense"),
+            fetch_k=inputs.get("fetch_k", HYBRID_FETCH_K),
+            rerank=inputs.get("rerank", False),
+            rerank_model=inputs.get("rerank_model") or DEFAULT_RERANK_MODEL,
+            rerank_candidates=inputs.get("rerank_candidates", RERANK_CANDIDATES),
+            rerank_budget_ms=inputs.get("rerank_budget_ms", RERANK_BUDGET_MS),
+            mmr=inputs.get("mmr", False),
+            mmr_lambda=inputs.get("mmr_lambda", MMR_LAMBDA),
+            merge_context=inputs.get("merge_context", True),
+            context_neighbours=inputs.get("context_neighbours", False),
+            collection_profile=inputs.get("collection_profile") or DEFAULT_COLLECTION_PROFILE
         )
         return {
             **inputs,
             "response": response["response"],
-            "contexts": response["contexts"]
+            "contexts": response["contexts"],
+            "stage_timings": response.get("timings", {}),
+            "rerank_stats": response.get("rerank"),
+            "context_stats": response.get("assembly")
         }
     except Exception as e:
         logger.exception(f"❌ Error in rag_query_runnable: {e}")
@@ -0,0 +1,82 @@
+import os
+import re
+import threading
+from collections import OrderedDict
+from utils.log import setup_logger
+from utils.model_registry import get_embedder, embedder_id, DEFAULT_EMBEDDING_MODEL
+
+logger = setup_logger("query_cache_logger")
+
+QUERY_CACHE_SIZE = int(os.getenv("QUERY_CACHE_SIZE", 1024))
+
+
+def normalize_query(query):
+    """Case, whitespace and trailing punctuation don't change what is being asked."""
+    return re.sub(r"\s+", " ", query.lower()).strip().rstrip("?.!").strip()
+
+
+class QueryEmbeddingCache:
+    """Bounded, thread-safe LRU of query vectors keyed on (model id, normalized query)."""
+
+    def __init__(self, max_size=QUERY_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key):
+        with self._lock:
+            vector = self._entries.get(key)
+            if vector is None:
+                self.misses += 1
+                return None
+            self._entries.move_to_end(key)
+            self.hits += 1
+            return vector
+
+    def put(self, key, vector):
+        # Shared between requests, so callers must not modify it in place
+        vector.flags.writeable = False
+        with self._lock:
+            self._entries[key] = vector
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+                self.evictions += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "evictions": self.evictions,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+_cache = QueryEmbeddingCache()
+
+
+def embed_query(query_text, model_name=DEFAULT_EMBEDDING_MODEL, backend="torch", cache=None):
+    """1-D query vector, encoded once per distinct normalized query and model."""
+    cache = cache or _cache
+    key = (embedder_id(model_name, backend), normalize_query(query_text))
+    vector = cache.get(key)
+    if vector is None:
+        model = get_embedder(model_name, backend)
+        vector = model.encode([query_text], show_progress_bar=False, convert_to_numpy=True)[0]
+        cache.put(key, vector)
+    return vector
+
+
+def query_cache_stats():
+    return _cache.stats()
@@ -0,0 +1,193 @@
+import os
+import json
+import numpy as np
+from array import array
+from utils.log import setup_logger
+
+logger = setup_logger("records_logger")
+
+# Sidecar holding the byte offset of every record in a .jsonl file
+INDEX_SUFFIX = ".idx"
+
+# Embedding matrix stored next to the embed artifact's metadata records
+VECTORS_SUFFIX = ".vectors.npy"
+VECTOR_DTYPES = ("float32", "float16")
+
+
+def is_jsonl(path):
+    """True when the artifact path uses the streaming JSONL format."""
+    return str(path).endswith(".jsonl")
+
+
+def write_records(records, path):
+    """
+    Writes an iterable of dicts to `path` and returns the record count.
+    `.jsonl` paths are streamed one compact line per record (plus an offset
+    sidecar for seeking); any other path gets the legacy indented JSON array.
+    """
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    # Write to a temp file and swap it in, so readers (and cached hard links
+    # of a previous version) never see a half-written artifact
+    tmp_path = path + ".tmp"
+    if not is_jsonl(path):
+        data = records if isinstance(records, list) else list(records)
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(data, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_path, path)
+        return len(data)
+
+    offsets = array("q")
+    with open(tmp_path, "wb") as f:
+        for record in records:
+            offsets.append(f.tell())
+            f.write(json.dumps(record, ensure_ascii=False).encode("utf-8"))
+            f.write(b"\n")
+
+    with open(tmp_path + INDEX_SUFFIX, "wb") as idx:
+        offsets.tofile(idx)
+    os.replace(tmp_path, path)
+    os.replace(tmp_path + INDEX_SUFFIX, path + INDEX_SUFFIX)
+    return len(offsets)
+
+
+def iter_records(path):
+    """Yields records one at a time from a .jsonl file, or from a legacy JSON array."""
+    if not is_jsonl(path):
+        with open(path, "r", encoding="utf-8", errors="replace") as f:
+            yield from json.load(f)
+        return
+
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            if line.strip():
+                yield json.loads(line)
+
+
+def read_records(path):
+    """Loads every record into a list (for stages that need the whole document)."""
+    return list(iter_records(path))
+
+
+def vectors_path(path):
+    """Path of the .npy vector file that belongs to an embed artifact."""
+    return os.path.splitext(path)[0] + VECTORS_SUFFIX
+
+
+def write_vectors(embeddings, path, dtype="float32"):
+    """
+    Saves an (n, dim) embedding matrix as a .npy file (temp file + swap, like
+    write_records) and returns the row count. float16 halves the size again.
+    """
+    if dtype not in VECTOR_DTYPES:
+        raise ValueError(f"Unknown vector dtype '{dtype}', expected one of {VECTOR_DTYPES}")
+    directory = os.path.dirname(path)
+    if directory:
+        os.makedirs(directory, exist_ok=True)
+
+    tmp_path = path + ".tmp"
+    with open(tmp_path, "wb") as f:
+        np.save(f, np.asarray(embeddings, dtype=dtype))
+    os.replace(tmp_path, path)
+    return len(embeddings)
+
+
+def load_vectors(path, mmap=True):
+    """Opens a .npy vector file, memory-mapped by default so rows are read on demand."""
+    return np.load(path, mmap_mode="r" if mmap else None)
+
+
+def export_json(jsonl_path, json_path):
+    """Exports a .jsonl artifact as the legacy indented JSON array, record by record."""
+    count = 0
+    with open(json_path, "w", encoding="utf-8") as out:
+        out.write("[")
+        for record in iter_records(jsonl_path):
+            out.write(",\n" if count else "\n")
+            out.write(json.dumps(record, indent=2, ensure_ascii=False))
+            count += 1
+        out.write("\n]" if count else "]")
+    logger.info(f"📤 Exported {count} records from {jsonl_path} to {json_path}")
+    return count
+
+
+class RecordReader:
+    """
+    Random access over a .jsonl artifact. Record positions come from the offset
+    sidecar (rebuilt with one scan if missing), so a single page or chunk can be
+    read without loading the rest of the file.
+    """
+
+    def __init__(self, path):
+        if not is_jsonl(path):
+            raise ValueError(f"RecordReader needs a .jsonl artifact, got: {path}")
+        self.path = path
+        self.offsets = self._load_offsets()
+        self._file = open(path, "rb")
+
+    def _load_offsets(self):
+        offsets = array("q")
+        idx_path = self.path + INDEX_SUFFIX
+        if os.path.exists(idx_path) and os.path.getmtime(idx_path) >= os.path.getmtime(self.path):
+            with open(idx_path, "rb") as idx:
+                offsets.frombytes(idx.read())
+            return offsets
+
+        logger.info(f"🔎 Rebuilding record offsets for {self.path}")
+        with open(self.path, "rb") as f:
+            position = 0
+            for line in f:
+                if line.strip():
+                    offsets.append(position)
+                position += len(line)
+        return offsets
+
+    def __len__(self):
+        return len(self.offsets)
+
+    def __getitem__(self, position):
+        if position < 0:
+            position += len(self.offsets)
+        if not 0 <= position < len(self.offsets):
+            raise IndexError(f"Record {position} out of range ({len(self.offsets)} records)")
+        self._file.seek(self.offsets[position])
+        return json.loads(self._file.readline().decode("utf-8", errors="replace"))
+
+    def __iter__(self):
+        for position in range(len(self.offsets)):
+            yield self[position]
+
+    def seek(self, key, value):
+        """
+        Returns the record whose `key` equals `value`, or None. Records are written
+        in ascending page_number / chunk_index order, so this is a binary search.
+        """
+        lo, hi = 0, len(self.offsets)
+        while lo < hi:
+            mid = (lo + hi) // 2
+            record = self[mid]
+            current = record.get(key, record.get("metadata", {}).get(key))
+            if current == value:
+                return record
+            if current is None or current < value:
+                lo = mid + 1
+            else:
+                hi = mid
+        return None
+
+    def page(self, page_number):
+        return self.seek("page_number", page_number)
+
+    def chunk(self, chunk_index):
+        return self.seek("chunk_index", chunk_index)
+
+    def close(self):
+        self._file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
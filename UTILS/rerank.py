@@ -0,0 +1,179 @@
+import os
+import time
+import hashlib
+import threading
+from collections import OrderedDict
+from qdrant_client.models import ScoredPoint
+from utils.log import setup_logger
+from utils.model_registry import get_model, register_loader
+from utils.query_cache import normalize_query
+
+logger = setup_logger("rerank_logger")
+
+DEFAULT_RERANK_MODEL = "cross-encoder/ms-marco-MiniLM-L-6-v2"
+RERANK_CANDIDATES = 20
+RERANK_BATCH_SIZE = 16
+# Per-query scoring budget; pairs it cannot afford are left in vector order
+RERANK_BUDGET_MS = float(os.getenv("RERANK_BUDGET_MS", 300))
+# Weight of the latest batch in the running per-pair cost
+PAIR_COST_SMOOTHING = 0.3
+RERANK_CACHE_SIZE = int(os.getenv("RERANK_CACHE_SIZE", 20000))
+
+
+def _load_cross_encoder(name):
+    from sentence_transformers import CrossEncoder
+    return CrossEncoder(name, device="cpu")
+
+
+register_loader("cross-encoder", _load_cross_encoder)
+
+
+class PairScoreCache:
+    """
+    Bounded, thread-safe LRU of cross-encoder scores keyed on (model, normalized
+    query, text hash), plus a running average of each model's cost per pair.
+    """
+
+    def __init__(self, max_size=RERANK_CACHE_SIZE):
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+        self._pair_seconds = {}
+        self.hits = 0
+        self.misses = 0
+
+    def get_many(self, keys):
+        """Cached scores of `keys` as {key: score}; missing keys are left out."""
+        found = {}
+        with self._lock:
+            for key in keys:
+                score = self._entries.get(key)
+                if score is None:
+                    self.misses += 1
+                    continue
+                self._entries.move_to_end(key)
+                self.hits += 1
+                found[key] = score
+        return found
+
+    def put_many(self, scores):
+        with self._lock:
+            for key, score in scores.items():
+                self._entries[key] = score
+                self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def pair_cost(self, model_name):
+        """Running average of the seconds `model_name` takes per pair, or None before its first batch."""
+        with self._lock:
+            return self._pair_seconds.get(model_name)
+
+    def record_cost(self, model_name, pairs, seconds):
+        with self._lock:
+            cost = seconds / pairs
+            previous = self._pair_seconds.get(model_name)
+            if previous is not None:
+                cost = PAIR_COST_SMOOTHING * cost + (1 - PAIR_COST_SMOOTHING) * previous
+            self._pair_seconds[model_name] = cost
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": round(self.hits / lookups, 3) if lookups else 0.0,
+                "pair_ms": {model: round(cost * 1000, 2) for model, cost in self._pair_seconds.items()},
+            }
+
+
+_cache = PairScoreCache()
+
+
+def _text(hit):
+    return (hit.payload or {}).get("text", "")
+
+
+def _rescored(hit, score):
+    return ScoredPoint(id=hit.id, version=hit.version, score=score, payload=hit.payload, vector=hit.vector)
+
+
+def rerank(query_text, hits, top_k=5, model_name=DEFAULT_RERANK_MODEL, batch_size=RERANK_BATCH_SIZE,
+           budget_ms=RERANK_BUDGET_MS, cache=None):
+    """
+    Re-orders `hits` (ScoredPoint, vector order) by cross-encoder relevance and
+    keeps the best `top_k`, scored with the cross-encoder score. Cached pair
+    scores are reused; the rest are scored in batches in vector order, each
+    batch shrunk to what the remaining `budget_ms` affords at the model's
+    running cost per pair (a model without one is probed with a single pair).
+    When the budget runs out, the scored prefix of `hits` is reranked and the
+    unscored rest follows in vector order with its vector scores; every score
+    computed is kept in the cache for the next query.
+    Returns (hits, stats).
+    """
+    cache = cache or _cache
+    start = time.perf_counter()
+    query_key = normalize_query(query_text)
+    keys = [
+        (model_name, query_key, hashlib.sha1(_text(hit).encode("utf-8", errors="replace")).hexdigest())
+        for hit in hits
+    ]
+    scores = cache.get_many(keys)
+    stats = {"candidates": len(hits), "cache_hits": len(scores), "scored": 0, "timed_out": False}
+
+    pending = [i for i, key in enumerate(keys) if key not in scores]
+    position = 0
+    if pending:
+        model = get_model(model_name, kind="cross-encoder")
+        # The one-off model load is not charged to the query's budget
+        budget_start = time.perf_counter()
+        budget = budget_ms / 1000
+        while position < len(pending):
+            remaining = budget - (time.perf_counter() - budget_start)
+            cost = cache.pair_cost(model_name)
+            if cost is None:
+                # Probe an unmeasured model with one pair
+                size = 1
+            else:
+                size = min(batch_size, int(remaining / cost)) if cost > 0 else batch_size
+            if remaining <= 0 or size < 1:
+                stats["timed_out"] = True
+                break
+            batch = pending[position:position + size]
+            batch_start = time.perf_counter()
+            predicted = model.predict(
+                [(query_text, _text(hits[i])) for i in batch], batch_size=batch_size, show_progress_bar=False
+            )
+            cache.record_cost(model_name, len(batch), time.perf_counter() - batch_start)
+            new_scores = {keys[i]: float(score) for i, score in zip(batch, predicted)}
+            cache.put_many(new_scores)
+            scores.update(new_scores)
+            stats["scored"] += len(batch)
+            position += len(batch)
+
+    # Hits before the first unscored one form the reranked prefix
+    prefix = pending[position] if position < len(pending) else len(hits)
+    order = sorted(range(prefix), key=lambda i: -scores[keys[i]])
+    reranked = [_rescored(hits[i], scores[keys[i]]) for i in order] + list(hits[prefix:])
+    reranked = reranked[:top_k]
+    stats["reranked"] = prefix
+    stats["ms"] = round((time.perf_counter() - start) * 1000, 1)
+    if stats["timed_out"]:
+        logger.warning(
+            f"⏱️ Rerank budget of {budget_ms:.0f} ms exhausted after {stats['scored']}/{len(pending)} pairs; "
+            f"reranked the first {prefix} of {len(hits)} candidates, the rest keep vector order"
+        )
+        return reranked, stats
+
+    logger.info(
+        f"🎯 Reranked {len(hits)} candidates to {len(reranked)} in {stats['ms']} ms "
+        f"({stats['cache_hits']} cached, {stats['scored']} scored)"
+    )
+    return reranked, stats
+
+
+def rerank_cache_stats():
+    return _cache.stats()
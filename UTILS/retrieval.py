@@ -0,0 +1,67 @@
+import numpy as np
+from qdrant_client.models import ScoredPoint
+from utils.log import setup_logger
+
+logger = setup_logger("retrieval_logger")
+
+# Rank constant of reciprocal rank fusion; 60 is the value from the original RRF paper
+RRF_K = 60
+# MMR trade-off: 1.0 ranks by relevance only, 0.0 by novelty only
+MMR_LAMBDA = 0.7
+
+
+def rrf_fuse(result_lists, limit, k=RRF_K):
+    """
+    Reciprocal rank fusion of ranked hit lists (ScoredPoint, best first): each
+    point scores sum(1 / (k + rank)) over the lists it appears in. Returns the
+    best `limit` points with the fused score; payload and vector are taken from
+    the first list holding the point.
+    """
+    fused, points = {}, {}
+    for hits in result_lists:
+        for rank, hit in enumerate(hits, 1):
+            fused[hit.id] = fused.get(hit.id, 0.0) + 1.0 / (k + rank)
+            if hit.id not in points or (points[hit.id].vector is None and hit.vector is not None):
+                points[hit.id] = hit
+    best = sorted(fused, key=lambda point_id: -fused[point_id])[:limit]
+    return [
+        ScoredPoint(
+            id=point_id,
+            version=points[point_id].version,
+            score=fused[point_id],
+            payload=points[point_id].payload,
+            vector=points[point_id].vector
+        )
+        for point_id in best
+    ]
+
+
+def mmr_select(query_vector, hits, k, lambda_=MMR_LAMBDA):
+    """
+    Maximal marginal relevance: greedily picks `k` hits maximizing
+    lambda * sim(query, hit) - (1 - lambda) * max sim(hit, already picked),
+    so overlapping neighbour chunks and repeated clauses give way to new
+    content. Hits need their vectors (search with with_vectors=True); hits
+    without one are left out. Returns the picked hits in selection order.
+    """
+    hits = [hit for hit in hits if hit.vector is not None]
+    if len(hits) <= k:
+        return hits
+    vectors = np.asarray([hit.vector for hit in hits], dtype=np.float32)
+    vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+    query = np.asarray(query_vector, dtype=np.float32)
+    query = query / max(float(np.linalg.norm(query)), 1e-12)
+
+    relevance = vectors @ query
+    similarity = vectors @ vectors.T
+    picked = [int(np.argmax(relevance))]
+    redundancy = similarity[picked[0]].copy()
+    available = np.ones(len(hits), dtype=bool)
+    available[picked[0]] = False
+    while len(picked) < k:
+        gain = np.where(available, lambda_ * relevance - (1 - lambda_) * redundancy, -np.inf)
+        best = int(np.argmax(gain))
+        picked.append(best)
+        available[best] = False
+        redundancy = np.maximum(redundancy, similarity[best])
+    return [hits[i] for i in picked]
@@ -2,17 +2,26 @@ import os
 import json
 from langchain_core.runnables import RunnableLambda
 from utils.log import setup_logger
+from utils.records import is_jsonl, export_json, write_records, write_vectors, vectors_path
+from utils.persist import persist_records, persist_vectors
 def save_json(data, path):
-    """Saves data as JSON to the specified path."""
+    """Saves records to the specified path: streamed JSONL for .jsonl, indented JSON otherwise."""
     try:
-        os.makedirs(os.path.dirname(path), exist_ok=True)
-        with open(path, 'w', encoding="utf-8") as out_file:
-            json.dump(data, out_file, indent=2, ensure_ascii=False)
-        print(f"✅ Successfully saved {len(data)} chunks to {path}")
+        count = write_records(data, path)
+        print(f"✅ Successfully saved {count} chunks to {path}")
     except Exception as e:
         print(f"[❌] Error saving JSON to {path}: {e}")
         
 
+def iter_embed_records(embed_data, embeddings=None):
+    """Yields embed records with their vector attached as a list, one record at a time."""
+    if embeddings is None:
+        yield from embed_data
+        return
+    for record, vector in zip(embed_data, embeddings):
+        yield {**record, "embedding": vector.tolist()}
+
+
 # LangChain-compatible runnable
 def save_json_runnable():
     return RunnableLambda(lambda inputs: _save_json_runnable_impl(inputs))
@@ -26,11 +35,43 @@ def _save_json_runnable_impl(inputs):
         if not data or not path:
             raise ValueError("[save_to_json] No data or path provided.")
 
-        save_json(data, path)
+        persist = inputs.get("persist", "sync")
+        embeddings = inputs.get("embeddings")
+        # Vectors go to a memory-mappable .npy next to compact metadata records;
+        # vector_format="json" keeps the legacy per-record "embedding" lists
+        binary = data is inputs.get("embed_data") and embeddings is not None and inputs.get("vector_format", "npy") == "npy"
+        vec_path = vectors_path(path) if binary else None
+        dtype = inputs.get("vector_dtype", "float32")
+        if binary:
+            records = data
+        elif data is inputs.get("embed_data"):
+            # Inline vectors: each record carries its "embedding" list
+            records = iter_embed_records(data, embeddings)
+        else:
+            records = data
+
+        if persist == "sync":
+            save_json(records, path)
+            if vec_path:
+                write_vectors(embeddings, vec_path, dtype)
+
+            # Optional legacy export: pretty-printed JSON (vectors inline) next to the JSONL artifact
+            if inputs.get("export_json") and is_jsonl(path):
+                json_path = os.path.splitext(path)[0] + ".json"
+                if binary:
+                    write_records(iter_embed_records(data, embeddings), json_path)
+                else:
+                    export_json(path, json_path)
+        else:
+            # Off the critical path: the upload stage uses the in-memory embeddings
+            persist_records(records, path, persist)
+            if vec_path:
+                persist_vectors(embeddings, vec_path, persist, dtype)
 
         return {
             **inputs,
-            "embed_json_path": path
+            "embed_json_path": path,
+            "embed_vectors_path": vec_path
         }
 
     except Exception as e:
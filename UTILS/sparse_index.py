@@ -0,0 +1,287 @@
+import os
+import re
+import math
+import hashlib
+import threading
+from contextlib import nullcontext
+from collections import Counter, defaultdict
+import numpy as np
+from qdrant_client.models import ScoredPoint
+from utils.log import setup_logger
+from utils.records import write_records, iter_records, INDEX_SUFFIX
+from utils.vector_store import filter_matches
+
+logger = setup_logger("sparse_index_logger")
+
+SPARSE_INDEX_DIR = os.getenv("SPARSE_INDEX_DIR", "sparse_index")
+
+BM25_K1 = 1.2
+BM25_B = 0.75
+# Deleted rows are dropped from the postings once they make up this fraction of the index
+COMPACT_FRACTION = 0.3
+
+STOPWORDS = frozenset(
+    "a an and are as at be by for from has have in is it its of on or shall that the this to was were will with".split()
+)
+
+# Thousands separators (1,00,000 / 1,000,000) would split amounts into several tokens
+_DIGIT_COMMA = re.compile(r"(?<=\d),(?=\d)")
+# Words, numbers and dotted/hyphenated/slashed identifiers: 3.2.1, annexure-iv, emd/2024/17
+_TOKEN = re.compile(r"[a-z0-9]+(?:[./-][a-z0-9]+)*")
+
+
+def tokenize(text):
+    """
+    Lowercased lexical tokens for BM25. Clause numbers, annexure IDs and amounts
+    are kept whole; compound tokens also emit their parts, so "annexure-iv"
+    matches "annexure iv".
+    """
+    tokens = []
+    for token in _TOKEN.findall(_DIGIT_COMMA.sub("", text.lower())):
+        if token in STOPWORDS:
+            continue
+        tokens.append(token)
+        parts = re.split(r"[./-]", token)
+        if len(parts) > 1:
+            tokens.extend(part for part in parts if part and part not in STOPWORDS)
+    return tokens
+
+
+class BM25Index:
+    """
+    In-memory BM25 inverted index of one collection's chunks, keyed by the same
+    point ids as the dense vectors so the two result lists can be fused. Each
+    posting list is a pair of numpy arrays (rows, term frequencies), so a query
+    costs one vectorized update per query term. Persisted as JSONL of
+    {"id", "terms", "payload"} records.
+
+    Deleted rows stay in the posting lists until compaction, but document
+    frequencies and the average length are kept over the live rows only, so
+    deletes do not skew idf or length normalization. The index itself is not
+    thread-safe: the module functions hold its `lock`.
+    """
+
+    def __init__(self, path=None):
+        self.path = path
+        self.lock = threading.RLock()
+        self._reset()
+
+    def _reset(self):
+        self.ids, self.payloads, self.terms = [], [], []
+        self.lengths = []
+        self.rows = {}
+        self.deleted = set()
+        self.doc_freq = Counter()
+        self.live_length = 0
+        self._postings = defaultdict(lambda: ([], []))
+        self._arrays = {}
+        self._length_array = None
+        self.dirty = False
+
+    def __len__(self):
+        return len(self.ids) - len(self.deleted)
+
+    def _append(self, point_id, terms, payload):
+        row = len(self.ids)
+        previous = self.rows.get(point_id)
+        if previous is not None:
+            self._drop(previous)
+        self.rows[point_id] = row
+        self.ids.append(point_id)
+        self.payloads.append(payload)
+        self.terms.append(terms)
+        self.lengths.append(sum(terms.values()))
+        self.doc_freq.update(terms.keys())
+        self.live_length += self.lengths[-1]
+        for term, count in terms.items():
+            rows, counts = self._postings[term]
+            rows.append(row)
+            counts.append(count)
+            self._arrays.pop(term, None)
+
+    def _drop(self, row):
+        self.deleted.add(row)
+        self.doc_freq.subtract(self.terms[row].keys())
+        self.live_length -= self.lengths[row]
+
+    def add(self, points):
+        """Indexes (point_id, text, payload) tuples; an existing id is replaced."""
+        for point_id, text, payload in points:
+            self._append(point_id, dict(Counter(tokenize(text))), payload)
+        self._length_array = None
+        self.dirty = True
+        self._maybe_compact()
+
+    def delete(self, point_ids=None, query_filter=None):
+        """Removes points by id and/or by payload filter; returns how many were removed."""
+        removed = 0
+        for point_id in point_ids or []:
+            row = self.rows.pop(point_id, None)
+            if row is not None:
+                self._drop(row)
+                removed += 1
+        if query_filter is not None:
+            for point_id, row in list(self.rows.items()):
+                if filter_matches(query_filter, point_id, self.payloads[row]):
+                    del self.rows[point_id]
+                    self._drop(row)
+                    removed += 1
+        if removed:
+            self.dirty = True
+            self._maybe_compact()
+        return removed
+
+    def count(self, query_filter=None):
+        if query_filter is None:
+            return len(self)
+        return sum(
+            1 for point_id, row in self.rows.items() if filter_matches(query_filter, point_id, self.payloads[row])
+        )
+
+    def _maybe_compact(self):
+        if len(self.deleted) <= COMPACT_FRACTION * max(1, len(self.ids)):
+            return
+        live = [(self.ids[row], self.terms[row], self.payloads[row]) for row in sorted(self.rows.values())]
+        self._reset()
+        for point_id, terms, payload in live:
+            self._append(point_id, terms, payload)
+        self.dirty = True
+
+    def _posting(self, term):
+        arrays = self._arrays.get(term)
+        if arrays is None:
+            rows, counts = self._postings[term]
+            arrays = self._arrays[term] = (np.asarray(rows, dtype=np.int64), np.asarray(counts, dtype=np.float32))
+        return arrays
+
+    def search(self, query_text, limit=5, query_filter=None):
+        """Best BM25 matches as [(point_id, score, payload)], highest score first."""
+        n_live = len(self)
+        if not n_live:
+            return []
+        if self._length_array is None:
+            self._length_array = np.asarray(self.lengths, dtype=np.float32)
+        lengths = self._length_array
+        average = self.live_length / n_live
+        norm = BM25_K1 * (1 - BM25_B + BM25_B * lengths / max(average, 1e-9))
+
+        scores = np.zeros(len(self.ids), dtype=np.float32)
+        for term in set(tokenize(query_text)):
+            df = self.doc_freq.get(term, 0)
+            if df <= 0:
+                continue
+            rows, counts = self._posting(term)
+            idf = math.log(1 + (n_live - df + 0.5) / (df + 0.5))
+            scores[rows] += idf * counts * (BM25_K1 + 1) / (counts + norm[rows])
+        if self.deleted:
+            scores[list(self.deleted)] = 0
+
+        candidates = np.flatnonzero(scores > 0)
+        candidates = candidates[np.argsort(-scores[candidates], kind="stable")]
+        hits = []
+        for row in candidates:
+            # The filter is only evaluated on rows that matched a query term
+            if query_filter is None or filter_matches(query_filter, self.ids[row], self.payloads[row]):
+                hits.append((self.ids[row], float(scores[row]), self.payloads[row]))
+                if len(hits) == limit:
+                    break
+        return hits
+
+    def save(self):
+        if not self.dirty or not self.path:
+            return
+        records = (
+            {"id": self.ids[row], "terms": self.terms[row], "payload": self.payloads[row]}
+            for row in sorted(self.rows.values())
+        )
+        tmp_path = self.path[:-len(".jsonl")] + ".tmp.jsonl"
+        write_records(records, tmp_path)
+        os.replace(tmp_path + INDEX_SUFFIX, self.path + INDEX_SUFFIX)
+        os.replace(tmp_path, self.path)
+        self.dirty = False
+
+    @classmethod
+    def load(cls, path):
+        index = cls(path)
+        if os.path.exists(path):
+            for record in iter_records(path):
+                index._append(record["id"], record["terms"], record["payload"])
+        return index
+
+
+_indexes = {}
+_indexes_lock = threading.Lock()
+
+
+def sparse_index_path(collection_name, location=None, root=SPARSE_INDEX_DIR):
+    """
+    BM25 index file of a collection. `location` (VectorStore.location: backend
+    plus server URL or store root) gets its own directory, so equally named
+    collections on different servers or backends never share an index.
+    """
+    if location:
+        slug = re.sub(r"[^A-Za-z0-9_.-]+", "_", location).strip("_")[:48]
+        root = os.path.join(root, f"{slug}-{hashlib.sha1(location.encode('utf-8')).hexdigest()[:10]}")
+    return os.path.join(root, f"{collection_name}.bm25.jsonl")
+
+
+def get_sparse_index(collection_name, location=None, root=SPARSE_INDEX_DIR):
+    """
+    Process-wide BM25 index of a collection, loaded from disk on first use.
+    The registry lock is only held for the lookup; callers take `index.lock`.
+    """
+    path = sparse_index_path(collection_name, location, root)
+    with _indexes_lock:
+        index = _indexes.get(path)
+        if index is None:
+            index = _indexes[path] = BM25Index.load(path)
+            if len(index):
+                logger.info(f"🔤 Loaded BM25 index of '{collection_name}' ({len(index)} chunks)")
+        return index
+
+
+def index_points(collection_name, points, replace_filter=None, location=None):
+    """
+    Adds (point_id, text, payload) tuples to the collection's BM25 index and
+    saves it; `replace_filter` first removes the points it matches.
+    """
+    index = get_sparse_index(collection_name, location)
+    with index.lock:
+        if replace_filter is not None:
+            index.delete(query_filter=replace_filter)
+        index.add(points)
+        index.save()
+        return len(index)
+
+
+def delete_points(collection_name, point_ids=None, query_filter=None, location=None):
+    index = get_sparse_index(collection_name, location)
+    with index.lock:
+        removed = index.delete(point_ids, query_filter)
+        index.save()
+    return removed
+
+
+def count_points(collection_name, query_filter=None, location=None):
+    index = get_sparse_index(collection_name, location)
+    with index.lock:
+        return index.count(query_filter)
+
+
+def drop_sparse_index(collection_name, location=None, root=SPARSE_INDEX_DIR):
+    path = sparse_index_path(collection_name, location, root)
+    with _indexes_lock:
+        index = _indexes.pop(path, None)
+    # Waits for a writer still saving the index, so its files are not written back afterwards
+    with index.lock if index is not None else nullcontext():
+        for file in (path, path + INDEX_SUFFIX):
+            if os.path.exists(file):
+                os.remove(file)
+
+
+def sparse_search(collection_name, query_text, limit=5, query_filter=None, location=None):
+    """BM25 hits as qdrant ScoredPoint objects, like the dense search returns."""
+    index = get_sparse_index(collection_name, location)
+    with index.lock:
+        hits = index.search(query_text, limit, query_filter)
+    return [ScoredPoint(id=pid, version=0, score=score, payload=payload) for pid, score, payload in hits]
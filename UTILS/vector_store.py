@@ -0,0 +1,668 @@
+import os
+import json
+import heapq
+import shutil
+import threading
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.local.qdrant_local import QdrantLocal
+from qdrant_client.models import (
+    VectorParams, Distance, ScoredPoint, Record, CountResult, Filter, FieldCondition, FilterSelector,
+    PointIdsList, HasIdCondition, MatchValue, MatchAny, MatchExcept, MatchText
+)
+from utils.log import setup_logger
+from utils.records import write_records, read_records, write_vectors, load_vectors
+
+logger = setup_logger("vector_store_logger")
+
+VECTOR_BACKENDS = ("qdrant", "local")
+VECTOR_STORE_DIR = os.getenv("VECTOR_STORE_DIR", "vector_store")
+
+# Local store: collections up to EXACT_SEARCH_LIMIT live points are searched
+# exactly; larger ones go through the kNN graph index
+EXACT_SEARCH_LIMIT = int(os.getenv("LOCAL_EXACT_SEARCH_LIMIT", 50000))
+GRAPH_DEGREE = 24
+GRAPH_PROBE = 3
+SEARCH_EF = 96
+GRAPH_EXPAND = 8
+# Points added since the last graph build are searched exactly until they
+# exceed this fraction of the indexed points, then the graph is rebuilt
+REBUILD_FRACTION = 0.1
+
+
+class VectorStore:
+    """
+    Storage behind upload_embed_to_qdrant / search_qdrant. Method names and
+    arguments follow the QdrantClient calls the pipeline makes, so a store can
+    be used wherever a client was. Hits are qdrant ScoredPoint objects
+    (.id, .score, .payload, .vector) whatever the backend.
+    """
+
+    # Whether concurrent upserts from several threads are safe
+    concurrent_writes = True
+    # Where the collections live (backend plus server URL or root); keys sidecar data such as the BM25 index
+    location = None
+
+    def collection_exists(self, collection_name):
+        raise NotImplementedError
+
+    def create_collection(self, collection_name, vectors_config, **tuning):
+        """
+        Creates a collection; `tuning` takes qdrant's create_collection settings
+        (hnsw_config, quantization_config, optimizers_config, on_disk_payload),
+        which stores without those knobs ignore.
+        """
+        raise NotImplementedError
+
+    def update_collection(self, collection_name, **tuning):
+        """Changes tuning settings of an existing collection; a no-op where there are none."""
+
+    def collection_config(self, collection_name):
+        """qdrant CollectionConfig (HNSW, quantization, on-disk settings), or None where there is none."""
+        return None
+
+    def delete_collection(self, collection_name):
+        raise NotImplementedError
+
+    def vectors_config(self, collection_name):
+        """VectorParams (size, distance) of an existing collection."""
+        raise NotImplementedError
+
+    def create_payload_index(self, collection_name, field_name, field_schema):
+        """Indexes a payload field for filtered search; a no-op where filters are not indexed."""
+
+    def count(self, collection_name, count_filter=None, exact=True):
+        raise NotImplementedError
+
+    def upsert(self, collection_name, points, wait=True):
+        raise NotImplementedError
+
+    def delete(self, collection_name, points_selector, wait=True):
+        raise NotImplementedError
+
+    def search(self, collection_name, query_vector, limit=5, query_filter=None, with_vectors=False, search_params=None):
+        raise NotImplementedError
+
+    def retrieve(self, collection_name, ids, with_vectors=False):
+        """Points (qdrant Record objects) by id; unknown ids are skipped."""
+        raise NotImplementedError
+
+    def scroll(self, collection_name, scroll_filter=None, with_payload=False):
+        """Every point matching `scroll_filter` as qdrant Record objects (without vectors)."""
+        raise NotImplementedError
+
+
+# -------------------------------
+# Qdrant server (or qdrant_client local mode)
+# -------------------------------
+class QdrantVectorStore(VectorStore):
+    def __init__(self, client):
+        self.client = client
+        # The embedded local mode (":memory:" / path) is not safe for concurrent writes
+        self.concurrent_writes = not isinstance(getattr(client, "_client", None), QdrantLocal)
+
+    @property
+    def location(self):
+        inner = getattr(self.client, "_client", None)
+        if isinstance(inner, QdrantLocal):
+            return f"qdrant-local:{inner.location}"
+        return f"qdrant:{getattr(inner, 'rest_uri', None)}"
+
+    def collection_exists(self, collection_name):
+        return self.client.collection_exists(collection_name)
+
+    def create_collection(self, collection_name, vectors_config, **tuning):
+        self.client.create_collection(collection_name=collection_name, vectors_config=vectors_config, **tuning)
+
+    def update_collection(self, collection_name, **tuning):
+        self.client.update_collection(collection_name=collection_name, **tuning)
+
+    def collection_config(self, collection_name):
+        # The embedded local mode accepts but does not keep tuning settings
+        if isinstance(getattr(self.client, "_client", None), QdrantLocal):
+            return None
+        return self.client.get_collection(collection_name).config
+
+    def delete_collection(self, collection_name):
+        self.client.delete_collection(collection_name)
+
+    def vectors_config(self, collection_name):
+        return self.client.get_collection(collection_name).config.params.vectors
+
+    def create_payload_index(self, collection_name, field_name, field_schema):
+        self.client.create_payload_index(
+            collection_name=collection_name, field_name=field_name, field_schema=field_schema, wait=True
+        )
+
+    def count(self, collection_name, count_filter=None, exact=True):
+        return self.client.count(collection_name=collection_name, count_filter=count_filter, exact=exact)
+
+    def upsert(self, collection_name, points, wait=True):
+        return self.client.upsert(collection_name=collection_name, points=points, wait=wait)
+
+    def delete(self, collection_name, points_selector, wait=True):
+        return self.client.delete(collection_name=collection_name, points_selector=points_selector, wait=wait)
+
+    def retrieve(self, collection_name, ids, with_vectors=False):
+        return self.client.retrieve(
+            collection_name=collection_name, ids=list(ids), with_payload=True, with_vectors=with_vectors
+        )
+
+    def scroll(self, collection_name, scroll_filter=None, with_payload=False, page_size=1024):
+        records, offset = [], None
+        while True:
+            page, offset = self.client.scroll(
+                collection_name=collection_name, scroll_filter=scroll_filter, limit=page_size, offset=offset,
+                with_payload=with_payload, with_vectors=False
+            )
+            records.extend(page)
+            if offset is None:
+                return records
+
+    def search(self, collection_name, query_vector, limit=5, query_filter=None, with_vectors=False, search_params=None):
+        if hasattr(self.client, "query_points"):
+            return self.client.query_points(
+                collection_name=collection_name, query=query_vector, limit=limit, query_filter=query_filter,
+                with_payload=True, with_vectors=with_vectors, search_params=search_params
+            ).points
+        # Older clients only have search()
+        return self.client.search(
+            collection_name=collection_name, query_vector=query_vector, limit=limit, query_filter=query_filter,
+            with_vectors=with_vectors, search_params=search_params
+        )
+
+
+# -------------------------------
+# Payload filters (the subset of qdrant's Filter the pipeline builds)
+# -------------------------------
+def _payload_values(payload, key):
+    values = [payload]
+    for part in key.split("."):
+        next_values = []
+        for value in values:
+            if isinstance(value, dict) and part in value:
+                found = value[part]
+                next_values.extend(found if isinstance(found, list) else [found])
+        values = next_values
+    return values
+
+
+def _condition_matches(condition, point_id, payload):
+    if isinstance(condition, Filter):
+        return filter_matches(condition, point_id, payload)
+    if isinstance(condition, HasIdCondition):
+        return point_id in set(condition.has_id)
+    if not isinstance(condition, FieldCondition):
+        raise ValueError(f"Unsupported filter condition for the local store: {type(condition).__name__}")
+
+    values = _payload_values(payload, condition.key)
+    match, rng = condition.match, condition.range
+    if match is not None:
+        if isinstance(match, MatchValue):
+            return match.value in values
+        if isinstance(match, MatchAny):
+            return any(value in match.any for value in values)
+        if isinstance(match, MatchExcept):
+            return not any(value in getattr(match, "except_") for value in values)
+        if isinstance(match, MatchText):
+            return any(isinstance(value, str) and match.text.lower() in value.lower() for value in values)
+        raise ValueError(f"Unsupported match for the local store: {type(match).__name__}")
+    if rng is not None:
+        def within(value):
+            return (
+                isinstance(value, (int, float))
+                and (rng.gt is None or value > rng.gt) and (rng.gte is None or value >= rng.gte)
+                and (rng.lt is None or value < rng.lt) and (rng.lte is None or value <= rng.lte)
+            )
+        return any(within(value) for value in values)
+    raise ValueError(f"Unsupported field condition on '{condition.key}' for the local store")
+
+
+def filter_matches(flt, point_id, payload):
+    """Evaluates a qdrant Filter against one point's id and payload (must / must_not / should)."""
+    if flt.must and not all(_condition_matches(c, point_id, payload) for c in flt.must):
+        return False
+    if flt.must_not and any(_condition_matches(c, point_id, payload) for c in flt.must_not):
+        return False
+    if flt.should and not any(_condition_matches(c, point_id, payload) for c in flt.should):
+        return False
+    return True
+
+
+# -------------------------------
+# kNN graph index (approximate search for large local collections)
+# -------------------------------
+def _kmeans(vectors, n_clusters, iterations=8, seed=0):
+    rng = np.random.default_rng(seed)
+    centroids = vectors[rng.choice(len(vectors), n_clusters, replace=False)].copy()
+    for _ in range(iterations):
+        assign = np.argmax(vectors @ centroids.T, axis=1)
+        for c in range(n_clusters):
+            members = vectors[assign == c]
+            if len(members):
+                centroid = members.mean(axis=0)
+                centroids[c] = centroid / max(np.linalg.norm(centroid), 1e-12)
+    return centroids, np.argmax(vectors @ centroids.T, axis=1)
+
+
+def build_knn_graph(vectors, degree=GRAPH_DEGREE, probe=GRAPH_PROBE):
+    """
+    Approximate kNN graph over unit vectors. Points are partitioned with k-means
+    (IVF); each point's neighbours are found by exact search over its own and the
+    `probe` nearest partitions. Returns (neighbours (n, degree) int32, centroids, assignment).
+    """
+    n = len(vectors)
+    n_clusters = max(1, int(np.sqrt(n)))
+    centroids, assign = _kmeans(vectors, n_clusters)
+    near_clusters = np.argsort(-(centroids @ centroids.T), axis=1)[:, :probe + 1]
+    members = [np.flatnonzero(assign == c) for c in range(n_clusters)]
+
+    neighbours = np.empty((n, degree), dtype=np.int32)
+    for c in range(n_clusters):
+        rows = members[c]
+        if not len(rows):
+            continue
+        candidates = np.concatenate([members[k] for k in near_clusters[c]])
+        scores = vectors[rows] @ vectors[candidates].T
+        scores[candidates[None, :] == rows[:, None]] = -np.inf
+        k = min(degree, len(candidates) - 1) or 1
+        top = np.argpartition(-scores, k - 1, axis=1)[:, :k]
+        picked = candidates[top]
+        if k < degree:
+            picked = np.concatenate([picked, np.repeat(picked[:, :1], degree - k, axis=1)], axis=1)
+        neighbours[rows] = picked
+    return neighbours, centroids, assign
+
+
+def partition_members(assign, n_clusters):
+    """Row indices of every IVF partition, from the per-row assignment."""
+    order = np.argsort(assign, kind="stable")
+    bounds = np.searchsorted(assign[order], np.arange(n_clusters + 1))
+    return [order[bounds[c]:bounds[c + 1]] for c in range(n_clusters)]
+
+
+def graph_search(vectors, neighbours, centroids, members, query, allowed, limit, ef=SEARCH_EF, probe=GRAPH_PROBE):
+    """
+    Best-first search over the kNN graph, starting from the best members of the
+    `probe` partitions nearest to the query. Up to GRAPH_EXPAND frontier nodes
+    are expanded per step so their neighbours are scored in one product.
+    Returns [(row, score)] of allowed rows, best first.
+    """
+    nearest = np.argsort(-(centroids @ query))[:probe]
+    entry = np.concatenate([members[c] for c in nearest])
+    entry_scores = vectors[entry] @ query
+    if len(entry) > ef:
+        keep = np.argpartition(-entry_scores, ef - 1)[:ef]
+        entry, entry_scores = entry[keep], entry_scores[keep]
+
+    visited = np.zeros(len(neighbours), dtype=bool)
+    visited[entry] = True
+    found_rows, found_scores = [entry], [entry_scores]
+    frontier = [(-score, row) for row, score in zip(entry.tolist(), entry_scores.tolist())]
+    heapq.heapify(frontier)
+    best = sorted(entry_scores.tolist())[-ef:]
+    heapq.heapify(best)
+
+    while frontier:
+        batch = []
+        while frontier and len(batch) < GRAPH_EXPAND:
+            negative, node = heapq.heappop(frontier)
+            if len(best) >= ef and -negative < best[0]:
+                frontier = []
+                break
+            batch.append(node)
+        if not batch:
+            break
+
+        candidates = np.unique(neighbours[batch].ravel())
+        fresh = candidates[~visited[candidates]]
+        if not len(fresh):
+            continue
+        visited[fresh] = True
+        scores = vectors[fresh] @ query
+        found_rows.append(fresh)
+        found_scores.append(scores)
+
+        threshold = best[0] if len(best) >= ef else -np.inf
+        improving = scores > threshold
+        for row, score in zip(fresh[improving].tolist(), scores[improving].tolist()):
+            heapq.heappush(frontier, (-score, row))
+            heapq.heappush(best, score)
+            if len(best) > ef:
+                heapq.heappop(best)
+
+    rows, scores = np.concatenate(found_rows), np.concatenate(found_scores)
+    ok = allowed[rows]
+    rows, scores = rows[ok], scores[ok]
+    top = np.argsort(-scores)[:limit]
+    return list(zip(rows[top].tolist(), scores[top].tolist()))
+
+
+# -------------------------------
+# In-process store
+# -------------------------------
+def _save_npy(path, array):
+    # Temp file + swap: the previous file may still be memory-mapped
+    with open(path + ".tmp", "wb") as f:
+        np.save(f, np.asarray(array))
+    os.replace(path + ".tmp", path)
+
+
+class _LocalCollection:
+    def __init__(self, directory, vector_size, distance):
+        self.directory = directory
+        self.vector_size = vector_size
+        self.distance = distance
+        self.ids, self.payloads = [], []
+        self.rows = {}
+        self.vectors = np.zeros((0, vector_size), dtype=np.float32)
+        self.size = 0
+        self.deleted = np.zeros(0, dtype=bool)
+        self.graph = None
+        self.graph_rows = 0
+        self.graph_dirty = False
+        self._members = None
+        self.dirty = False
+
+    # Persistence: vectors (and the graph) as memory-mappable .npy files,
+    # payloads as JSONL and ids/deletions in a small metadata file
+    def flush(self):
+        if not self.dirty:
+            return
+        os.makedirs(self.directory, exist_ok=True)
+        write_vectors(self.vectors[:self.size], os.path.join(self.directory, "vectors.npy"))
+        write_records(self.payloads, os.path.join(self.directory, "payloads.jsonl"))
+        meta = {
+            "vector_size": self.vector_size,
+            "distance": str(self.distance.value if hasattr(self.distance, "value") else self.distance),
+            "ids": self.ids,
+            "deleted": np.flatnonzero(self.deleted[:self.size]).tolist(),
+        }
+        with open(os.path.join(self.directory, "meta.json.tmp"), "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(os.path.join(self.directory, "meta.json.tmp"), os.path.join(self.directory, "meta.json"))
+        if self.graph is not None and self.graph_dirty:
+            for name, array in zip(("graph.npy", "centroids.npy", "assign.npy"), self.graph):
+                _save_npy(os.path.join(self.directory, name), array)
+            with open(os.path.join(self.directory, "graph_rows"), "w") as f:
+                f.write(str(self.graph_rows))
+            self.graph_dirty = False
+        elif self.graph is None:
+            for name in ("graph.npy", "centroids.npy", "assign.npy", "graph_rows"):
+                if os.path.exists(os.path.join(self.directory, name)):
+                    os.remove(os.path.join(self.directory, name))
+        self.dirty = False
+
+    @classmethod
+    def load(cls, directory):
+        with open(os.path.join(directory, "meta.json"), "r", encoding="utf-8") as f:
+            meta = json.load(f)
+        collection = cls(directory, meta["vector_size"], Distance(meta["distance"]))
+        collection.ids = meta["ids"]
+        collection.rows = {pid: row for row, pid in enumerate(collection.ids)}
+        collection.payloads = read_records(os.path.join(directory, "payloads.jsonl"))
+        # Memory-mapped until the first write copies it into memory
+        collection.vectors = load_vectors(os.path.join(directory, "vectors.npy"))
+        collection.size = len(collection.ids)
+        collection.deleted = np.zeros(collection.size, dtype=bool)
+        collection.deleted[meta["deleted"]] = True
+        graph_path = os.path.join(directory, "graph.npy")
+        if os.path.exists(graph_path):
+            collection.graph = (
+                np.load(graph_path, mmap_mode="r"),
+                np.load(os.path.join(directory, "centroids.npy")),
+                np.load(os.path.join(directory, "assign.npy"), mmap_mode="r"),
+            )
+            with open(os.path.join(directory, "graph_rows")) as f:
+                collection.graph_rows = int(f.read())
+        return collection
+
+    def _reserve(self, extra):
+        needed = self.size + extra
+        if isinstance(self.vectors, np.memmap) or needed > len(self.vectors):
+            capacity = max(needed, 2 * len(self.vectors), 64)
+            grown = np.zeros((capacity, self.vector_size), dtype=np.float32)
+            grown[:self.size] = self.vectors[:self.size]
+            self.vectors = grown
+            deleted = np.zeros(capacity, dtype=bool)
+            deleted[:self.size] = self.deleted[:self.size]
+            self.deleted = deleted
+
+    def _prepare(self, vectors):
+        vectors = np.asarray(vectors, dtype=np.float32)
+        if self.distance == Distance.COSINE:
+            norms = np.linalg.norm(vectors, axis=-1, keepdims=True)
+            vectors = vectors / np.clip(norms, 1e-12, None)
+        return vectors
+
+    def upsert(self, points):
+        if not points:
+            return
+        self._reserve(len(points))
+        vectors = self._prepare([point.vector for point in points])
+        rows = []
+        for point in points:
+            payload = point.payload or {}
+            row = self.rows.get(point.id)
+            if row is None:
+                row = self.size
+                self.rows[point.id] = row
+                self.ids.append(point.id)
+                self.payloads.append(payload)
+                self.size += 1
+            else:
+                self.payloads[row] = payload
+                self.deleted[row] = False
+                if row < self.graph_rows:
+                    # The graph holds the old vector; rebuild it on the next large search
+                    self.graph, self._members = None, None
+            rows.append(row)
+        self.vectors[rows] = vectors
+        self.dirty = True
+
+    def delete_rows(self, rows):
+        for row in rows:
+            self.deleted[row] = True
+        self.dirty = True
+
+    def live_mask(self, query_filter=None):
+        mask = ~self.deleted[:self.size]
+        if query_filter is not None:
+            for row in np.flatnonzero(mask):
+                if not filter_matches(query_filter, self.ids[row], self.payloads[row]):
+                    mask[row] = False
+        return mask
+
+    def _ensure_graph(self):
+        live = self.size - int(self.deleted[:self.size].sum())
+        if live <= EXACT_SEARCH_LIMIT:
+            return False
+        if self.graph is None or self.size - self.graph_rows > REBUILD_FRACTION * self.graph_rows:
+            logger.info(f"🕸️ Building kNN graph over {self.size} vectors in {self.directory}")
+            self.graph = build_knn_graph(np.ascontiguousarray(self.vectors[:self.size]))
+            self._members = None
+            self.graph_rows = self.size
+            self.graph_dirty = True
+            self.dirty = True
+        return True
+
+    def search(self, query, limit, query_filter=None):
+        query = self._prepare(query)
+        allowed = self.live_mask(query_filter)
+        n_allowed = int(allowed.sum())
+        if not n_allowed:
+            return []
+
+        # Restrictive filters leave few candidates: exact search over those is cheaper and exact
+        if n_allowed <= EXACT_SEARCH_LIMIT or not self._ensure_graph():
+            if n_allowed > self.size // 2:
+                # Scoring everything beats gathering most rows into a copy first
+                scores = self.vectors[:self.size] @ query
+                rows = np.flatnonzero(allowed)
+                scores = scores[rows]
+            else:
+                rows = np.flatnonzero(allowed)
+                scores = self.vectors[rows] @ query
+            k = min(limit, len(rows))
+            top = np.argpartition(-scores, k - 1)[:k]
+            top = top[np.argsort(-scores[top])]
+            return [(int(rows[i]), float(scores[i])) for i in top]
+
+        neighbours, centroids, assign = self.graph
+        if self._members is None:
+            self._members = partition_members(np.asarray(assign), len(centroids))
+        hits = graph_search(self.vectors, neighbours, centroids, self._members, query, allowed, limit)
+        # Rows added after the graph build are scored exactly and merged in
+        pending = np.flatnonzero(allowed[self.graph_rows:]) + self.graph_rows
+        if len(pending):
+            scores = self.vectors[pending] @ query
+            hits.extend(zip(pending.tolist(), scores.tolist()))
+            hits = sorted(hits, key=lambda hit: -hit[1])[:limit]
+        return hits
+
+
+class LocalVectorStore(VectorStore):
+    """
+    In-process vector store for single-document sessions and offline runs.
+    Collections up to LOCAL_EXACT_SEARCH_LIMIT points are searched exactly with
+    one matrix-vector product; larger ones use an approximate kNN graph built
+    with IVF partitioning. Each collection is a directory under `root` with
+    memory-mapped .npy vectors/graph, JSONL payloads and a metadata file;
+    writes are flushed on wait=True.
+    """
+
+    def __init__(self, root=VECTOR_STORE_DIR):
+        self.root = root
+        self.location = f"local:{os.path.abspath(root)}"
+        self._collections = {}
+        self._lock = threading.RLock()
+
+    def _directory(self, collection_name):
+        return os.path.join(self.root, collection_name)
+
+    def _collection(self, collection_name):
+        collection = self._collections.get(collection_name)
+        if collection is None:
+            directory = self._directory(collection_name)
+            if not os.path.exists(os.path.join(directory, "meta.json")):
+                raise ValueError(f"Collection '{collection_name}' not found")
+            collection = _LocalCollection.load(directory)
+            self._collections[collection_name] = collection
+        return collection
+
+    def collection_exists(self, collection_name):
+        with self._lock:
+            return collection_name in self._collections or os.path.exists(
+                os.path.join(self._directory(collection_name), "meta.json")
+            )
+
+    def create_collection(self, collection_name, vectors_config, **tuning):
+        # HNSW/quantization/on-disk settings are qdrant's; this store keeps its own graph index
+        if vectors_config.distance not in (Distance.COSINE, Distance.DOT):
+            raise ValueError(f"Local store supports cosine and dot distance, got {vectors_config.distance}")
+        with self._lock:
+            collection = _LocalCollection(self._directory(collection_name), vectors_config.size, vectors_config.distance)
+            collection.dirty = True
+            collection.flush()
+            self._collections[collection_name] = collection
+
+    def delete_collection(self, collection_name):
+        with self._lock:
+            self._collections.pop(collection_name, None)
+            shutil.rmtree(self._directory(collection_name), ignore_errors=True)
+
+    def vectors_config(self, collection_name):
+        with self._lock:
+            collection = self._collection(collection_name)
+            return VectorParams(size=collection.vector_size, distance=collection.distance)
+
+    def count(self, collection_name, count_filter=None, exact=True):
+        with self._lock:
+            return CountResult(count=int(self._collection(collection_name).live_mask(count_filter).sum()))
+
+    def upsert(self, collection_name, points, wait=True):
+        with self._lock:
+            collection = self._collection(collection_name)
+            collection.upsert(list(points))
+            if wait:
+                collection.flush()
+
+    def delete(self, collection_name, points_selector, wait=True):
+        with self._lock:
+            collection = self._collection(collection_name)
+            if isinstance(points_selector, FilterSelector):
+                rows = np.flatnonzero(collection.live_mask(points_selector.filter))
+            elif isinstance(points_selector, PointIdsList):
+                rows = [collection.rows[pid] for pid in points_selector.points if pid in collection.rows]
+            else:
+                rows = [collection.rows[pid] for pid in points_selector if pid in collection.rows]
+            collection.delete_rows(rows)
+            if wait:
+                collection.flush()
+
+    def search(self, collection_name, query_vector, limit=5, query_filter=None, with_vectors=False, search_params=None):
+        with self._lock:
+            collection = self._collection(collection_name)
+            hits = collection.search(query_vector, limit, query_filter)
+            return [
+                ScoredPoint(
+                    id=collection.ids[row],
+                    version=0,
+                    score=score,
+                    payload=collection.payloads[row],
+                    vector=collection.vectors[row].tolist() if with_vectors else None
+                )
+                for row, score in hits
+            ]
+
+    def retrieve(self, collection_name, ids, with_vectors=False):
+        with self._lock:
+            collection = self._collection(collection_name)
+            rows = [collection.rows.get(pid) for pid in ids]
+            return [
+                Record(
+                    id=collection.ids[row],
+                    payload=collection.payloads[row],
+                    vector=collection.vectors[row].tolist() if with_vectors else None
+                )
+                for row in rows
+                if row is not None and not collection.deleted[row]
+            ]
+
+    def scroll(self, collection_name, scroll_filter=None, with_payload=False):
+        with self._lock:
+            collection = self._collection(collection_name)
+            return [
+                Record(id=collection.ids[row], payload=collection.payloads[row] if with_payload else None)
+                for row in np.flatnonzero(collection.live_mask(scroll_filter))
+            ]
+
+    def flush(self):
+        with self._lock:
+            for collection in self._collections.values():
+                collection.flush()
+
+
+_local_stores = {}
+_stores_lock = threading.Lock()
+
+
+def open_vector_store(backend="qdrant", qdrant_url=None, qdrant_api_key=None, root=VECTOR_STORE_DIR):
+    """
+    Store for a `vector_backend` pipeline input: "qdrant" connects to the Qdrant
+    server, "local" returns the process-wide in-process store rooted at `root`.
+    """
+    if backend not in VECTOR_BACKENDS:
+        raise ValueError(f"Unknown vector_backend '{backend}', expected one of {VECTOR_BACKENDS}")
+    if backend == "local":
+        with _stores_lock:
+            store = _local_stores.get(root)
+            if store is None:
+                store = _local_stores[root] = LocalVectorStore(root)
+            return store
+    return QdrantVectorStore(QdrantClient(url=qdrant_url, api_key=qdrant_api_key))
+
+
+def as_vector_store(client):
+    """Wraps a bare QdrantClient (e.g. from older callers) in a QdrantVectorStore."""
+    return client if isinstance(client, VectorStore) else QdrantVectorStore(client)
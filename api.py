@@ -1,5 +1,6 @@
 from concurrent.futures import process
 import os 
+from typing import Optional
 from datetime import date, datetime
 from turtle import title
 from fastapi import FastAPI ,UploadFile,File,Form
@@ -7,13 +8,32 @@ import collections
 from fastapi.responses import JSONResponse
 
 from config import input_dict, processing_time, rag_pipeline, query_pipe, logger, result
+from utils.ingest_cache import cached_pipeline_runnable
+from utils.incremental import incremental_pipeline_runnable
+from utils.model_registry import registry_stats
+from utils.embed_pool import shutdown_embed_pool
+from utils.query_cache import query_cache_stats
+from utils.rerank import rerank_cache_stats
 
 app=FastAPI(title="tendor-Bot RAG API")
 
+# Multi-document mode: every upload goes into this one collection instead of one collection per file
+SHARED_COLLECTION = os.getenv("SHARED_COLLECTION")
+
+# Re-uploads of a known PDF (any filename) reuse the cached ingestion
+# and revised versions of a known file only re-ingest their changed pages
+ingest_pipeline = cached_pipeline_runnable(incremental_pipeline_runnable(rag_pipeline))
+
+@app.on_event("shutdown")
+def stop_embed_pool():
+    # Worker processes of the embedding pool live across requests
+    shutdown_embed_pool()
+
 STATE = {
     "qdrant_client": None,
     "collection_name": None,
     "document_processed": False,
+    "sources": [],
     "processing_stats": {},
     "chat_history": collections.deque(maxlen=20),
 }
@@ -31,26 +51,42 @@ async def process_document(file:UploadFile = File(...)):
         
         input_dict = {
             "pdf_path": file_path,
-            "raw_json_path": f"temp_uploads/{file_name}.json",
-            "embed_json_path": f"temp_uploads/{file_name}_chunks.json",
-            "index_json_path": f"temp_uploads/{file_name}_index.json",
+            "raw_json_path": f"temp_uploads/{file_name}.jsonl",
+            "embed_json_path": f"temp_uploads/{file_name}_chunks.jsonl",
+            "index_json_path": f"temp_uploads/{file_name}_index.jsonl",
             "source_name": file_name,
             "doc_date": datetime.now().strftime("%B %Y"),
             "title": file_name.replace("_", " ").title(),
             "chunk_size": 800,
             "chunk_overlap": 160,
-            "collection_name": f"{file_name}_collection"
+            "extract_workers": os.cpu_count() or 1,
+            "embed_workers": int(os.getenv("EMBED_WORKERS", 1)),
+            "embed_backend": os.getenv("EMBED_BACKEND", "torch"),
+            "vector_backend": os.getenv("VECTOR_BACKEND", "qdrant"),
+            "collection_profile": os.getenv("COLLECTION_PROFILE", "default"),
+            "persist": "async",
+            "dedup": os.getenv("DEDUP", "false").lower() == "true",
+            "collection_name": SHARED_COLLECTION or f"{file_name}_collection"
         }
-        result=rag_pipeline.invoke(input_dict)
+        result=ingest_pipeline.invoke(input_dict)
         processing_time=(datetime.now()-start_time).total_seconds()
         
         STATE["qdrant_client"] = result["qdrant_client"]
         STATE["collection_name"] = result["collection_name"]
+        source_name = result.get("source_name", file_name)
+        if not SHARED_COLLECTION:
+            STATE["sources"] = []
+        if source_name not in STATE["sources"]:
+            STATE["sources"].append(source_name)
         STATE["document_processed"] = True
         STATE["processing_stats"] = {
             "processing_time": processing_time,
             "chunks_created": result.get("chunks_count", "N/A"),
             "embeddings_generated": result.get("embeddings_count", "N/A"),
+            "cache_hit": result.get("cache_hit", False),
+            "embeddings_saved": result.get("dedup_stats", {}).get("embeddings_saved", 0),
+            "embedding_cache_hit_rate": (result.get("embedding_cache_stats") or {}).get("hit_rate", 0.0),
+            "embedding_time_saved": (result.get("embedding_cache_stats") or {}).get("time_saved_s", 0.0),
             "processed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
         }
         
@@ -60,14 +96,33 @@ async def process_document(file:UploadFile = File(...)):
         return JSONResponse(status_code=500, content={"error": str(e)})
     
 @app.post("/ask/")
-async def ask_question(query: str = Form(...)):
+async def ask_question(
+    query: str = Form(...),
+    source: Optional[str] = Form(None),
+    page_from: Optional[int] = Form(None),
+    page_to: Optional[int] = Form(None),
+    section: Optional[str] = Form(None)
+):
     if not STATE["document_processed"]:
         return JSONResponse(status_code=400, content={"error": "No document processed yet"})
     try:
+        # Optional scoping to one document, a page range and/or a section, applied by Qdrant
+        filters = {
+            "sources": [source] if source else None,
+            "page_range": (page_from, page_to) if page_from is not None or page_to is not None else None,
+            "sections": [section] if section else None,
+        }
         query_inputs={
             "qdrant_client": STATE["qdrant_client"],
             "collection_name": STATE["collection_name"],
             "query": query,
+            "embed_backend": os.getenv("EMBED_BACKEND", "torch"),
+            "retrieval_mode": os.getenv("RETRIEVAL_MODE", "hybrid"),
+            "rerank": os.getenv("RERANK", "false").lower() == "true",
+            "mmr": os.getenv("MMR", "false").lower() == "true",
+            "context_neighbours": os.getenv("CONTEXT_NEIGHBOURS", "false").lower() == "true",
+            "collection_profile": os.getenv("COLLECTION_PROFILE", "default"),
+            **filters,
             "history": [(q, a) for q, a in STATE["chat_history"]]
         }
         start_time = datetime.now()
@@ -86,7 +141,11 @@ async def ask_question(query: str = Form(...)):
                 "contexts_found": len(contexts),
                 "query_length": len(query),
                 "response_length": len(answer),
-                "collection": STATE["collection_name"]
+                "collection": STATE["collection_name"],
+                "filters": {key: value for key, value in filters.items() if value},
+                "stages": response.get("stage_timings", {}),
+                "rerank": response.get("rerank_stats"),
+                "context": response.get("context_stats")
             }
         }
     except Exception as e:
@@ -98,5 +157,10 @@ async def status():
     return {
         "document_processed": STATE["document_processed"],
         "stats": STATE["processing_stats"],
-        "messages": len(STATE["chat_history"])
+        "messages": len(STATE["chat_history"]),
+        "collection": STATE["collection_name"],
+        "sources": STATE["sources"],
+        "models": registry_stats(),
+        "query_cache": query_cache_stats(),
+        "rerank_cache": rerank_cache_stats()
     }
\ No newline at end of file
@@ -0,0 +1,109 @@
+"""
+Micro-benchmark: per-chunk cost of chunk -> page/section mapping as the page
+count grows, comparing the previous linear scans with the bisect/interval
+lookups in utils.chunking. Also checks that both produce identical results.
+
+Usage: python benchmarks/bench_chunk_mapping.py [page_counts ...]
+"""
+import os
+import sys
+import time
+import random
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.chunking import _PageLocator, _SectionIndex
+
+CHUNK_SIZE = 300
+CHUNK_OVERLAP = 60
+
+
+def legacy_page_for(starts, ends, start, end):
+    """The previous first-match + pages_spanned scans over every page."""
+    n = len(starts)
+    page_num = 1
+    for idx in range(n):
+        if starts[idx] <= start < ends[idx] + (2 if idx < n - 1 else 0):
+            page_num = idx + 1
+            break
+    spanned = []
+    for idx in range(n):
+        page_start, page_end = starts[idx], ends[idx] + (2 if idx < n - 1 else 0)
+        if not (end <= page_start or start >= page_end):
+            spanned.append((idx + 1, min(end, page_end) - max(start, page_start)))
+    if spanned:
+        page_num = max(spanned, key=lambda x: x[1])[0]
+    return page_num
+
+
+def legacy_section_for(sections, page_num):
+    """The previous four-method linear section lookup."""
+    desc = ""
+    for section in sections:
+        if section["start"] <= page_num <= section["end"]:
+            desc = section["description"]
+            break
+    if not desc:
+        applicable = [s for s in sections if s["start"] <= page_num]
+        if applicable:
+            desc = max(applicable, key=lambda x: x["start"])["description"]
+    if not desc and sections and page_num < sections[0]["start"]:
+        desc = sections[0]["description"]
+    if not desc and sections and page_num > sections[-1]["end"]:
+        desc = sections[-1]["description"]
+    return desc
+
+
+def synthetic_document(page_count, rng):
+    starts, ends, position = [], [], 0
+    for i in range(page_count):
+        length = rng.randint(0, 3000)  # includes blank pages
+        starts.append(position)
+        position += length
+        ends.append(position)
+        if i < page_count - 1:
+            position += 2
+
+    sections, page = [], rng.randint(1, 5)
+    while page <= page_count:
+        span = rng.randint(0, 25)
+        sections.append({"description": f"Section {len(sections) + 1}", "start": page, "end": page + span})
+        page += rng.randint(1, 30)  # gaps and overlaps between sections
+    sections.sort(key=lambda x: x["start"])
+
+    spans = []
+    for start in range(0, position, CHUNK_SIZE - CHUNK_OVERLAP):
+        spans.append((start, min(start + rng.randint(1, CHUNK_SIZE), position)))
+    return starts, ends, sections, spans
+
+
+def run(page_counts):
+    rng = random.Random(7)
+    print(f"{'pages':>7} {'chunks':>8} {'legacy us/chunk':>16} {'bisect us/chunk':>16} {'identical':>10}")
+    for page_count in page_counts:
+        starts, ends, sections, spans = synthetic_document(page_count, rng)
+
+        t0 = time.perf_counter()
+        legacy = []
+        for start, end in spans:
+            page = legacy_page_for(starts, ends, start, end)
+            legacy.append((page, legacy_section_for(sections, page)))
+        legacy_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        locator, section_index = _PageLocator(starts, ends), _SectionIndex(sections)
+        fast = []
+        for start, end in spans:
+            page = locator.page_for(start, end)
+            fast.append((page, section_index.describe(page)))
+        fast_time = time.perf_counter() - t0
+
+        print(
+            f"{page_count:>7} {len(spans):>8} "
+            f"{legacy_time / len(spans) * 1e6:>16.2f} {fast_time / len(spans) * 1e6:>16.2f} "
+            f"{str(legacy == fast):>10}"
+        )
+
+
+if __name__ == "__main__":
+    run([int(n) for n in sys.argv[1:]] or [100, 500, 1000, 2000])
@@ -0,0 +1,132 @@
+"""
+Benchmark: memory and search latency of the collection profiles
+(utils.collection_profiles) on a Qdrant server.
+
+For every profile a collection is loaded through upload_embed_to_qdrant with
+clustered synthetic vectors and ~800-character chunk texts (the size of a
+chunker chunk), then queried with the profile's search params. Reported per
+profile: upload time, time until the HNSW index is built, p50/p95 search
+latency, recall@10 against exact search, the estimated RAM held by the
+collection (full vectors, int8 vectors, HNSW links and payload, each counted
+only when the profile keeps it in memory) and, when the server exposes it in
+/metrics, its resident memory after the load. Collections are dropped at the end.
+
+The embedded ":memory:" mode ignores quantization and on-disk settings, so
+this needs a server (QDRANT_URL or the url argument).
+
+Usage: python benchmarks/bench_collection_profiles.py [n_points] [n_queries] [vector_size] [qdrant_url]
+"""
+import os
+import re
+import sys
+import json
+import time
+import tempfile
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["SPARSE_INDEX_DIR"] = os.path.join(_tmp.name, "sparse_index")
+
+import numpy as np
+from qdrant_client.models import SearchParams, CollectionStatus
+from utils.qdrant import upload_embed_to_qdrant
+from utils.collection_profiles import COLLECTION_PROFILES, search_params
+
+WORDS = "tender bidder contract clause payment guarantee security deposit annexure schedule works engineer".split()
+
+
+def build_data(n_points, vector_size, rng):
+    centers = rng.standard_normal((max(1, n_points // 200), vector_size))
+    vectors = centers[rng.integers(len(centers), size=n_points)] + 0.35 * rng.standard_normal((n_points, vector_size))
+    vectors = (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+    data = []
+    for i in range(n_points):
+        text = " ".join(rng.choice(WORDS, size=110))[:800]
+        data.append({
+            "text": text,
+            "metadata": {"source": "bench", "chunk_index": i, "char_start": i * 800, "char_end": i * 800 + len(text)}
+        })
+    return data, vectors
+
+
+def estimated_ram_mb(profile, data, vector_size):
+    n = len(data)
+    ram = 0
+    if not profile.get("on_disk_vectors"):
+        ram += n * vector_size * 4
+    if profile.get("quantization", {}).get("always_ram"):
+        ram += n * vector_size
+    hnsw = profile.get("hnsw", {})
+    if not hnsw.get("on_disk"):
+        # Level-0 links: 2m neighbour ids of 4 bytes per point
+        ram += n * 2 * hnsw.get("m", 16) * 4
+    if not profile.get("on_disk_payload"):
+        ram += sum(len(json.dumps({"text": c["text"], "metadata": c["metadata"]})) for c in data)
+    return ram / 2**20
+
+
+def server_rss_mb(qdrant_url):
+    """Resident memory of the server from /metrics, or None where it is not exposed."""
+    try:
+        with urllib.request.urlopen(f"{qdrant_url.rstrip('/')}/metrics", timeout=5) as response:
+            metrics = response.read().decode()
+    except Exception:
+        return None
+    match = re.search(r"^memory_resident_bytes\s+([\d.e+]+)", metrics, re.M)
+    return float(match.group(1)) / 2**20 if match else None
+
+
+def wait_indexed(store, collection_name, timeout=600):
+    start = time.perf_counter()
+    while time.perf_counter() - start < timeout:
+        if store.client.get_collection(collection_name).status == CollectionStatus.GREEN:
+            break
+        time.sleep(0.5)
+    return time.perf_counter() - start
+
+
+def run(n_points, n_queries, vector_size, qdrant_url):
+    rng = np.random.default_rng(0)
+    data, vectors = build_data(n_points, vector_size, rng)
+    queries = vectors[rng.choice(n_points, size=n_queries, replace=False)]
+    queries = queries + 0.1 * rng.standard_normal(queries.shape).astype(np.float32)
+    print(f"points={n_points} queries={n_queries} vector_size={vector_size} url={qdrant_url}")
+    print(f"{'profile':<12} {'upload s':>9} {'index s':>8} {'p50 ms':>7} {'p95 ms':>7} {'recall@10':>9} {'est RAM MB':>10} {'server MB':>9}")
+
+    for name, profile in COLLECTION_PROFILES.items():
+        collection_name = f"bench_profile_{name}"
+        start = time.perf_counter()
+        store = upload_embed_to_qdrant(
+            None, collection_name, qdrant_url, vector_size=vector_size, data=data, embeddings=vectors,
+            sparse_index=False, collection_profile=name
+        )
+        upload_s = time.perf_counter() - start
+        index_s = wait_indexed(store, collection_name)
+
+        params = search_params(name)
+        latencies, recalls = [], []
+        for query in queries:
+            query = query.tolist()
+            exact = {hit.id for hit in store.search(collection_name, query, limit=10, search_params=SearchParams(exact=True))}
+            start = time.perf_counter()
+            hits = store.search(collection_name, query, limit=10, search_params=params)
+            latencies.append((time.perf_counter() - start) * 1000)
+            recalls.append(len(exact & {hit.id for hit in hits}) / 10)
+
+        rss = server_rss_mb(qdrant_url)
+        print(
+            f"{name:<12} {upload_s:9.1f} {index_s:8.1f} {np.percentile(latencies, 50):7.2f} {np.percentile(latencies, 95):7.2f} "
+            f"{np.mean(recalls):9.3f} {estimated_ram_mb(profile, data, vector_size):10.1f} "
+            f"{rss if rss is not None else float('nan'):9.1f}"
+        )
+        store.delete_collection(collection_name)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 50000
+    q = int(sys.argv[2]) if len(sys.argv) > 2 else 200
+    size = int(sys.argv[3]) if len(sys.argv) > 3 else 384
+    url = sys.argv[4] if len(sys.argv) > 4 else os.getenv("QDRANT_URL", "http://localhost:6333")
+    run(n, q, size, url)
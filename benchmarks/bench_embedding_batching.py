@@ -0,0 +1,51 @@
+"""
+Benchmark: the previous single model.encode() call (default batch size, progress
+bar on) vs utils.create_embeding.encode_bucketed (length-bucketed batches under
+a token budget).
+
+Reports chunks/sec for each and the largest difference between the vectors.
+
+Usage: python benchmarks/bench_embedding_batching.py <chunks.jsonl|chunks.json> [batch_size] [token_budget] [threads]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from utils.records import iter_records
+from utils.model_registry import get_model
+from utils.create_embeding import encode_bucketed, set_torch_threads, DEFAULT_BATCH_SIZE, DEFAULT_TOKEN_BUDGET
+
+
+def run(path, batch_size, token_budget, threads):
+    texts = [record["text"] for record in iter_records(path)]
+    model = get_model()
+    # Both sides run with the same thread count
+    set_torch_threads(threads)
+    # Warm-up so neither side pays for lazy initialisation
+    model.encode(texts[:8], show_progress_bar=False)
+
+    t0 = time.perf_counter()
+    legacy = model.encode(texts, show_progress_bar=True, convert_to_numpy=True)
+    legacy_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    bucketed = encode_bucketed(model, texts, batch_size=batch_size, token_budget=token_budget)
+    bucketed_time = time.perf_counter() - t0
+
+    print(f"chunks={len(texts)} batch_size={batch_size} token_budget={token_budget} threads={threads or 'default'}")
+    print(f"model.encode     : {len(texts) / legacy_time:.1f} chunks/sec ({legacy_time:.2f}s)")
+    print(f"encode_bucketed  : {len(texts) / bucketed_time:.1f} chunks/sec ({bucketed_time:.2f}s, {legacy_time / bucketed_time:.2f}x)")
+    print(f"max |difference| : {np.abs(legacy - bucketed).max():.2e}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python benchmarks/bench_embedding_batching.py <chunks.jsonl|chunks.json> [batch_size] [token_budget] [threads]")
+        sys.exit(1)
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else DEFAULT_BATCH_SIZE
+    budget = int(sys.argv[3]) if len(sys.argv) > 3 else DEFAULT_TOKEN_BUDGET
+    threads = int(sys.argv[4]) if len(sys.argv) > 4 else None
+    run(sys.argv[1], size, budget, threads)
@@ -0,0 +1,104 @@
+"""
+Benchmark: recall@k and latency of dense-only search (utils.qdrant.search_qdrant)
+vs hybrid dense + BM25 with reciprocal rank fusion (utils.qdrant.hybrid_search).
+
+Builds a synthetic tender corpus whose chunks share boilerplate wording and
+differ in the exact tokens questions hinge on (clause numbers, annexure IDs,
+rupee amounts, EMD references). Every question targets one chunk by such a
+token; recall@k is the share of questions whose chunk is in the top k.
+Everything runs in a temporary directory against the in-process vector store.
+
+Usage: python benchmarks/bench_hybrid_retrieval.py [n_chunks] [n_queries] [embedding_model]
+"""
+import os
+import sys
+import time
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["VECTOR_STORE_DIR"] = os.path.join(_tmp.name, "vector_store")
+os.environ["SPARSE_INDEX_DIR"] = os.path.join(_tmp.name, "sparse_index")
+
+import numpy as np
+from utils.model_registry import get_embedder, DEFAULT_EMBEDDING_MODEL
+from utils.qdrant import upload_embed_to_qdrant, search_qdrant, hybrid_search
+from utils.query_cache import embed_query
+
+TOPICS = [
+    "The bidder shall furnish a performance bank guarantee valid for the contract period",
+    "Payment shall be released within thirty days of acceptance of the invoice by the engineer in charge",
+    "The contractor shall maintain insurance covering all works, materials and third party liabilities",
+    "Liquidated damages shall be levied for every week of delay beyond the scheduled completion date",
+    "All disputes shall be referred to arbitration under the Arbitration and Conciliation Act",
+    "The bidder shall submit documents establishing eligibility and past experience of similar works",
+]
+ROMAN = ["I", "II", "III", "IV", "V", "VI", "VII", "VIII", "IX", "X", "XI", "XII", "XIII", "XIV", "XV"]
+
+
+def build_corpus(n_chunks, rng):
+    chunks, questions = [], []
+    for i in range(n_chunks):
+        topic = TOPICS[i % len(TOPICS)]
+        clause = f"{rng.randint(1, 12)}.{rng.randint(1, 9)}.{i}"
+        annexure = f"Annexure-{ROMAN[rng.randrange(len(ROMAN))]}{i}"
+        amount = f"Rs. {rng.randint(1, 99)},{rng.randint(10, 99)},{rng.randint(100, 999)}"
+        text = (
+            f"Clause {clause}: {topic}. The format is given in {annexure}. "
+            f"An EMD of {amount} shall accompany the bid as per tender no. TN/{2020 + i % 5}/{i}."
+        )
+        chunks.append({
+            "text": text,
+            "metadata": {"source": "bench", "chunk_index": i, "page_number": i // 4 + 1, "description": topic[:40]}
+        })
+        kind = i % 3
+        if kind == 0:
+            questions.append((f"What does clause {clause} require?", i))
+        elif kind == 1:
+            questions.append((f"Where is the format of {annexure.lower().replace('-', ' ')}?", i))
+        else:
+            questions.append((f"Which bid needs an EMD of {amount}?", i))
+    return chunks, questions
+
+
+def measure(label, search, questions, k_values):
+    top = max(k_values)
+    found, start = [], time.perf_counter()
+    for question, _ in questions:
+        found.append([hit.payload["metadata"]["chunk_index"] for hit in search(question, top)])
+    latency = (time.perf_counter() - start) / len(questions) * 1000
+    recalls = "  ".join(
+        f"recall@{k}={np.mean([target in hits[:k] for (_, target), hits in zip(questions, found)]):.3f}"
+        for k in k_values
+    )
+    print(f"{label:<8}: {recalls}  {latency:6.2f} ms/query")
+
+
+def run(n_chunks, n_queries, model_name):
+    rng = random.Random(0)
+    chunks, questions = build_corpus(n_chunks, rng)
+    questions = rng.sample(questions, min(n_queries, len(questions)))
+    print(f"chunks={n_chunks} queries={len(questions)} model={model_name}")
+
+    model = get_embedder(model_name)
+    embeddings = model.encode([c["text"] for c in chunks], batch_size=64, show_progress_bar=False, convert_to_numpy=True)
+    client = upload_embed_to_qdrant(
+        None, "bench_hybrid", None, vector_size=embeddings.shape[1], data=chunks, embeddings=embeddings,
+        vector_backend="local"
+    )
+    # Query vectors are cached up front so both runs time retrieval only
+    for question, _ in questions:
+        embed_query(question, model_name)
+
+    k_values = (1, 3, 5, 10)
+    measure("dense", lambda q, k: search_qdrant(q, client, "bench_hybrid", top_k=k, model_name=model_name), questions, k_values)
+    measure("hybrid", lambda q, k: hybrid_search(q, client, "bench_hybrid", top_k=k, model_name=model_name), questions, k_values)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 3000
+    q = int(sys.argv[2]) if len(sys.argv) > 2 else 300
+    name = sys.argv[3] if len(sys.argv) > 3 else DEFAULT_EMBEDDING_MODEL
+    run(n, q, name)
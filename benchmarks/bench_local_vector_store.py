@@ -0,0 +1,84 @@
+"""
+Benchmark: query latency and recall@k of utils.vector_store.LocalVectorStore,
+exact (matrix-vector product) vs the kNN graph index, against brute force.
+
+Uses clustered random unit vectors, which behave more like sentence embeddings
+than uniform noise. The graph is only used above LOCAL_EXACT_SEARCH_LIMIT live
+points, so the graph run lowers the limit for its own store.
+
+Usage: python benchmarks/bench_local_vector_store.py [n_points] [n_queries] [top_k]
+"""
+import os
+import sys
+import time
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from qdrant_client.models import VectorParams, Distance, PointStruct
+import utils.vector_store as vector_store
+from utils.vector_store import LocalVectorStore
+
+DIM = 384
+
+
+def _vectors(n, rng):
+    centers = rng.standard_normal((max(1, n // 400), DIM))
+    vectors = centers[rng.integers(0, len(centers), n)] + 0.5 * rng.standard_normal((n, DIM))
+    return (vectors / np.linalg.norm(vectors, axis=1, keepdims=True)).astype(np.float32)
+
+
+def _fill(store, vectors):
+    store.create_collection("bench", VectorParams(size=DIM, distance=Distance.COSINE))
+    for start in range(0, len(vectors), 5000):
+        points = [
+            PointStruct(id=i, vector=vectors[i].tolist(), payload={"chunk_index": i})
+            for i in range(start, min(len(vectors), start + 5000))
+        ]
+        store.upsert("bench", points, wait=False)
+    store.flush()
+
+
+def _measure(label, store, queries, truth, top_k):
+    store.search("bench", queries[0], limit=top_k)  # builds the graph if this store uses one
+    t0 = time.perf_counter()
+    found = [[hit.id for hit in store.search("bench", q, limit=top_k)] for q in queries]
+    elapsed = (time.perf_counter() - t0) / len(queries)
+    recall = np.mean([len(set(f) & set(t)) / top_k for f, t in zip(found, truth)])
+    print(f"{label:<12}: {elapsed * 1000:7.2f} ms/query, recall@{top_k} = {recall:.3f}")
+
+
+def run(n_points, n_queries, top_k):
+    rng = np.random.default_rng(0)
+    vectors = _vectors(n_points, rng)
+    queries = vectors[rng.integers(0, n_points, n_queries)] + 0.05 * rng.standard_normal((n_queries, DIM))
+    queries = (queries / np.linalg.norm(queries, axis=1, keepdims=True)).astype(np.float32)
+    print(f"points={n_points} queries={n_queries} dim={DIM}")
+
+    t0 = time.perf_counter()
+    truth = [np.argsort(-(vectors @ q))[:top_k].tolist() for q in queries]
+    print(f"{'brute force':<12}: {(time.perf_counter() - t0) / n_queries * 1000:7.2f} ms/query")
+
+    limit = vector_store.EXACT_SEARCH_LIMIT
+    with tempfile.TemporaryDirectory() as root:
+        vector_store.EXACT_SEARCH_LIMIT = n_points
+        exact = LocalVectorStore(os.path.join(root, "exact"))
+        _fill(exact, vectors)
+        _measure("exact", exact, queries, truth, top_k)
+
+        vector_store.EXACT_SEARCH_LIMIT = 0
+        graph = LocalVectorStore(os.path.join(root, "graph"))
+        _fill(graph, vectors)
+        t0 = time.perf_counter()
+        graph.search("bench", queries[0], limit=top_k)
+        print(f"{'graph build':<12}: {time.perf_counter() - t0:7.2f} s")
+        _measure("graph", graph, queries, truth, top_k)
+    vector_store.EXACT_SEARCH_LIMIT = limit
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 100000
+    q = int(sys.argv[2]) if len(sys.argv) > 2 else 100
+    k = int(sys.argv[3]) if len(sys.argv) > 3 else 10
+    run(n, q, k)
@@ -0,0 +1,143 @@
+"""
+Measurement: prompt tokens spent on redundant context with plain top-k retrieval
+vs MMR selection (utils.retrieval.mmr_select) on a sample question set.
+
+Chunks come from the real chunker (chunk_size=800, chunk_overlap=160) over a
+PDF, or over a synthetic tender whose sections repeat boilerplate clauses.
+For each question both modes pick `top_k` chunks and build_prompt builds the
+prompt. Reported per mode: prompt tokens (embedding-model tokenizer), distinct
+sentences in the context, and the share of context sentences that repeat one
+already in the prompt. The last line gives the smallest MMR k that covers as
+many distinct sentences as plain top-k, and the prompt tokens it saves.
+
+Usage: python benchmarks/bench_mmr_prompt_tokens.py [top_k] [mmr_lambda] [pdf_path] [embedding_model]
+"""
+import os
+import re
+import sys
+import random
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+_tmp = tempfile.TemporaryDirectory()
+os.environ["VECTOR_STORE_DIR"] = os.path.join(_tmp.name, "vector_store")
+os.environ["SPARSE_INDEX_DIR"] = os.path.join(_tmp.name, "sparse_index")
+
+import numpy as np
+from utils.model_registry import get_embedder, DEFAULT_EMBEDDING_MODEL
+from utils.chunking import chunk_pages_to_embedding_ready_format
+from utils.qdrant import upload_embed_to_qdrant, search_qdrant
+from utils.query_cache import embed_query
+from utils.retrieval import mmr_select, MMR_LAMBDA
+from utils.llm import build_prompt
+
+QUESTIONS = [
+    "What is the EMD amount and how should it be paid?",
+    "What is the validity period of the bid?",
+    "What performance bank guarantee is required?",
+    "When will payments be released to the contractor?",
+    "What are the liquidated damages for delay?",
+    "How are disputes resolved?",
+    "What insurance must the contractor maintain?",
+    "What documents are needed to prove eligibility?",
+    "Can the tender be cancelled by the department?",
+    "What is the completion period of the work?",
+    "Who bears the cost of preparing the bid?",
+    "What happens if the bidder withdraws the bid?",
+]
+
+BOILERPLATE = [
+    "The Earnest Money Deposit (EMD) of Rs. 2,50,000 shall be paid by demand draft in favour of the Executive Engineer.",
+    "Bids shall remain valid for 90 days from the date of opening of the technical bid.",
+    "The department reserves the right to cancel the tender at any stage without assigning any reason.",
+    "The bidder shall bear all costs associated with the preparation and submission of the bid.",
+]
+SECTIONS = [
+    ("Instructions to Bidders", [
+        "Bidders shall submit documents establishing eligibility, turnover and experience of similar works.",
+        "A bid withdrawn after the deadline shall lead to forfeiture of the EMD.",
+    ]),
+    ("General Conditions of Contract", [
+        "The contractor shall furnish a performance bank guarantee of 5% of the contract value within 15 days.",
+        "Running bills shall be paid within 30 days of acceptance by the Engineer in Charge.",
+        "Liquidated damages at 0.5% of the contract value per week of delay, up to 10%, shall be levied.",
+    ]),
+    ("Special Conditions of Contract", [
+        "The work shall be completed within 18 months from the date of the letter of award.",
+        "The contractor shall insure the works, materials and third party liabilities until handover.",
+        "Disputes shall be settled by arbitration under the Arbitration and Conciliation Act, 1996.",
+    ]),
+]
+
+
+def synthetic_pages(rng, pages_per_section=6):
+    pages = []
+    for title, clauses in SECTIONS:
+        for p in range(pages_per_section):
+            sentences = [f"{title}, page {p + 1}."]
+            for _ in range(6):
+                sentences.append(rng.choice(clauses))
+                sentences.append(rng.choice(BOILERPLATE))
+            pages.append({"page_number": len(pages) + 1, "text": " ".join(sentences)})
+    return pages
+
+
+def pdf_pages(pdf_path):
+    from utils.pdf_to_json import iter_pdf_pages
+    return list(iter_pdf_pages(pdf_path))
+
+
+def _sentences(text):
+    return [re.sub(r"\s+", " ", s).strip().lower() for s in re.split(r"(?<=[.!?])\s+", text) if len(s.strip()) > 20]
+
+
+def context_stats(hits, tokenizer, question):
+    prompt = build_prompt(question, hits)
+    tokens = len(tokenizer(prompt, add_special_tokens=False, verbose=False)["input_ids"])
+    sentences = [s for hit in hits for s in _sentences(hit.payload["text"])]
+    distinct = len(set(sentences))
+    repeated = 1 - distinct / len(sentences) if sentences else 0.0
+    return tokens, distinct, repeated
+
+
+def run(top_k, mmr_lambda, pdf_path, model_name):
+    pages = pdf_pages(pdf_path) if pdf_path else synthetic_pages(random.Random(0))
+    chunks = chunk_pages_to_embedding_ready_format(pages, source_name="bench", chunk_size=800, chunk_overlap=160)
+    model = get_embedder(model_name)
+    embeddings = model.encode([c["text"] for c in chunks], show_progress_bar=False, convert_to_numpy=True)
+    client = upload_embed_to_qdrant(
+        None, "bench_mmr", None, vector_size=embeddings.shape[1], data=chunks, embeddings=embeddings,
+        vector_backend="local", sparse_index=False
+    )
+    print(f"chunks={len(chunks)} questions={len(QUESTIONS)} top_k={top_k} lambda={mmr_lambda}")
+
+    plain, mmr, savings = [], [], []
+    for question in QUESTIONS:
+        candidates = search_qdrant(question, client, "bench_mmr", top_k=max(20, top_k), model_name=model_name, with_vectors=True)
+        query = embed_query(question, model_name)
+        plain.append(context_stats(candidates[:top_k], model.tokenizer, question))
+        mmr.append(context_stats(mmr_select(query, candidates, top_k, lambda_=mmr_lambda), model.tokenizer, question))
+        # Smallest MMR selection covering as many distinct sentences as plain top-k
+        for k in range(1, top_k + 1):
+            tokens, distinct, _ = context_stats(mmr_select(query, candidates, k, lambda_=mmr_lambda), model.tokenizer, question)
+            if distinct >= plain[-1][1]:
+                savings.append(plain[-1][0] - tokens)
+                break
+
+    for label, rows in (("top-k", plain), ("mmr", mmr)):
+        tokens, distinct, repeated = (np.mean(column) for column in zip(*rows))
+        print(f"{label:<6}: {tokens:7.0f} prompt tokens, {distinct:5.1f} distinct sentences, {repeated:6.1%} repeated")
+    if savings:
+        print(
+            f"mmr matches top-{top_k} sentence coverage on {len(savings)}/{len(QUESTIONS)} questions "
+            f"with {np.mean(savings):.0f} fewer prompt tokens on average"
+        )
+
+
+if __name__ == "__main__":
+    k = int(sys.argv[1]) if len(sys.argv) > 1 else 5
+    lam = float(sys.argv[2]) if len(sys.argv) > 2 else MMR_LAMBDA
+    pdf = sys.argv[3] if len(sys.argv) > 3 and sys.argv[3] != "synthetic" else None
+    name = sys.argv[4] if len(sys.argv) > 4 else DEFAULT_EMBEDDING_MODEL
+    run(k, lam, pdf, name)
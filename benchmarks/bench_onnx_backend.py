@@ -0,0 +1,68 @@
+"""
+Benchmark: PyTorch (sentence-transformers) vs ONNX Runtime fp32 vs ONNX Runtime
+int8 embedding backends.
+
+Reports parity (cosine similarity against the PyTorch vectors), single-query
+latency (p50/p95 over the queries) and bulk throughput (chunks/sec).
+
+Usage: python benchmarks/bench_onnx_backend.py <chunks.jsonl|chunks.json> [n_queries]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from utils.records import iter_records
+from utils.model_registry import get_embedder, DEFAULT_EMBEDDING_MODEL
+from utils.create_embeding import encode_bucketed
+
+QUERIES = [
+    "What is the EMD amount?",
+    "When is the bid due date?",
+    "What are the eligibility criteria for bidders?",
+    "What is the performance security percentage?",
+    "Which documents must be submitted with the technical bid?",
+]
+
+
+def _normalized(vectors):
+    return vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+
+
+def run(path, n_queries):
+    texts = [record["text"] for record in iter_records(path)]
+    queries = (QUERIES * (n_queries // len(QUERIES) + 1))[:n_queries]
+    reference = None
+
+    for backend in ("torch", "onnx", "onnx-int8"):
+        model = get_embedder(DEFAULT_EMBEDDING_MODEL, backend)
+        model.encode(queries[:2], show_progress_bar=False)
+
+        latencies = []
+        for query in queries:
+            t0 = time.perf_counter()
+            model.encode(query, show_progress_bar=False, convert_to_numpy=True)
+            latencies.append((time.perf_counter() - t0) * 1000)
+
+        t0 = time.perf_counter()
+        vectors = encode_bucketed(model, texts)
+        bulk_time = time.perf_counter() - t0
+
+        if reference is None:
+            reference = _normalized(vectors)
+        cosine = (reference * _normalized(vectors)).sum(axis=1)
+
+        print(
+            f"{backend:10s} query p50={np.percentile(latencies, 50):6.2f} ms p95={np.percentile(latencies, 95):6.2f} ms"
+            f" | bulk {len(texts) / bulk_time:7.1f} chunks/sec"
+            f" | cosine vs torch min={cosine.min():.4f} mean={cosine.mean():.4f}"
+        )
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python benchmarks/bench_onnx_backend.py <chunks.jsonl|chunks.json> [n_queries]")
+        sys.exit(1)
+    run(sys.argv[1], int(sys.argv[2]) if len(sys.argv) > 2 else 200)
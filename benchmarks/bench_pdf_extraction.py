@@ -0,0 +1,44 @@
+"""
+Benchmark: pages/sec of pdf_to_basic_json as the worker count grows.
+
+Usage: python benchmarks/bench_pdf_extraction.py <pdf_path> [workers ...]
+"""
+import os
+import sys
+import tempfile
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from utils.pdf_to_json import pdf_to_basic_json
+
+
+def run(pdf_path, worker_counts):
+    out_path = os.path.join(tempfile.mkdtemp(), "bench_pages.json")
+    baseline = None
+    reference = None
+
+    print(f"{'workers':>8} {'pages':>7} {'seconds':>9} {'pages/sec':>10} {'speedup':>8}")
+    for workers in worker_counts:
+        start = time.perf_counter()
+        pages = pdf_to_basic_json(pdf_path, out_path, workers=workers)
+        elapsed = time.perf_counter() - start
+
+        # Parallel output must match the serial contract exactly
+        if reference is None:
+            reference = pages
+        elif pages != reference:
+            print(f"❌ Output for {workers} workers differs from the first run")
+
+        rate = len(pages) / elapsed if elapsed else float("inf")
+        baseline = baseline or rate
+        print(f"{workers:>8} {len(pages):>7} {elapsed:>9.2f} {rate:>10.1f} {rate / baseline:>7.2f}x")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python benchmarks/bench_pdf_extraction.py <pdf_path> [workers ...]")
+        sys.exit(1)
+
+    counts = [int(w) for w in sys.argv[2:]] or [1, 2, 4, os.cpu_count() or 8]
+    run(sys.argv[1], counts)
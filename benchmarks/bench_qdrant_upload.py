@@ -0,0 +1,71 @@
+"""
+Benchmark: one client.upsert of every point (the previous uploader) vs
+utils.qdrant.upload_in_batches (streamed batches, concurrent wait=False
+requests, final wait=True barrier, retries).
+
+Uses random vectors. Without a URL it runs against QdrantClient(":memory:"),
+which measures serialization overhead only; pass a Qdrant URL to include the
+network.
+
+Usage: python benchmarks/bench_qdrant_upload.py [n_points] [qdrant_url] [batch_size] [parallel]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from qdrant_client import QdrantClient
+from qdrant_client.models import VectorParams, Distance, PointStruct
+from utils.qdrant import upload_in_batches, UPLOAD_BATCH_SIZE, UPLOAD_PARALLEL
+
+DIM = 384
+
+
+def _points(vectors):
+    return (
+        PointStruct(id=i, vector=vector.tolist(), payload={"text": f"chunk {i} " + "lorem ipsum " * 100})
+        for i, vector in enumerate(vectors)
+    )
+
+
+def _fresh_collection(client, name):
+    if client.collection_exists(name):
+        client.delete_collection(name)
+    client.create_collection(name, vectors_config=VectorParams(size=DIM, distance=Distance.COSINE))
+
+
+def run(n_points, url, batch_size, parallel):
+    client = QdrantClient(url=url) if url else QdrantClient(":memory:")
+    vectors = np.random.default_rng(0).standard_normal((n_points, DIM)).astype(np.float32)
+    name = "bench_upload"
+    print(f"points={n_points} target={url or ':memory:'}")
+
+    _fresh_collection(client, name)
+    t0 = time.perf_counter()
+    try:
+        client.upsert(collection_name=name, points=list(_points(vectors)))
+        elapsed = time.perf_counter() - t0
+        print(f"single upsert          : {n_points / elapsed:9.1f} points/sec ({elapsed:.2f}s)")
+    except Exception as e:
+        print(f"single upsert          : failed after {time.perf_counter() - t0:.2f}s ({e})")
+
+    # The in-memory client is written to sequentially regardless of `parallel`
+    for workers in (sorted({1, parallel}) if url else [1]):
+        _fresh_collection(client, name)
+        stats = upload_in_batches(client, name, _points(vectors), batch_size=batch_size, parallel=workers)
+        count = client.count(collection_name=name, exact=True).count
+        print(
+            f"batches of {batch_size} x {workers} in flight: {stats['points_per_sec']:9.1f} points/sec"
+            f" ({stats['seconds']:.2f}s, {count} points stored)"
+        )
+    client.delete_collection(name)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 20000
+    target = sys.argv[2] if len(sys.argv) > 2 and sys.argv[2] != "memory" else None
+    size = int(sys.argv[3]) if len(sys.argv) > 3 else UPLOAD_BATCH_SIZE
+    workers = int(sys.argv[4]) if len(sys.argv) > 4 else UPLOAD_PARALLEL
+    run(n, target, size, workers)
@@ -0,0 +1,61 @@
+"""
+Benchmark: langchain RecursiveCharacterTextSplitter + all_text.find() offset
+recovery (the previous chunker) vs utils.chunking.OffsetTextSplitter.
+
+Reports time, whether chunk texts are identical, and how many chunks the
+find() approach placed at the wrong offset (repeated text inside the overlap).
+
+Usage: python benchmarks/bench_splitter.py <pages.jsonl|pages.json> [chunk_size] [chunk_overlap]
+"""
+import os
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from utils.chunking import OffsetTextSplitter, DEFAULT_SEPARATORS
+from utils.records import iter_records
+
+
+def legacy_offsets(text, chunk_size, chunk_overlap):
+    splitter = RecursiveCharacterTextSplitter(
+        chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=DEFAULT_SEPARATORS
+    )
+    offsets, position = [], 0
+    for chunk in splitter.split_text(text):
+        start = text.find(chunk, position)
+        if start == -1:
+            start = position
+        position = start + len(chunk)
+        offsets.append((start, start + len(chunk)))
+    return offsets
+
+
+def run(path, chunk_size, chunk_overlap):
+    text = "\n\n".join(page["text"] for page in iter_records(path))
+
+    t0 = time.perf_counter()
+    legacy = legacy_offsets(text, chunk_size, chunk_overlap)
+    legacy_time = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    spans = OffsetTextSplitter(chunk_size, chunk_overlap).split_offsets(text)
+    offset_time = time.perf_counter() - t0
+
+    same_text = [text[a:b] for a, b in legacy] == [text[a:b] for a, b in spans]
+    misplaced = sum(1 for old, new in zip(legacy, spans) if old != new)
+
+    print(f"chars={len(text)} chunks={len(spans)} chunk_size={chunk_size} overlap={chunk_overlap}")
+    print(f"langchain + find : {legacy_time:.3f}s")
+    print(f"offset splitter  : {offset_time:.3f}s ({legacy_time / offset_time:.1f}x)")
+    print(f"identical chunk texts: {same_text}, offsets corrected: {misplaced}")
+
+
+if __name__ == "__main__":
+    if len(sys.argv) < 2:
+        print("Usage: python benchmarks/bench_splitter.py <pages.jsonl|pages.json> [chunk_size] [chunk_overlap]")
+        sys.exit(1)
+    size = int(sys.argv[2]) if len(sys.argv) > 2 else 800
+    overlap = int(sys.argv[3]) if len(sys.argv) > 3 else 160
+    run(sys.argv[1], size, overlap)
@@ -0,0 +1,70 @@
+"""
+Benchmark: embed artifact with vectors inline (indented JSON, as before, and
+JSONL) vs metadata JSONL + .npy vectors (float32 / float16, memory-mapped on load).
+
+Uses random vectors, so it runs without the embedding model.
+Reports file size, save time and load time (load = every vector as floats).
+
+Usage: python benchmarks/bench_vector_artifact.py [n_chunks] [dim]
+"""
+import os
+import sys
+import time
+import shutil
+import tempfile
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+import numpy as np
+from utils.records import write_records, read_records, write_vectors, load_vectors, vectors_path
+from utils.save_to_json import iter_embed_records
+
+
+def _size(*paths):
+    return sum(os.path.getsize(p) for p in paths if os.path.exists(p))
+
+
+def run(n_chunks, dim):
+    rng = np.random.default_rng(0)
+    embeddings = rng.standard_normal((n_chunks, dim)).astype(np.float32)
+    embed_data = [
+        {"text": f"chunk {i} " + "lorem ipsum " * 150, "metadata": {"chunk_index": i, "page_number": i // 3 + 1}}
+        for i in range(n_chunks)
+    ]
+    tmp = tempfile.mkdtemp()
+    try:
+        print(f"chunks={n_chunks} dim={dim}")
+        for label, path in (("json (inline)", "embed.json"), ("jsonl (inline)", "embed.jsonl")):
+            path = os.path.join(tmp, path)
+            t0 = time.perf_counter()
+            write_records(iter_embed_records(embed_data, embeddings), path)
+            save = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            vectors = np.array([record["embedding"] for record in read_records(path)], dtype=np.float32)
+            load = time.perf_counter() - t0
+            print(f"{label:20s} size={_size(path) / 1e6:8.2f} MB save={save:6.3f}s load={load:6.3f}s")
+
+        for dtype in ("float32", "float16"):
+            path = os.path.join(tmp, f"embed_{dtype}.jsonl")
+            t0 = time.perf_counter()
+            write_records(embed_data, path)
+            write_vectors(embeddings, vectors_path(path), dtype)
+            save = time.perf_counter() - t0
+            t0 = time.perf_counter()
+            read_records(path)
+            vectors = np.asarray(load_vectors(vectors_path(path)), dtype=np.float32)
+            load = time.perf_counter() - t0
+            vec_size = _size(vectors_path(path))
+            error = np.abs(vectors - embeddings).max()
+            print(
+                f"{'jsonl + npy ' + dtype:20s} size={_size(path, vectors_path(path)) / 1e6:8.2f} MB save={save:6.3f}s"
+                f" load={load:6.3f}s (vectors alone {vec_size / 1e6:.2f} MB, max error {error:.1e})"
+            )
+    finally:
+        shutil.rmtree(tmp)
+
+
+if __name__ == "__main__":
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 5000
+    d = int(sys.argv[2]) if len(sys.argv) > 2 else 384
+    run(n, d)
@@ -9,9 +9,12 @@ import json
 from utils.pdf_to_json import pdf_to_basic_json_runnable
 from utils.extract_index import extract_index_runnable
 from utils.chunking import chunking_runnable
+from utils.dedup import strip_boilerplate_runnable, dedup_chunks_runnable
 from utils.create_embeding import embed_text_runnable
 from utils.save_to_json import save_json_runnable
 from utils.qdrant import upload_qdrant_runnable, rag_query_runnable
+from utils.ingest_cache import cached_pipeline_runnable
+from utils.incremental import incremental_pipeline_runnable
 from utils.log import setup_logger
 import pprint
 
@@ -47,14 +50,16 @@ if "processing_stats" not in st.session_state:
 
 
 # Pipelines
-rag_pipeline = (
+rag_pipeline = cached_pipeline_runnable(incremental_pipeline_runnable(
     pdf_to_basic_json_runnable()
     | extract_index_runnable()
+    | strip_boilerplate_runnable()
     | chunking_runnable()
+    | dedup_chunks_runnable()
     | embed_text_runnable()
     | save_json_runnable()
     | upload_qdrant_runnable()
-)
+))
 query_pipe = rag_query_runnable()
 
 with open('/utils/style.css') as f:
@@ -100,15 +105,23 @@ with st.sidebar:
                     
                     input_dict = {
                         "pdf_path": file_path,
-                        "raw_json_path": f"temp_uploads/{file_name}.json",
-                        "embed_json_path": f"temp_uploads/{file_name}_chunks.json",
-                        "index_json_path": f"temp_uploads/{file_name}_index.json",
+                        "raw_json_path": f"temp_uploads/{file_name}.jsonl",
+                        "embed_json_path": f"temp_uploads/{file_name}_chunks.jsonl",
+                        "index_json_path": f"temp_uploads/{file_name}_index.jsonl",
                         "source_name": file_name,
                         "doc_date": datetime.now().strftime("%B %Y"),
                         "title": file_name.replace("_", " ").title(),
                         "chunk_size": 800,
                         "chunk_overlap": 160,
-                        "collection_name": f"{file_name}_collection"
+                        "extract_workers": os.cpu_count() or 1,
+                        "embed_workers": int(os.getenv("EMBED_WORKERS", 1)),
+                        "embed_backend": os.getenv("EMBED_BACKEND", "torch"),
+                        "vector_backend": os.getenv("VECTOR_BACKEND", "qdrant"),
+                        "collection_profile": os.getenv("COLLECTION_PROFILE", "default"),
+                        "persist": "async",
+                        "dedup": os.getenv("DEDUP", "false").lower() == "true",
+                        # SHARED_COLLECTION puts every document in one collection
+                        "collection_name": os.getenv("SHARED_COLLECTION") or f"{file_name}_collection"
                     }
                     
                     result = rag_pipeline.invoke(input_dict)
@@ -122,6 +135,10 @@ with st.sidebar:
                         "processing_time": processing_time,
                         "chunks_created": result.get("chunks_count", "N/A"),
                         "embeddings_generated": result.get("embeddings_count", "N/A"),
+                        "cache_hit": result.get("cache_hit", False),
+                        "embeddings_saved": result.get("dedup_stats", {}).get("embeddings_saved", 0),
+                        "embedding_cache_hit_rate": (result.get("embedding_cache_stats") or {}).get("hit_rate", 0.0),
+                        "embedding_time_saved": (result.get("embedding_cache_stats") or {}).get("time_saved_s", 0.0),
                         "processed_at": datetime.now().strftime("%Y-%m-%d %H:%M:%S")
                     }
                     
@@ -231,6 +248,12 @@ with col1:
                             "qdrant_client": st.session_state.qdrant_client,
                             "collection_name": st.session_state.collection_name,
                             "query": prompt_for_llm,
+                            "embed_backend": os.getenv("EMBED_BACKEND", "torch"),
+                            "retrieval_mode": os.getenv("RETRIEVAL_MODE", "hybrid"),
+                            "rerank": os.getenv("RERANK", "false").lower() == "true",
+                            "mmr": os.getenv("MMR", "false").lower() == "true",
+                            "context_neighbours": os.getenv("CONTEXT_NEIGHBOURS", "false").lower() == "true",
+                            "collection_profile": os.getenv("COLLECTION_PROFILE", "default"),
                             "history": [(q, a) for q, a, *rest in st.session_state.chat_history]  # optional, can be passed if pipeline needs
                         }
                         
@@ -259,7 +282,8 @@ with col1:
                             "contexts_found": len(contexts),
                             "query_length": len(query.strip()),
                             "response_length": len(answer),
-                            "collection": st.session_state.collection_name
+                            "collection": st.session_state.collection_name,
+                            "stages": response.get("stage_timings", {})
                         }
                         
                         # Add to chat history
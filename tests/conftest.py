@@ -0,0 +1,72 @@
+import os
+import re
+import sys
+import zlib
+import tempfile
+import importlib.machinery
+import importlib.util
+import numpy as np
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# The modules live in UTILS/ but are imported as `utils` (the directory name
+# only resolves on case-insensitive checkouts), so map the package explicitly
+if "utils" not in sys.modules:
+    _spec = importlib.machinery.ModuleSpec("utils", None, is_package=True)
+    _utils = importlib.util.module_from_spec(_spec)
+    _utils.__path__ = [os.path.join(ROOT, "UTILS")]
+    sys.modules["utils"] = _utils
+
+# On-disk stores default to paths relative to the working directory; keep test runs out of the checkout
+_tmp = tempfile.mkdtemp(prefix="ragyy-tests-")
+for _name in ("VECTOR_STORE_DIR", "SPARSE_INDEX_DIR", "EMBED_CACHE_DIR", "INGEST_CACHE_DIR", "REINGEST_MANIFEST_DIR"):
+    os.environ[_name] = os.path.join(_tmp, _name.lower())
+
+STUB_DIM = 64
+
+
+class StubEncoder:
+    """
+    Offline stand-in for a SentenceTransformer: a normalized bag of hashed
+    alphabetic words. Digits are ignored, so chunks that only differ in clause
+    numbers or amounts get the same vector, which is the case BM25 is there for.
+    """
+
+    def get_sentence_embedding_dimension(self):
+        return STUB_DIM
+
+    def encode(self, texts, show_progress_bar=False, convert_to_numpy=True, batch_size=None):
+        vectors = np.zeros((len(texts), STUB_DIM), dtype=np.float32)
+        for row, text in enumerate(texts):
+            for word in re.findall(r"[a-z]+", text.lower()):
+                vectors[row, zlib.crc32(word.encode()) % STUB_DIM] += 1.0
+        norms = np.linalg.norm(vectors, axis=1, keepdims=True)
+        return vectors / np.clip(norms, 1e-12, None)
+
+
+@pytest.fixture
+def stub_backend(monkeypatch):
+    """Name of an embed_backend that encodes with StubEncoder."""
+    from utils import model_registry
+    model_registry.register_loader("stub", lambda name: StubEncoder())
+    monkeypatch.setitem(model_registry.EMBED_BACKENDS, "stub", "stub")
+    return "stub"
+
+
+def make_chunks(source, texts, page_size=4):
+    """Chunk records as the chunker emits them: contiguous char offsets, chunk and page numbers."""
+    chunks, position = [], 0
+    for i, text in enumerate(texts):
+        chunks.append({
+            "text": text,
+            "metadata": {
+                "source": source,
+                "chunk_index": i,
+                "page_number": i // page_size + 1,
+                "char_start": position,
+                "char_end": position + len(text),
+            },
+        })
+        position += len(text) + 1
+    return chunks
@@ -0,0 +1,81 @@
+import random
+import pytest
+from utils.chunking import (
+    chunk_pages_to_embedding_ready_format, iter_chunks_from_pages, chunking_runnable, _PageLocator
+)
+from utils.records import write_records
+
+WORDS = "tender bidder clause shall submit the security deposit within days. Annexure\nform, payment; guarantee".split(" ")
+
+
+def _random_pages(rng, count):
+    return [{"text": " ".join(rng.choice(WORDS) for _ in range(rng.randint(50, 400)))} for _ in range(count)]
+
+
+def _spans(chunks):
+    return [(c["text"], c["metadata"]["char_start"], c["metadata"]["char_end"], c["metadata"]["page_number"],
+             c["metadata"]["chunk_index"]) for c in chunks]
+
+
+def _page_locator(pages):
+    starts, ends, position = [], [], 0
+    for page in pages:
+        starts.append(position)
+        ends.append(position + len(page["text"]))
+        position += len(page["text"]) + 2
+    return _PageLocator(starts, ends)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_stream_matches_one_shot_within_one_window(seed):
+    rng = random.Random(seed)
+    pages = _random_pages(rng, rng.randint(3, 12))
+
+    one_shot = chunk_pages_to_embedding_ready_format(pages, chunk_size=300, chunk_overlap=60)
+    streamed = list(iter_chunks_from_pages(iter(pages), chunk_size=300, chunk_overlap=60, window_chars=10 ** 6))
+
+    assert _spans(streamed) == _spans(one_shot)
+
+
+@pytest.mark.parametrize("seed", range(5))
+def test_stream_across_windows_keeps_offsets_pages_and_coverage_exact(seed):
+    # Boundaries next to a window edge may differ from the one-shot split; everything else must hold
+    rng = random.Random(seed)
+    pages = _random_pages(rng, rng.randint(8, 20))
+    full_text = "\n\n".join(page["text"] for page in pages)
+    locator = _page_locator(pages)
+
+    streamed = list(iter_chunks_from_pages(iter(pages), chunk_size=300, chunk_overlap=60, window_chars=1500))
+
+    covered = set()
+    for i, (text, start, end, page, index) in enumerate(_spans(streamed)):
+        assert index == i
+        assert full_text[start:end] == text and len(text) <= 300
+        assert page == locator.page_for(start, end)
+        covered.update(range(start, end))
+    assert [c["metadata"]["char_start"] for c in streamed] == sorted({c["metadata"]["char_start"] for c in streamed})
+    assert all(pos in covered for pos, char in enumerate(full_text) if not char.isspace())
+
+
+def test_stream_mode_runnable_reads_the_page_artifact_lazily(tmp_path):
+    pages = _random_pages(random.Random(7), 6)
+    raw_json_path = str(tmp_path / "raw.jsonl")
+    write_records(pages, raw_json_path)
+    inputs = {"raw_json_path": raw_json_path, "index_entries": [], "chunk_size": 300, "chunk_overlap": 60}
+
+    listed = chunking_runnable().invoke(inputs)["chunks"]
+    streamed = chunking_runnable().invoke({**inputs, "chunking_mode": "stream"})["chunks"]
+
+    assert not isinstance(streamed, list)
+    assert _spans(list(streamed)) == _spans(listed)
+
+
+def test_errors_inside_the_chunk_stream_are_chunking_errors():
+    def pages():
+        yield {"text": "Clause 1. The bidder shall submit the form."}
+        raise OSError("page artifact truncated")
+
+    result = chunking_runnable().invoke({"pages": pages(), "index_entries": [], "chunking_mode": "stream"})
+
+    with pytest.raises(RuntimeError, match=r"\[chunking.py\].*page artifact truncated"):
+        list(result["chunks"])
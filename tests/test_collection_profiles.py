@@ -0,0 +1,55 @@
+from types import SimpleNamespace
+from utils.collection_profiles import COLLECTION_PROFILES, DEFAULT_HNSW, matching_profile
+from utils.qdrant import collection_search_params, forget_search_params
+from utils.vector_store import VectorStore, open_vector_store
+
+
+def _config(profile):
+    """A stand-in for qdrant's CollectionConfig of a collection created with `profile`."""
+    settings = COLLECTION_PROFILES[profile]
+    hnsw = {**DEFAULT_HNSW, **settings.get("hnsw", {})}
+    quantization = settings.get("quantization")
+    return SimpleNamespace(
+        hnsw_config=SimpleNamespace(**hnsw),
+        quantization_config=SimpleNamespace(scalar=SimpleNamespace(**quantization)) if quantization else None,
+        params=SimpleNamespace(
+            vectors=SimpleNamespace(on_disk=settings.get("on_disk_vectors")),
+            on_disk_payload=settings.get("on_disk_payload", False),
+        ),
+    )
+
+
+class TunedStore(VectorStore):
+    location = "tuned-test-store"
+
+    def __init__(self, profile):
+        self.profile, self.reads = profile, 0
+
+    def collection_config(self, collection_name):
+        self.reads += 1
+        return _config(self.profile)
+
+
+def test_matching_profile_recognises_each_profile():
+    for name in COLLECTION_PROFILES:
+        assert matching_profile(_config(name)) == name
+
+
+def test_search_params_come_from_the_collection_not_the_caller():
+    store = TunedStore("low_latency")
+
+    params = collection_search_params(store, "tenders_tuned", collection_profile="default")
+    again = collection_search_params(store, "tenders_tuned", collection_profile="low_memory")
+
+    assert params.hnsw_ef == 128 and params.quantization.rescore
+    assert again is params and store.reads == 1
+
+    # After the collection is retuned the next query reads its config again
+    store.profile = "low_memory"
+    forget_search_params(store, "tenders_tuned")
+    assert collection_search_params(store, "tenders_tuned").hnsw_ef == 64
+    assert store.reads == 2
+
+
+def test_stores_without_tuning_get_no_search_params():
+    assert collection_search_params(open_vector_store("local"), "tenders_local", collection_profile="low_latency") is None
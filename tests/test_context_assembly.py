@@ -0,0 +1,98 @@
+import uuid
+from qdrant_client.models import ScoredPoint
+from utils.chunking import chunk_pages_to_embedding_ready_format
+from utils.context_assembly import assemble_context, neighbour_keys, context_stats
+from utils.qdrant import upload_embed_to_qdrant, fetch_neighbours
+from conftest import STUB_DIM, StubEncoder
+
+PAGES = [
+    {"text": " ".join(f"Clause {p}.{c}: the bidder shall submit annexure {p}-{c} with the technical bid." for c in range(6))}
+    for p in range(4)
+]
+FULL_TEXT = "\n\n".join(page["text"] for page in PAGES)
+
+
+def _chunks(source="tender.pdf"):
+    return chunk_pages_to_embedding_ready_format(PAGES, source_name=source, chunk_size=200, chunk_overlap=100)
+
+
+def _hit(chunk, score=1.0):
+    return ScoredPoint(id=str(uuid.uuid4()), version=0, score=score, payload=chunk)
+
+
+def test_overlapping_chunks_merge_into_the_exact_document_text():
+    chunks = _chunks()
+    hits = [_hit(chunks[6], 0.9), _hit(chunks[5], 0.8), _hit(chunks[7], 0.7)]
+
+    spans = assemble_context(hits)
+
+    assert len(spans) == 1
+    metadata = spans[0]["metadata"]
+    assert (metadata["char_start"], metadata["char_end"]) == (chunks[5]["metadata"]["char_start"], chunks[7]["metadata"]["char_end"])
+    assert spans[0]["text"] == FULL_TEXT[metadata["char_start"]:metadata["char_end"]]
+    assert metadata["chunk_index"] == "5-7" and metadata["chunk_indices"] == [5, 6, 7]
+    assert spans[0]["score"] == 0.9
+    assert len(spans[0]["text"]) < sum(len(chunk["text"]) for chunk in chunks[5:8])
+
+
+def test_chunks_either_side_of_a_page_break_are_joined():
+    chunks = _chunks()
+
+    spans = assemble_context([_hit(chunks[4]), _hit(chunks[5])])
+
+    assert len(spans) == 1
+    assert spans[0]["text"] == chunks[4]["text"] + "\n" + chunks[5]["text"]
+    assert spans[0]["metadata"]["page_number"] == "1-2"
+
+
+def test_separate_spans_keep_the_order_of_their_best_hit():
+    chunks = _chunks()
+    other = _chunks("other.pdf")
+    no_offsets = {"text": "Summary table", "metadata": {"source": "tender.pdf"}}
+    hits = [_hit(chunks[15], 0.9), _hit(chunks[1], 0.8), _hit(other[15], 0.7), _hit(no_offsets, 0.6), _hit(chunks[2], 0.5)]
+
+    spans = assemble_context(hits)
+
+    assert [span["metadata"].get("chunk_index") for span in spans] == [15, "1-2", 15, None]
+    assert spans[1]["score"] == 0.8
+    assert spans[2]["metadata"]["source"] == "other.pdf"
+    assert spans[3]["text"] == "Summary table"
+    # The same chunk retrieved twice is only included once
+    assert assemble_context([_hit(chunks[5]), _hit(chunks[5])])[0]["text"] == chunks[5]["text"]
+
+
+def test_neighbours_are_only_used_when_they_join_a_hit():
+    chunks = _chunks()
+
+    spans = assemble_context([_hit(chunks[7])], neighbours=[chunks[6], chunks[8], chunks[17]])
+
+    assert len(spans) == 1
+    assert spans[0]["metadata"]["chunk_indices"] == [6, 7, 8]
+    assert spans[0]["text"] == FULL_TEXT[chunks[6]["metadata"]["char_start"]:chunks[8]["metadata"]["char_end"]]
+
+
+def test_neighbour_keys_and_stats():
+    chunks = _chunks()
+    hits = [_hit(chunks[7]), _hit(chunks[8]), _hit(chunks[0])]
+
+    assert neighbour_keys(hits) == sorted({("tender.pdf", -1), ("tender.pdf", 1), ("tender.pdf", 6), ("tender.pdf", 9)}, key=str)
+    spans = assemble_context(hits)
+    stats = context_stats(hits, spans)
+    assert (stats["hits"], stats["spans"]) == (3, 2)
+    assert stats["chars_after"] < stats["chars_before"]
+
+
+def test_neighbours_are_fetched_from_the_store():
+    chunks = _chunks()
+    collection = f"assembly_{uuid.uuid4().hex[:8]}"
+    client = upload_embed_to_qdrant(
+        None, collection, None, vector_size=STUB_DIM, data=chunks,
+        embeddings=StubEncoder().encode([chunk["text"] for chunk in chunks]), vector_backend="local"
+    )
+    hits = [_hit(chunks[7]), _hit(chunks[12])]
+
+    neighbours = fetch_neighbours(client, collection, hits)
+
+    assert sorted(record.payload["metadata"]["chunk_index"] for record in neighbours) == [6, 8, 11, 13]
+    spans = assemble_context(hits, neighbours)
+    assert [span["metadata"]["chunk_index"] for span in spans] == ["6-8", "11-13"]
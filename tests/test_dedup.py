@@ -0,0 +1,79 @@
+import numpy as np
+from utils.dedup import (
+    find_boilerplate_lines, strip_boilerplate, minhash_signature, collapse_near_duplicates, strip_boilerplate_chain_fn,
+    dedup_chunks_runnable
+)
+from conftest import make_chunks
+
+CLAUSE = ("The bidder shall furnish an earnest money deposit of the amount stated in the schedule "
+          "by demand draft or bank guarantee valid for one hundred and eighty days beyond the bid validity")
+
+
+def _pages(count=6):
+    return [
+        {"page_number": i, "text": f"ACME Tender No. 42/2024\nClause {i}.1 The bidder shall submit form {i}.\n"
+                                    f"Clause {i}.2 Payment within {i + 10} days.\nPage {i + 1} of {count}"}
+        for i in range(count)
+    ]
+
+
+def test_repeated_headers_and_page_markers_are_boilerplate_but_numbered_clauses_are_not():
+    lines = find_boilerplate_lines(_pages())
+
+    assert "acme tender no. 42/2024" in lines
+    assert "page # of #" in lines
+    assert not any(line.startswith("clause") for line in lines)
+
+
+def test_strip_boilerplate_keeps_page_numbers_and_counts_removed_lines():
+    pages, stats = strip_boilerplate(_pages())
+
+    assert [page["page_number"] for page in pages] == list(range(6))
+    assert pages[2]["text"] == "Clause 2.1 The bidder shall submit form 2.\nClause 2.2 Payment within 12 days."
+    assert all(page["boilerplate_removed"] == 2 for page in pages)
+    assert stats == {"boilerplate_lines": 2, "boilerplate_lines_removed": 12}
+
+
+def test_short_documents_keep_their_lines():
+    pages = _pages(2)
+
+    assert strip_boilerplate(pages) == (pages, {"boilerplate_lines": 0, "boilerplate_lines_removed": 0})
+
+
+def test_minhash_similarity_tracks_jaccard():
+    same = minhash_signature(CLAUSE)
+    near = minhash_signature(CLAUSE.replace("one hundred and eighty", "one hundred and eighty (180)"))
+    other = minhash_signature("Technical evaluation is carried out by a committee constituted by the purchaser")
+
+    np.testing.assert_array_equal(same, minhash_signature(CLAUSE.upper()))
+    assert np.mean(same == near) > 0.6
+    assert np.mean(same == other) < 0.2
+
+
+def test_near_duplicates_collapse_into_the_first_chunk_with_their_pages():
+    texts = [CLAUSE, "Technical evaluation is carried out by a committee.", CLAUSE + ".", CLAUSE, "Clause on warranty."]
+    chunks = make_chunks("tender.pdf", texts, page_size=1)
+
+    kept, collapsed = collapse_near_duplicates(chunks)
+
+    assert collapsed == 2
+    assert [chunk["text"] for chunk in kept] == [CLAUSE, texts[1], texts[4]]
+    assert kept[0]["metadata"]["duplicate_pages"] == [3, 4]
+    assert kept[0]["metadata"]["duplicate_chunks"] == [2, 3]
+    # The input chunks are not modified
+    assert "duplicate_pages" not in chunks[0]["metadata"]
+
+
+def test_runnables_only_act_when_dedup_is_on():
+    chunks = make_chunks("tender.pdf", [CLAUSE, CLAUSE, "Clause on warranty."])
+    inputs = {"pages": _pages(), "chunks": chunks}
+
+    assert strip_boilerplate_chain_fn(inputs) is inputs
+    assert dedup_chunks_runnable().invoke(inputs) is inputs
+
+    stripped = strip_boilerplate_chain_fn({**inputs, "dedup": True})
+    deduped = dedup_chunks_runnable().invoke({**stripped, "chunks": iter(chunks)})
+    assert stripped["dedup_stats"]["boilerplate_lines_removed"] == 12
+    assert len(deduped["chunks"]) == 2
+    assert deduped["dedup_stats"]["embeddings_saved"] == 1
+    assert deduped["dedup_stats"]["boilerplate_lines"] == 2
@@ -0,0 +1,51 @@
+import pytest
+from utils import embed_pool
+from utils.embed_pool import use_embed_pool, shutdown_embed_pool
+
+
+class FakePool:
+    def __init__(self, workers, model_name, threads_per_worker, backend):
+        self.settings = (workers, model_name, threads_per_worker, backend)
+        self.stopped = False
+
+    def shutdown(self):
+        self.stopped = True
+
+
+@pytest.fixture(autouse=True)
+def fake_pools(monkeypatch):
+    monkeypatch.setattr(embed_pool, "EmbeddingPool", FakePool)
+    yield
+    shutdown_embed_pool()
+
+
+def test_same_settings_share_one_pool():
+    with use_embed_pool(2, "model", 1) as first:
+        pass
+    with use_embed_pool(2, "model", 1) as second:
+        assert second is first
+    assert not first.stopped
+
+
+def test_a_pool_in_use_is_not_shut_down_by_other_settings():
+    with use_embed_pool(2, "model", 1) as busy:
+        with use_embed_pool(4, "model", 1) as other:
+            assert other is not busy
+            assert not busy.stopped
+        # The newer settings stay current; the busy pool goes once it is released
+        assert not other.stopped and not busy.stopped
+    assert busy.stopped and not other.stopped
+
+
+def test_an_idle_pool_is_replaced_right_away():
+    with use_embed_pool(2, "model", 1) as old:
+        pass
+    with use_embed_pool(2, "other-model", 1):
+        assert old.stopped
+
+
+def test_shutdown_stops_every_pool():
+    with use_embed_pool(2, "model", 1) as pool:
+        pass
+    shutdown_embed_pool()
+    assert pool.stopped and embed_pool._pools == {}
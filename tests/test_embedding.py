@@ -0,0 +1,45 @@
+import torch
+import pytest
+from utils import create_embeding
+from utils.create_embeding import embed_text, embed_text_chain_fn, set_torch_threads
+from conftest import make_chunks
+
+
+@pytest.fixture
+def thread_calls(monkeypatch):
+    calls = []
+    monkeypatch.setattr(torch, "set_num_threads", calls.append)
+    monkeypatch.setattr(create_embeding, "_torch_threads", None)
+    return calls
+
+
+def test_thread_count_is_set_once_per_value(thread_calls):
+    set_torch_threads(2)
+    set_torch_threads(2)
+    set_torch_threads(None)
+    set_torch_threads(3)
+
+    assert thread_calls == [2, 3]
+
+
+def test_embedding_sets_threads_at_pipeline_start_not_per_batch(thread_calls, stub_backend):
+    chunks = make_chunks("tender.pdf", [f"clause {i} on the bid security" for i in range(12)])
+    inputs = {"chunks": chunks, "embed_backend": stub_backend, "embedding_cache": False, "embed_threads": 2,
+              "embed_batch_size": 2}
+
+    embed_text_chain_fn(inputs)
+    embed_text_chain_fn({**inputs, "chunks": iter(chunks), "embed_stream_batch": 4})
+
+    assert thread_calls == [2]
+
+
+def test_embed_text_logs_errors(monkeypatch):
+    class Broken:
+        def encode(self, *args, **kwargs):
+            raise RuntimeError("model unavailable")
+
+    errors = []
+    monkeypatch.setattr(create_embeding.logger, "error", errors.append)
+
+    assert embed_text([{"text": "clause"}], model=Broken()) is None
+    assert len(errors) == 1 and "model unavailable" in errors[0]
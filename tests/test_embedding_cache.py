@@ -0,0 +1,128 @@
+import os
+import multiprocessing
+import sqlite3
+import numpy as np
+import pytest
+from utils import embedding_cache
+from utils.embedding_cache import EmbeddingCache, INDEX_NAME, encode_with_cache, text_hash
+
+
+def _vectors(n, dim=8, seed=0):
+    return np.random.default_rng(seed).standard_normal((n, dim)).astype(np.float32)
+
+
+def test_put_and_get_round_trip_across_instances(tmp_path):
+    cache = EmbeddingCache(str(tmp_path), max_entries=100)
+    hashes = [f"h{i}" for i in range(10)]
+    vectors = _vectors(10)
+
+    assert cache.put_many("model", hashes, vectors) == 10
+    assert cache.put_many("model", hashes[:3], vectors[:3]) == 0
+
+    found = EmbeddingCache(str(tmp_path), max_entries=100).get_many("model", hashes + ["missing"])
+    assert set(found) == set(hashes)
+    for h, vector in zip(hashes, vectors):
+        np.testing.assert_array_equal(found[h], vector)
+    assert cache.get_many("other-model", hashes) == {}
+
+
+def test_full_cache_evicts_least_recently_used(tmp_path, monkeypatch):
+    # Refresh every hit; the queued refresh of "a" is written before put_many evicts
+    monkeypatch.setattr(embedding_cache, "LRU_REFRESH_SECONDS", 0)
+    cache = EmbeddingCache(str(tmp_path), max_entries=4)
+    vectors = _vectors(6)
+    cache.put_many("model", ["a", "b", "c", "d"], vectors[:4])
+    cache.get_many("model", ["a"])
+
+    cache.put_many("model", ["e", "f"], vectors[4:])
+
+    found = cache.get_many("model", list("abcdef"))
+    assert set(found) == {"a", "d", "e", "f"}
+    np.testing.assert_array_equal(found["e"], vectors[4])
+    np.testing.assert_array_equal(found["a"], vectors[0])
+
+
+def test_lookups_do_not_take_the_write_lock(tmp_path, monkeypatch):
+    monkeypatch.setattr(embedding_cache, "LRU_REFRESH_SECONDS", 0)
+    monkeypatch.setattr(embedding_cache, "LRU_FLUSH_SECONDS", 0)
+    cache = EmbeddingCache(str(tmp_path))
+    vectors = _vectors(3)
+    cache.put_many("model", ["a", "b", "c"], vectors)
+
+    writer = sqlite3.connect(os.path.join(str(tmp_path), INDEX_NAME), timeout=0, isolation_level=None)
+    writer.execute("BEGIN IMMEDIATE")
+    try:
+        cache._db.execute("PRAGMA busy_timeout = 0")
+        found = cache.get_many("model", ["a", "c"])
+    finally:
+        writer.execute("ROLLBACK")
+        writer.close()
+
+    assert set(found) == {"a", "c"}
+    np.testing.assert_array_equal(found["c"], vectors[2])
+    # The refresh that could not be written stays queued for the next write
+    assert set(cache._pending_lru) == {("model", "a"), ("model", "c")}
+
+
+def test_a_slot_overwritten_behind_the_index_is_a_miss(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    cache.put_many("model", ["a", "b"], _vectors(2))
+    slot = cache._db.execute("SELECT slot FROM entries WHERE text_hash = 'b'").fetchone()[0]
+    vectors = cache._vector_file("model", 8, cache._model_info("model")[1])
+    vectors[slot] = _vectors(1, seed=9)[0]
+
+    assert set(cache.get_many("model", ["a", "b"])) == {"a"}
+
+
+def test_rejects_a_different_dimension(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    cache.put_many("model", ["a"], _vectors(1, dim=8))
+
+    with pytest.raises(ValueError):
+        cache.put_many("model", ["b"], _vectors(1, dim=4))
+
+
+def test_encode_with_cache_only_encodes_misses(tmp_path):
+    cache = EmbeddingCache(str(tmp_path))
+    encoded = []
+
+    def encode(texts):
+        encoded.append(list(texts))
+        return np.array([[len(text), text.count(" ")] for text in texts], dtype=np.float32)
+
+    first, _ = encode_with_cache(["one clause", "two  clauses", "one clause"], "model", encode, cache=cache)
+    second, stats = encode_with_cache(["two clauses", "three more clauses"], "model", encode, cache=cache)
+
+    assert encoded == [["one clause", "two  clauses"], ["three more clauses"]]
+    np.testing.assert_array_equal(first[0], first[2])
+    # Whitespace-insensitive keys: "two clauses" is served from the entry stored for "two  clauses"
+    np.testing.assert_array_equal(second[0], first[1])
+    assert text_hash("two  clauses") == text_hash("two clauses")
+    assert (stats["hits"], stats["misses"]) == (1, 1)
+
+
+def _worker(root, worker, results):
+    cache = EmbeddingCache(root, max_entries=150)
+    wrong = 0
+    for round_ in range(20):
+        hashes = [f"{worker}-{round_}-{i}" for i in range(15)]
+        vectors = np.array([[worker, round_, i, 1.0] for i in range(15)], dtype=np.float32)
+        cache.put_many("model", hashes, vectors)
+        found = cache.get_many("model", hashes)
+        wrong += sum(not np.array_equal(found[h], v) for h, v in zip(hashes, vectors) if h in found)
+    results.put(wrong)
+
+
+@pytest.mark.skipif("fork" not in multiprocessing.get_all_start_methods(), reason="needs fork")
+def test_processes_sharing_a_directory_never_read_each_others_vectors(tmp_path):
+    # Small capacity so the workers keep evicting and reusing each other's slots
+    context = multiprocessing.get_context("fork")
+    results = context.Queue()
+    workers = [context.Process(target=_worker, args=(str(tmp_path), w, results)) for w in range(3)]
+    for process in workers:
+        process.start()
+    for process in workers:
+        process.join(timeout=120)
+
+    assert all(process.exitcode == 0 for process in workers)
+    assert sum(results.get(timeout=5) for _ in workers) == 0
@@ -0,0 +1,125 @@
+import uuid
+import pytest
+from utils.chunking import chunk_pages_to_embedding_ready_format
+from utils.incremental import (
+    changed_pages, affected_page_runs, page_chunk_starts, hash_page, reingest_changed_pages, save_page_manifest
+)
+from utils.qdrant import upload_embed_to_qdrant, point_id
+from conftest import STUB_DIM, StubEncoder
+
+CHUNK_SIZE, CHUNK_OVERLAP = 200, 40
+
+
+def _pages(count=8):
+    return [
+        {"text": " ".join(f"Page {p} clause {c} requires the bidder to submit form {p}-{c}." for c in range(8))}
+        for p in range(count)
+    ]
+
+
+def _page_lengths(*lengths):
+    return [{"text": "x" * length} for length in lengths]
+
+
+def test_changed_pages_compares_hashes():
+    pages = _pages(4)
+    old_hashes = [hash_page(page["text"]) for page in pages]
+    pages[2] = {"text": pages[2]["text"] + " Amended."}
+
+    assert changed_pages(old_hashes, pages) == [2]
+
+
+def test_affected_page_runs_expand_by_reach_and_merge():
+    pages = _page_lengths(100, 100, 100, 100, 100, 100, 100, 100)
+
+    # 150 chars of reach cover two 100-char neighbours (separators included) on each side
+    assert affected_page_runs([4], pages, 150) == [(2, 6)]
+    assert affected_page_runs([0, 7], pages, 50) == [(0, 1), (6, 7)]
+    assert affected_page_runs([2, 5], pages, 150) == [(0, 7)]
+    assert affected_page_runs([3], _page_lengths(100, 1000, 100, 100, 1000), 150) == [(1, 4)]
+
+
+def test_page_chunk_starts():
+    chunks = [{"metadata": {"chunk_index": i, "page_number": page}} for i, page in enumerate([1, 1, 2, 4, 4, 5])]
+
+    assert page_chunk_starts(chunks, 5) == [0, 2, 3, 3, 5, 6]
+    assert page_chunk_starts(chunks[3:5], 4, first_page=2, end=5) == [3, 3, 5]
+
+
+@pytest.fixture
+def ingested(stub_backend):
+    """A document chunked and uploaded in one piece, as the full pipeline would, plus its page manifest."""
+    collection = f"incremental_{uuid.uuid4().hex[:8]}"
+    inputs = {
+        "collection_name": collection, "source_name": "tender.pdf", "chunk_size": CHUNK_SIZE,
+        "chunk_overlap": CHUNK_OVERLAP, "embedding_model": "stub", "embed_backend": stub_backend,
+        "embedding_cache": False, "title": "Tender",
+    }
+    pages = _pages()
+    chunks = chunk_pages_to_embedding_ready_format(
+        pages, source_name="tender.pdf", title="Tender", chunk_size=CHUNK_SIZE, chunk_overlap=CHUNK_OVERLAP
+    )
+    client = upload_embed_to_qdrant(
+        None, collection, None, vector_size=STUB_DIM, data=chunks,
+        embeddings=StubEncoder().encode([chunk["text"] for chunk in chunks]), vector_backend="local"
+    )
+    manifest = save_page_manifest(collection, inputs, pages, page_chunk_starts(chunks, len(pages)), title="Tender")
+    return inputs, pages, chunks, manifest, client
+
+
+def _stored(client, collection):
+    records = client.scroll(collection, with_payload=True)
+    return sorted(((record.payload, str(record.id)) for record in records), key=lambda r: r[0]["metadata"]["chunk_index"])
+
+
+def _assert_consistent(stored, pages):
+    """chunk_index is contiguous and follows document order, and every char span matches the new text."""
+    full_text = "\n\n".join(page["text"] for page in pages)
+    metadata = [payload["metadata"] for payload, _ in stored]
+    assert [m["chunk_index"] for m in metadata] == list(range(len(stored)))
+    assert [m["char_start"] for m in metadata] == sorted(m["char_start"] for m in metadata)
+    for payload, _ in stored:
+        assert full_text[payload["metadata"]["char_start"]:payload["metadata"]["char_end"]] == payload["text"]
+
+
+def test_same_length_edit_only_replaces_its_page_run(ingested):
+    inputs, pages, chunks, manifest, client = ingested
+    edited = [dict(page) for page in pages]
+    edited[4] = {"text": edited[4]["text"].replace("requires", "obliges ", 1)}
+    assert len(edited[4]["text"]) == len(pages[4]["text"])
+
+    new_chunks, starts = reingest_changed_pages(inputs, edited, manifest, client)
+
+    stored = _stored(client, inputs["collection_name"])
+    _assert_consistent(stored, edited)
+    assert {m["metadata"]["page_number"] for m in new_chunks} == {4, 5, 6}
+    # Chunks outside the run keep their points
+    untouched = [c for c in chunks if c["metadata"]["page_number"] not in (4, 5, 6)]
+    assert {point_id(c["metadata"], c["text"]) for c in untouched} <= {pid for _, pid in stored}
+    assert starts == page_chunk_starts([{"metadata": p["metadata"]} for p, _ in stored], len(edited))
+
+
+def test_length_change_reingests_through_the_end(ingested):
+    inputs, pages, chunks, manifest, client = ingested
+    edited = [dict(page) for page in pages]
+    edited[2] = {"text": edited[2]["text"] + " A further clause on the earnest money deposit was added here."}
+
+    new_chunks, starts = reingest_changed_pages(inputs, edited, manifest, client)
+
+    stored = _stored(client, inputs["collection_name"])
+    _assert_consistent(stored, edited)
+    assert max(m["metadata"]["page_number"] for m in new_chunks) == len(edited)
+    assert starts[-1] == len(stored)
+    # Chunks before the run keep their points; everything from the run on was replaced
+    before = [c for c in chunks if c["metadata"]["page_number"] < min(m["metadata"]["page_number"] for m in new_chunks)]
+    assert before and {point_id(c["metadata"], c["text"]) for c in before} <= {pid for _, pid in stored}
+
+
+def test_unchanged_document_is_left_alone(ingested):
+    inputs, pages, chunks, manifest, client = ingested
+
+    new_chunks, starts = reingest_changed_pages(inputs, pages, manifest, client)
+
+    assert new_chunks == []
+    assert starts == manifest["page_chunk_starts"]
+    assert len(_stored(client, inputs["collection_name"])) == len(chunks)
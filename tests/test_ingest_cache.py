@@ -0,0 +1,130 @@
+import os
+import uuid
+import pytest
+from langchain_core.runnables import RunnableLambda
+from qdrant_client.models import FilterSelector
+from utils.ingest_cache import IngestionCache, cache_key, hash_pdf, ingest_with_cache
+from utils.model_registry import DEFAULT_EMBEDDING_MODEL
+from utils.create_embeding import DEFAULT_BATCH_SIZE
+from utils.qdrant import upload_embed_to_qdrant, build_search_filter
+from utils.records import write_records, write_vectors, vectors_path
+from conftest import STUB_DIM, StubEncoder, make_chunks
+
+SETTINGS = {"chunk_size": 800, "chunk_overlap": 100, "vector_size": STUB_DIM, "vector_backend": "local",
+            "collection_name": "tenders"}
+
+
+def test_cache_key_covers_content_and_settings_but_not_the_target():
+    key = cache_key("pdf", SETTINGS)
+
+    assert cache_key("pdf", dict(SETTINGS)) == key
+    assert cache_key("pdf", {**SETTINGS, "embedding_model": DEFAULT_EMBEDDING_MODEL}) == key
+    assert cache_key("other-pdf", SETTINGS) != key
+    assert cache_key("pdf", {**SETTINGS, "chunk_size": 500}) != key
+    assert cache_key("pdf", {**SETTINGS, "chunking_mode": "stream"}) != key
+    assert cache_key("pdf", {**SETTINGS, "embed_batch_size": 16}) != key
+    assert cache_key("pdf", {**SETTINGS, "embed_token_budget": 4096}) != key
+    assert cache_key("pdf", {**SETTINGS, "embed_batch_size": DEFAULT_BATCH_SIZE, "dedup": False}) == key
+    assert cache_key("pdf", {**SETTINGS, "collection_name": "contracts"}) == key
+    assert cache_key("pdf", {**SETTINGS, "collection_profile": "low_latency"}) == key
+    assert cache_key("pdf", {**SETTINGS, "vector_backend": "qdrant"}) == key
+
+
+@pytest.fixture
+def ingest(tmp_path):
+    """Runs ingest_with_cache over a fake pipeline that uploads a few chunks to the local store."""
+    pdf_path = tmp_path / "tender.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 tender document")
+    cache = IngestionCache(str(tmp_path / "cache"))
+    runs = []
+
+    def pipeline(inputs):
+        runs.append(inputs["collection_name"])
+        texts = [f"Clause {i}: the bidder shall submit document {chr(97 + i)}." for i in range(5)]
+        chunks, embeddings = make_chunks(inputs["source_name"], texts), StubEncoder().encode(texts)
+        embed_path = str(tmp_path / f"embed_{len(runs)}.jsonl")
+        write_records(chunks, embed_path)
+        write_vectors(embeddings, vectors_path(embed_path))
+        client = upload_embed_to_qdrant(
+            None, inputs["collection_name"], None, vector_size=inputs["vector_size"], data=chunks, embeddings=embeddings,
+            vector_backend="local"
+        )
+        return {**inputs, "embed_json_path": embed_path, "embed_vectors_path": vectors_path(embed_path),
+                "qdrant_client": client, "chunks_count": len(texts)}
+
+    def run(**overrides):
+        inputs = {**SETTINGS, "collection_name": collection, "pdf_path": str(pdf_path), "source_name": "tender.pdf",
+                  **overrides}
+        return ingest_with_cache(RunnableLambda(pipeline), inputs, cache=cache)
+
+    collection = f"ingest_{uuid.uuid4().hex[:8]}"
+    return run, runs, cache, collection
+
+
+def test_second_ingestion_is_served_from_the_cache(ingest):
+    run, runs, cache, collection = ingest
+    first = run()
+
+    second = run()
+
+    assert runs == [collection]
+    assert (first["cache_hit"], second["cache_hit"]) == (False, True)
+    assert second["cache_key"] == first["cache_key"]
+    assert second["chunks_count"] == 5
+    assert second["embed_json_path"].startswith(cache.root)
+    assert os.path.exists(second["embed_json_path"])
+    assert second["qdrant_client"].count(collection).count == 5
+
+
+def test_another_collection_is_filled_from_the_cache(ingest):
+    run, runs, cache, collection = ingest
+    first = run()
+
+    other = run(collection_name=collection + "_other")
+
+    assert runs == [collection]
+    assert other["cache_hit"] is True
+    assert other["qdrant_client"].count(collection + "_other").count == 5
+    assert other["upload_stats"]["points"] == 5
+    targets = [target["collection_name"] for target in cache.lookup(first["cache_key"])["collections"]]
+    assert targets == [collection, collection + "_other"]
+
+    # Both collections are now recorded: a third run uploads nothing
+    again = run(collection_name=collection + "_other")
+    assert again["cache_hit"] is True and again["upload_stats"] is None
+
+
+def test_deleted_points_are_restored_from_the_cache(ingest):
+    run, runs, cache, collection = ingest
+    first = run()
+    first["qdrant_client"].delete(collection, FilterSelector(filter=build_search_filter(sources="tender.pdf")))
+
+    again = run()
+
+    assert again["cache_hit"] is True
+    assert runs == [collection]
+    assert again["qdrant_client"].count(collection).count == 5
+
+
+def test_entry_without_embed_artifact_is_re_ingested(ingest):
+    run, runs, cache, collection = ingest
+    first = run()
+    manifest = cache.lookup(first["cache_key"])
+    os.remove(manifest["artifacts"]["embed_json_path"])
+
+    again = run(collection_name=collection + "_other")
+
+    assert again["cache_hit"] is False
+    assert runs == [collection, collection + "_other"]
+    assert cache.lookup(again["cache_key"]) is not None
+
+
+def test_hash_pdf_matches_for_paths_and_uploads(tmp_path):
+    pdf_path = tmp_path / "a.pdf"
+    pdf_path.write_bytes(b"%PDF-1.4 " * 1000)
+
+    class Upload:
+        def getbuffer(self):
+            return memoryview(pdf_path.read_bytes())
+
+    assert hash_pdf(str(pdf_path), block_size=64) == hash_pdf(Upload())
@@ -0,0 +1,59 @@
+import time
+import threading
+import pytest
+from utils import model_registry
+from utils.model_registry import get_model, get_embedder, embedder_id, registry_stats, register_loader, unload_model
+
+
+class SlowModel:
+    memory_bytes = 3 * 1024 * 1024
+
+
+@pytest.fixture
+def loads():
+    calls = []
+
+    def load(name):
+        calls.append(name)
+        time.sleep(0.05)
+        return SlowModel()
+
+    register_loader("slow", load)
+    yield calls
+    for name in set(calls):
+        unload_model(name, kind="slow")
+
+
+def test_concurrent_first_calls_share_one_load(loads):
+    models = []
+    threads = [threading.Thread(target=lambda: models.append(get_model("m", kind="slow"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert loads == ["m"]
+    assert len(models) == 8 and all(model is models[0] for model in models)
+    assert get_model("m", kind="slow") is models[0]
+
+
+def test_stats_and_unload(loads):
+    model = get_model("m", kind="slow")
+
+    stats = [s for s in registry_stats() if s["kind"] == "slow"]
+    assert len(stats) == 1 and stats[0]["model"] == "m" and stats[0]["memory_mb"] == 3.0
+    assert stats[0]["load_time_s"] >= 0.05
+
+    assert unload_model("m", kind="slow") is True
+    assert unload_model("m", kind="slow") is False
+    assert get_model("m", kind="slow") is not model
+    assert loads == ["m", "m"]
+
+
+def test_embedders_by_backend(stub_backend):
+    assert get_embedder("stub-model", backend=stub_backend) is get_model("stub-model", kind="stub")
+    assert embedder_id("m", "torch") == embedder_id("m", "onnx") == "m"
+    assert embedder_id("m", "onnx-int8") == "m@onnx-int8"
+    with pytest.raises(ValueError):
+        get_embedder("m", backend="tensorflow")
+    assert set(model_registry.EMBED_BACKENDS) >= {"torch", "onnx", "onnx-int8"}
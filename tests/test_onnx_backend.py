@@ -0,0 +1,62 @@
+import os
+import numpy as np
+import pytest
+
+pytest.importorskip("onnxruntime")
+pytest.importorskip("sentence_transformers")
+
+from utils.onnx_backend import OnnxEmbedder, parity_check, MODEL_FILE, QUANTIZED_FILE, _model_dir
+from utils.create_embeding import encode_bucketed
+from utils.model_registry import get_model
+
+WORDS = "the bidder shall submit earnest money deposit tender clause form payment within days security".split()
+TEXTS = ["the bidder shall submit the form", "payment within days", "earnest money deposit " * 12, "tender"]
+
+
+@pytest.fixture(scope="module")
+def tiny_model(tmp_path_factory):
+    """A randomly initialised two-layer BERT sentence-transformer, built offline."""
+    from transformers import BertConfig, BertModel, BertTokenizerFast
+    from sentence_transformers import SentenceTransformer, models
+
+    root = tmp_path_factory.mktemp("tiny")
+    bert_dir = str(root / "bert")
+    os.makedirs(bert_dir)
+    with open(os.path.join(bert_dir, "vocab.txt"), "w", encoding="utf-8") as f:
+        f.write("\n".join(["[PAD]", "[UNK]", "[CLS]", "[SEP]", "[MASK]"] + WORDS))
+    BertTokenizerFast(os.path.join(bert_dir, "vocab.txt")).save_pretrained(bert_dir)
+    BertModel(BertConfig(
+        vocab_size=5 + len(WORDS), hidden_size=32, num_hidden_layers=2, num_attention_heads=2, intermediate_size=64,
+        max_position_embeddings=64
+    )).save_pretrained(bert_dir)
+    model_dir = str(root / "sentence-model")
+    SentenceTransformer(modules=[
+        models.Transformer(bert_dir, max_seq_length=48), models.Pooling(32, "mean"), models.Normalize()
+    ]).save(model_dir)
+    return model_dir
+
+
+@pytest.mark.parametrize("quantize,min_cosine", [(False, 0.9999), (True, 0.98)])
+def test_onnx_embeddings_match_pytorch(tiny_model, tmp_path, monkeypatch, quantize, min_cosine):
+    # parity_check exports under the default (cwd-relative) ONNX directory
+    monkeypatch.chdir(tmp_path)
+
+    parity = parity_check(tiny_model, TEXTS, quantize=quantize)
+
+    assert parity["min"] >= min_cosine
+    model_file = QUANTIZED_FILE if quantize else MODEL_FILE
+    assert os.path.exists(os.path.join(_model_dir(tiny_model, "onnx_models"), model_file))
+
+
+def test_onnx_embedder_mirrors_the_sentence_transformer_interface(tiny_model, tmp_path):
+    embedder = OnnxEmbedder(tiny_model, root=str(tmp_path))
+    reference = get_model(tiny_model)
+
+    assert embedder.get_sentence_embedding_dimension() == 32
+    assert embedder.max_seq_length == 48 and embedder.memory_bytes > 0
+    assert embedder.encode(TEXTS[0]).shape == (32,)
+    assert embedder.encode([]).shape == (0, 32)
+    # Length-bucketed batching goes through the embedder's tokenizer as it does for torch models
+    np.testing.assert_allclose(
+        encode_bucketed(embedder, TEXTS, batch_size=2), encode_bucketed(reference, TEXTS, batch_size=2), atol=1e-4
+    )
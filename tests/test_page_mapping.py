@@ -0,0 +1,89 @@
+import random
+import pytest
+from utils.chunking import _PageLocator, _SectionIndex
+
+
+def _offsets(lengths):
+    starts, ends, position = [], [], 0
+    for i, length in enumerate(lengths):
+        starts.append(position)
+        position += length
+        ends.append(position)
+        if i < len(lengths) - 1:
+            position += 2
+    return starts, ends, position
+
+
+def _linear_page(starts, ends, start, end):
+    """The original linear scan: page holding the start, then the page with the largest overlap."""
+    last = len(starts) - 1
+    page_num = 1
+    for i in range(len(starts)):
+        if starts[i] <= start < ends[i] + (2 if i < last else 0):
+            page_num = i + 1
+            break
+    spanned = []
+    for i in range(len(starts)):
+        page_start, page_end = starts[i], ends[i] + (2 if i < last else 0)
+        if not (end <= page_start or start >= page_end):
+            spanned.append((i + 1, min(end, page_end) - max(start, page_start)))
+    if spanned:
+        page_num = max(spanned, key=lambda x: x[1])[0]
+    return page_num
+
+
+def _linear_section(sections, page_num):
+    """The original linear section lookup (Methods 1-4)."""
+    if not sections:
+        return ""
+    for section in sections:
+        if section["start"] <= page_num <= section["end"]:
+            return section["description"]
+    applicable = [s for s in sections if s["start"] <= page_num]
+    if applicable:
+        return max(applicable, key=lambda x: x["start"])["description"]
+    if page_num < sections[0]["start"]:
+        return sections[0]["description"]
+    if page_num > sections[-1]["end"]:
+        return sections[-1]["description"]
+    return ""
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_page_locator_matches_the_linear_scan(seed):
+    rng = random.Random(seed)
+    # Empty pages included: they own no text but still shift the page numbers
+    lengths = [rng.choice([0, rng.randint(1, 40), rng.randint(200, 2000)]) for _ in range(rng.randint(1, 30))]
+    starts, ends, total = _offsets(lengths)
+    locator = _PageLocator(starts, ends)
+
+    for _ in range(300):
+        start = rng.randint(0, max(total - 1, 0))
+        end = min(total, start + rng.randint(1, 3000))
+        assert locator.page_for(start, end) == _linear_page(starts, ends, start, end), (lengths, start, end)
+
+
+def test_page_locator_prefers_the_dominant_page():
+    starts, ends, _ = _offsets([100, 100, 100])
+    locator = _PageLocator(starts, ends)
+
+    assert locator.page_for(0, 50) == 1
+    # 20 chars on page 1 (plus its separator), 80 on page 2
+    assert locator.page_for(80, 182) == 2
+    assert locator.page_for(250, 304) == 3
+
+
+@pytest.mark.parametrize("seed", range(20))
+def test_section_index_matches_the_linear_lookup(seed):
+    rng = random.Random(seed)
+    sections = []
+    for i in range(rng.randint(0, 12)):
+        start = rng.randint(1, 60)
+        sections.append({"description": f"Section {i}", "start": start, "end": start + rng.randint(0, 15)})
+    sections.sort(key=lambda s: s["start"])
+    index = _SectionIndex(sections)
+
+    for page_num in range(0, 90):
+        assert index.describe(page_num) == _linear_section(sections, page_num), (sections, page_num)
+        # Memoized lookups give the same answer
+        assert index.describe(page_num) == _linear_section(sections, page_num)
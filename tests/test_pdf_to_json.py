@@ -0,0 +1,49 @@
+import fitz
+import pytest
+from utils.pdf_to_json import _page_ranges, iter_pdf_pages, pdf_to_basic_json_runnable
+from utils.records import read_records
+
+PAGE_COUNT = 13
+
+
+@pytest.fixture(scope="module")
+def pdf_path(tmp_path_factory):
+    path = str(tmp_path_factory.mktemp("pdf") / "tender.pdf")
+    doc = fitz.open()
+    for i in range(PAGE_COUNT):
+        page = doc.new_page()
+        page.insert_text((72, 72), f"Page {i} of the tender")
+        page.insert_text((72, 100), f"Clause {i}.1 The bidder shall submit form {i}.")
+    doc.save(path)
+    doc.close()
+    return path
+
+
+def test_page_ranges_cover_every_page_once():
+    for total, workers, per_range in [(13, 3, None), (13, 3, 2), (1, 4, None), (100, 8, None)]:
+        ranges = _page_ranges(total, workers, per_range)
+        assert [p for start, end in ranges for p in range(start, end)] == list(range(total))
+    # A few ranges per worker, so a slow range does not leave the others idle
+    assert 4 < len(_page_ranges(100, 4)) <= 16
+
+
+@pytest.mark.parametrize("workers,pages_per_range", [(2, None), (3, 2), (4, 1)])
+def test_parallel_extraction_matches_serial(pdf_path, workers, pages_per_range):
+    serial = list(iter_pdf_pages(pdf_path))
+
+    parallel = list(iter_pdf_pages(pdf_path, workers=workers, pages_per_range=pages_per_range))
+
+    assert parallel == serial
+    assert [page["page_number"] for page in parallel] == list(range(PAGE_COUNT))
+    assert "Clause 7.1" in parallel[7]["text"]
+
+
+def test_runnable_streams_parallel_extraction_to_the_artifact(pdf_path, tmp_path):
+    raw_json_path = str(tmp_path / "raw.jsonl")
+
+    result = pdf_to_basic_json_runnable().invoke(
+        {"pdf_path": pdf_path, "raw_json_path": raw_json_path, "extract_workers": 3, "pages_per_range": 2}
+    )
+
+    assert result["page_count"] == PAGE_COUNT
+    assert read_records(raw_json_path) == list(iter_pdf_pages(pdf_path))
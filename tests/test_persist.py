@@ -0,0 +1,81 @@
+import os
+import fitz
+import numpy as np
+import pytest
+from utils.persist import persist_records, persist_vectors, wait_for_persistence
+from utils.pdf_to_json import pdf_to_basic_json_runnable
+from utils.chunking import chunking_runnable
+from utils.save_to_json import save_json_runnable
+from utils.qdrant import load_embed_artifact
+from utils.records import read_records, write_records, load_vectors
+from conftest import StubEncoder, make_chunks
+
+RECORDS = [{"page_number": i, "text": f"Clause {i}: the bidder shall submit form {i}."} for i in range(6)]
+
+
+def test_persist_modes(tmp_path):
+    vectors = np.arange(12, dtype=np.float32).reshape(6, 2)
+
+    assert persist_records(RECORDS, str(tmp_path / "sync.jsonl"), "sync") == len(RECORDS)
+    future = persist_records(RECORDS, str(tmp_path / "async.jsonl"), "async")
+    vector_future = persist_vectors(vectors, str(tmp_path / "async.npy"), "async")
+    assert persist_records(RECORDS, str(tmp_path / "off.jsonl"), "off") is None
+
+    wait_for_persistence()
+    assert future.result() == len(RECORDS) and vector_future.done()
+    assert read_records(str(tmp_path / "sync.jsonl")) == read_records(str(tmp_path / "async.jsonl")) == RECORDS
+    np.testing.assert_array_equal(load_vectors(str(tmp_path / "async.npy")), vectors)
+    assert not os.path.exists(tmp_path / "off.jsonl")
+    with pytest.raises(ValueError):
+        persist_records(RECORDS, str(tmp_path / "x.jsonl"), "later")
+
+
+@pytest.mark.parametrize("persist", ["async", "off"])
+def test_extraction_hands_pages_over_in_memory(tmp_path, persist):
+    pdf_path = str(tmp_path / "tender.pdf")
+    doc = fitz.open()
+    for i in range(3):
+        doc.new_page().insert_text((72, 72), f"Page {i}: clause {i} of the tender")
+    doc.save(pdf_path)
+    doc.close()
+    raw_json_path = str(tmp_path / "raw.jsonl")
+
+    result = pdf_to_basic_json_runnable().invoke({"pdf_path": pdf_path, "raw_json_path": raw_json_path, "persist": persist})
+    wait_for_persistence()
+
+    assert [page["page_number"] for page in result["pages"]] == [0, 1, 2]
+    if persist == "async":
+        assert read_records(raw_json_path) == result["pages"]
+    else:
+        assert not os.path.exists(raw_json_path)
+
+
+def test_chunking_in_memory_pages_matches_the_artifact(tmp_path):
+    raw_json_path = str(tmp_path / "raw.jsonl")
+    write_records(RECORDS, raw_json_path)
+    inputs = {"raw_json_path": raw_json_path, "index_entries": [], "chunk_size": 60, "chunk_overlap": 10}
+
+    from_artifact = chunking_runnable().invoke(inputs)["chunks"]
+    from_memory = chunking_runnable().invoke({**inputs, "pages": RECORDS})["chunks"]
+
+    assert from_memory == from_artifact
+
+
+@pytest.mark.parametrize("persist", ["sync", "async", "off"])
+def test_save_stage_writes_the_same_artifact_in_every_mode(tmp_path, persist):
+    chunks = make_chunks("tender.pdf", [record["text"] for record in RECORDS])
+    embeddings = StubEncoder().encode([chunk["text"] for chunk in chunks])
+    path = str(tmp_path / "embed.jsonl")
+
+    result = save_json_runnable().invoke(
+        {"embed_data": chunks, "embeddings": embeddings, "embed_json_path": path, "persist": persist}
+    )
+    wait_for_persistence()
+
+    assert result["embed_json_path"] == path and result["embeddings"] is embeddings
+    if persist == "off":
+        assert not os.path.exists(path)
+        return
+    data, vectors = load_embed_artifact(path)
+    assert data == chunks
+    np.testing.assert_array_equal(vectors, embeddings)
@@ -0,0 +1,77 @@
+import threading
+import numpy as np
+import pytest
+from utils.query_cache import QueryEmbeddingCache, embed_query, normalize_query
+from conftest import StubEncoder
+
+
+class CountingEncoder(StubEncoder):
+    def __init__(self):
+        self.calls = []
+
+    def encode(self, texts, **kwargs):
+        self.calls.extend(texts)
+        return super().encode(texts, **kwargs)
+
+
+@pytest.fixture
+def encoder(monkeypatch):
+    from utils import query_cache
+    encoder = CountingEncoder()
+    monkeypatch.setattr(query_cache, "get_embedder", lambda name, backend: encoder)
+    return encoder
+
+
+def test_normalize_query_ignores_case_spacing_and_trailing_punctuation():
+    assert normalize_query("  What is the EMD  amount?? ") == normalize_query("what is the emd amount") == "what is the emd amount"
+    assert normalize_query("What is the EMD amount?") != normalize_query("What is the PBG amount?")
+
+
+def test_equivalent_queries_are_encoded_once(encoder):
+    cache = QueryEmbeddingCache(max_size=8)
+
+    first = embed_query("What is the EMD amount?", "m", "torch", cache=cache)
+    second = embed_query("what is the  emd amount", "m", "torch", cache=cache)
+    embed_query("What is the EMD amount?", "other-model", "torch", cache=cache)
+
+    assert second is first
+    assert encoder.calls == ["What is the EMD amount?", "What is the EMD amount?"]
+    assert cache.stats()["hits"] == 1 and cache.stats()["misses"] == 2
+    # Shared between requests, so the cached vector is read-only
+    with pytest.raises(ValueError):
+        first[0] = 1.0
+
+
+def test_least_recently_used_query_is_evicted():
+    cache = QueryEmbeddingCache(max_size=2)
+    for key in ("a", "b"):
+        cache.put(key, np.zeros(2, dtype=np.float32))
+    cache.get("a")
+
+    cache.put("c", np.zeros(2, dtype=np.float32))
+
+    assert cache.get("b") is None
+    assert cache.get("a") is not None and cache.get("c") is not None
+    stats = cache.stats()
+    assert (stats["size"], stats["evictions"], stats["hits"], stats["misses"]) == (2, 1, 3, 1)
+    assert stats["hit_rate"] == 0.75
+
+
+def test_concurrent_lookups_keep_the_bound_and_counts():
+    cache = QueryEmbeddingCache(max_size=50)
+
+    def worker(offset):
+        for i in range(200):
+            key = (offset + i) % 80
+            if cache.get(key) is None:
+                cache.put(key, np.full(2, key, dtype=np.float32))
+
+    threads = [threading.Thread(target=worker, args=(offset,)) for offset in range(0, 40, 5)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    stats = cache.stats()
+    assert stats["size"] <= 50
+    assert stats["hits"] + stats["misses"] == 8 * 200
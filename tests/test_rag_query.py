@@ -0,0 +1,64 @@
+import uuid
+import pytest
+from utils import qdrant
+from utils.qdrant import upload_embed_to_qdrant, rag_query_runnable
+from conftest import STUB_DIM, StubEncoder, make_chunks
+
+# Digits are ignored by the stub encoder, so the three copies of the deposit clause share one vector
+DUPLICATE = "The bidder shall furnish the earnest money deposit under clause {}."
+TEXTS = [DUPLICATE.format(i) for i in (1, 2, 3)] + [
+    "The earnest money deposit is refunded to unsuccessful bidders after the award.",
+    "A bidder who withdraws the bid forfeits the deposit.",
+    "Technical evaluation is carried out by a committee of the purchaser.",
+    "Warranty obligations run for twelve months from commissioning.",
+]
+
+
+@pytest.fixture
+def ask(stub_backend, monkeypatch):
+    """Runs the query runnable over a small local collection with the LLM call stubbed out."""
+    prompts = []
+    monkeypatch.setattr(qdrant, "get_groq_response", lambda prompt: prompts.append(prompt) or "stub answer")
+    collection = f"rag_{uuid.uuid4().hex[:8]}"
+    chunks = make_chunks("tender.pdf", TEXTS, page_size=1)
+    client = upload_embed_to_qdrant(
+        None, collection, None, vector_size=STUB_DIM, data=chunks,
+        embeddings=StubEncoder().encode(TEXTS), vector_backend="local"
+    )
+
+    def run(**inputs):
+        return rag_query_runnable().invoke({
+            "qdrant_client": client, "collection_name": collection, "query": "earnest money deposit of the bidder",
+            "embed_backend": stub_backend, "top_k": 3, "merge_context": False, **inputs
+        })
+
+    return run, prompts
+
+
+def test_without_mmr_the_repeated_clause_fills_the_context(ask):
+    run, prompts = ask
+
+    result = run()
+
+    assert result["response"] == "stub answer"
+    assert sorted(result["contexts"]) == sorted(TEXTS[:3])
+    assert "mmr_ms" not in result["stage_timings"]
+
+
+def test_mmr_replaces_repeats_with_new_content(ask):
+    run, prompts = ask
+
+    result = run(mmr=True, mmr_lambda=0.6, fetch_k=7)
+
+    contexts = result["contexts"]
+    assert len(contexts) == 3
+    assert sum(text in TEXTS[:3] for text in contexts) == 1
+    assert TEXTS[3] in contexts and TEXTS[4] in contexts
+    assert "mmr_ms" in result["stage_timings"]
+    assert all(text in prompts[-1] for text in contexts)
+
+
+def test_mmr_lambda_one_is_plain_relevance(ask):
+    run, _ = ask
+
+    assert sorted(run(mmr=True, mmr_lambda=1.0, fetch_k=7)["contexts"]) == sorted(run()["contexts"])
@@ -0,0 +1,84 @@
+import os
+import json
+import time
+from array import array
+import pytest
+from utils.records import INDEX_SUFFIX, RecordReader, write_records, iter_records, read_records, export_json
+
+PAGES = [{"page_number": i, "text": f"Page {i}: délai de soumission\nclause {i}"} for i in range(0, 40, 2)]
+
+
+def test_write_records_writes_one_line_per_record_and_an_offset_sidecar(tmp_path):
+    path = str(tmp_path / "raw.jsonl")
+
+    assert write_records(iter(PAGES), path) == len(PAGES)
+
+    with open(path, "rb") as f:
+        raw = f.read()
+    line_starts = [0] + [i + 1 for i, byte in enumerate(raw) if byte == ord("\n")][:-1]
+    offsets = array("q")
+    with open(path + INDEX_SUFFIX, "rb") as idx:
+        offsets.frombytes(idx.read())
+    assert list(offsets) == line_starts
+    assert list(iter_records(path)) == PAGES
+    assert not os.path.exists(path + ".tmp")
+
+
+def test_record_reader_indexes_and_seeks(tmp_path):
+    path = str(tmp_path / "raw.jsonl")
+    write_records(PAGES, path)
+
+    with RecordReader(path) as reader:
+        assert len(reader) == len(PAGES)
+        assert reader[3] == PAGES[3] and reader[-1] == PAGES[-1]
+        assert reader.page(18) == PAGES[9]
+        assert reader.page(0) == PAGES[0] and reader.page(38) == PAGES[-1]
+        assert reader.page(7) is None and reader.page(100) is None
+        with pytest.raises(IndexError):
+            reader[len(PAGES)]
+
+
+def test_record_reader_seeks_chunks_by_metadata(tmp_path):
+    path = str(tmp_path / "chunks.jsonl")
+    chunks = [{"text": f"chunk {i}", "metadata": {"chunk_index": i, "page_number": i // 3 + 1}} for i in range(50)]
+    write_records(chunks, path)
+
+    with RecordReader(path) as reader:
+        assert reader.chunk(37) == chunks[37]
+        assert reader.seek("page_number", 5)["metadata"]["page_number"] == 5
+        assert list(reader) == chunks
+
+
+def test_record_reader_rebuilds_a_missing_or_stale_sidecar(tmp_path):
+    path = str(tmp_path / "raw.jsonl")
+    write_records(PAGES, path)
+    os.remove(path + INDEX_SUFFIX)
+
+    with RecordReader(path) as reader:
+        assert reader.page(10) == PAGES[5]
+
+    # Appending a record without rewriting the sidecar leaves it older than the file
+    write_records(PAGES, path)
+    past = time.time() - 60
+    os.utime(path + INDEX_SUFFIX, (past, past))
+    with open(path, "a", encoding="utf-8") as f:
+        f.write(json.dumps({"page_number": 40, "text": "appended"}) + "\n")
+
+    with RecordReader(path) as reader:
+        assert len(reader) == len(PAGES) + 1
+        assert reader.page(40)["text"] == "appended"
+
+
+def test_legacy_json_artifacts_and_export(tmp_path):
+    json_path = str(tmp_path / "raw.json")
+    write_records(iter(PAGES), json_path)
+    assert read_records(json_path) == PAGES
+    with pytest.raises(ValueError):
+        RecordReader(json_path)
+
+    jsonl_path = str(tmp_path / "raw.jsonl")
+    write_records(PAGES, jsonl_path)
+    exported = str(tmp_path / "export.json")
+    assert export_json(jsonl_path, exported) == len(PAGES)
+    with open(exported, encoding="utf-8") as f:
+        assert json.load(f) == PAGES
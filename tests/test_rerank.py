@@ -0,0 +1,88 @@
+import time
+import pytest
+from qdrant_client.models import ScoredPoint
+from utils import rerank as rerank_module
+from utils.rerank import PairScoreCache, rerank
+
+PAIR_SECONDS = 0.01
+
+
+class SlowCrossEncoder:
+    """Scores a pair by the clause number in its text and takes PAIR_SECONDS per pair."""
+
+    def __init__(self):
+        self.pairs = []
+
+    def predict(self, pairs, batch_size=16, show_progress_bar=False):
+        time.sleep(PAIR_SECONDS * len(pairs))
+        self.pairs.extend(text for _, text in pairs)
+        return [float(text.split()[1]) for _, text in pairs]
+
+
+@pytest.fixture
+def model(monkeypatch):
+    encoder = SlowCrossEncoder()
+    monkeypatch.setattr(rerank_module, "get_model", lambda name, kind=None: encoder)
+    return encoder
+
+
+def _hits(count):
+    # Vector order is the reverse of the cross-encoder's: clause 0 has the best vector score
+    return [
+        ScoredPoint(id=i, version=0, score=1.0 - i / 100, payload={"text": f"clause {i} of the tender"})
+        for i in range(count)
+    ]
+
+
+def test_rerank_orders_by_cross_encoder_and_caches_pair_scores(model):
+    cache = PairScoreCache()
+    hits = _hits(6)
+
+    reranked, stats = rerank("What is the deposit?", hits, top_k=3, budget_ms=10_000, cache=cache)
+    again, cached_stats = rerank("what is the  deposit", hits, top_k=3, budget_ms=10_000, cache=cache)
+
+    assert [hit.id for hit in reranked] == [5, 4, 3] and reranked[0].score == 5.0
+    assert (stats["scored"], stats["timed_out"], stats["reranked"]) == (6, False, 6)
+    assert [hit.id for hit in again] == [5, 4, 3]
+    assert (cached_stats["cache_hits"], cached_stats["scored"]) == (6, 0)
+    assert len(model.pairs) == 6
+    assert cache.pair_cost(rerank_module.DEFAULT_RERANK_MODEL) == pytest.approx(PAIR_SECONDS, rel=0.5)
+
+
+def test_batches_are_shrunk_to_the_budget_and_the_scored_prefix_is_kept(model):
+    cache = PairScoreCache()
+    cache.record_cost(rerank_module.DEFAULT_RERANK_MODEL, 1, PAIR_SECONDS)
+    hits = _hits(20)
+
+    reranked, stats = rerank("deposit", hits, top_k=8, budget_ms=55, batch_size=16, cache=cache)
+
+    assert stats["timed_out"] is True
+    # The first batch is cut to the ~5 pairs the budget affords instead of running all 16
+    assert 0 < stats["scored"] <= 6 and stats["reranked"] == stats["scored"]
+    prefix = stats["reranked"]
+    assert [hit.id for hit in reranked[:prefix]] == list(range(prefix - 1, -1, -1))
+    assert [hit.id for hit in reranked[prefix:]] == list(range(prefix, 8))
+    assert reranked[prefix].score == hits[prefix].score
+
+
+def test_an_exhausted_budget_scores_nothing_but_still_uses_cached_scores(model):
+    cache = PairScoreCache()
+    hits = _hits(6)
+    rerank("deposit", hits[:3], budget_ms=10_000, cache=cache)
+    scored = len(model.pairs)
+
+    reranked, stats = rerank("deposit", hits, top_k=6, budget_ms=0, cache=cache)
+
+    assert len(model.pairs) == scored
+    assert (stats["cache_hits"], stats["scored"], stats["timed_out"], stats["reranked"]) == (3, 0, True, 3)
+    assert [hit.id for hit in reranked] == [2, 1, 0, 3, 4, 5]
+
+
+def test_an_unmeasured_model_is_probed_with_one_pair(model):
+    cache = PairScoreCache()
+
+    _, stats = rerank("deposit", _hits(10), budget_ms=15, batch_size=16, cache=cache)
+
+    # One probe pair, then batches fitted to what is left of the budget
+    assert model.pairs[0] == "clause 0 of the tender"
+    assert stats["timed_out"] is True and stats["scored"] < 10
@@ -0,0 +1,174 @@
+import threading
+import pytest
+from qdrant_client.models import ScoredPoint, Filter, FieldCondition, MatchValue
+from utils.sparse_index import (
+    BM25Index, tokenize, sparse_index_path, index_points, sparse_search, get_sparse_index
+)
+from utils.retrieval import rrf_fuse, mmr_select, RRF_K
+from utils.qdrant import upload_embed_to_qdrant, search_qdrant, hybrid_search
+from utils.vector_store import open_vector_store
+from conftest import StubEncoder, make_chunks
+
+TOPICS = [
+    "The bidder shall furnish a performance bank guarantee valid for the contract period",
+    "Payment shall be released within thirty days of acceptance of the invoice",
+    "All disputes shall be referred to arbitration under the applicable act",
+]
+
+
+def _hit(point_id, score=1.0, vector=None):
+    return ScoredPoint(id=point_id, version=0, score=score, payload={"text": str(point_id)}, vector=vector)
+
+
+def test_tokenize_keeps_identifiers_whole_and_emits_parts():
+    tokens = tokenize("Clause 3.2.1 of Annexure-IV: EMD of Rs. 1,00,000 as per TN/2024/17")
+
+    assert {"3.2.1", "annexure-iv", "annexure", "iv", "100000", "tn/2024/17", "2024"} <= set(tokens)
+    assert "of" not in tokens and "as" not in tokens
+
+
+def test_bm25_ranks_exact_token_matches_first(tmp_path):
+    index = BM25Index(str(tmp_path / "c.bm25.jsonl"))
+    index.add([
+        ("a", "performance guarantee as per clause 4.1.2", {"metadata": {"source": "x"}}),
+        ("b", "performance guarantee as per clause 4.1.3", {"metadata": {"source": "x"}}),
+        ("c", "arbitration of disputes", {"metadata": {"source": "y"}}),
+    ])
+
+    assert [point_id for point_id, _, _ in index.search("clause 4.1.3", limit=3)][0] == "b"
+    assert [point_id for point_id, _, _ in index.search("disputes")] == ["c"]
+    only_x = Filter(must=[FieldCondition(key="metadata.source", match=MatchValue(value="x"))])
+    assert {point_id for point_id, _, _ in index.search("performance disputes", query_filter=only_x)} == {"a", "b"}
+
+
+def test_bm25_delete_and_round_trip(tmp_path):
+    path = str(tmp_path / "c.bm25.jsonl")
+    index = BM25Index(path)
+    index.add([(str(i), f"tender clause {i}.1 security deposit", {"n": i}) for i in range(10)])
+    index.add([("3", "replaced text about insurance", {"n": 3})])
+    assert index.delete(point_ids=["4", "missing"]) == 1
+    index.save()
+
+    loaded = BM25Index.load(path)
+
+    assert len(loaded) == 9
+    assert loaded.search("insurance")[0][:1] == ("3",)
+    assert "4" not in {point_id for point_id, _, _ in loaded.search("security deposit", limit=20)}
+    assert loaded.search("clause 7.1")[0][0] == "7"
+
+
+def test_bm25_scores_ignore_deleted_rows(tmp_path):
+    live = [("keep-1", "bank guarantee clause", {}), ("keep-2", "arbitration clause", {})]
+    live += [(f"other-{i}", f"payment schedule {i}", {}) for i in range(6)]
+    index = BM25Index(str(tmp_path / "a.bm25.jsonl"))
+    index.add(live + [(f"gone-{i}", "bank guarantee format", {}) for i in range(2)])
+    index.delete(point_ids=["gone-0", "gone-1"])
+    fresh = BM25Index(str(tmp_path / "b.bm25.jsonl"))
+    fresh.add(live)
+
+    # Still below the compaction threshold, so the deleted rows are in the postings
+    assert index.deleted
+    for query in ("bank guarantee", "arbitration clause"):
+        assert index.search(query) == pytest.approx(fresh.search(query))
+
+
+def test_rrf_fuse_scores_and_orders_by_reciprocal_rank():
+    dense = [_hit("a"), _hit("b"), _hit("c")]
+    sparse = [_hit("c"), _hit("d"), _hit("a")]
+
+    fused = rrf_fuse([dense, sparse], limit=4)
+
+    expected = {
+        "a": 1 / (RRF_K + 1) + 1 / (RRF_K + 3),
+        "c": 1 / (RRF_K + 3) + 1 / (RRF_K + 1),
+        "b": 1 / (RRF_K + 2),
+        "d": 1 / (RRF_K + 2),
+    }
+    assert {hit.id for hit in fused} == set(expected)
+    assert [hit.id for hit in fused[:2]] in (["a", "c"], ["c", "a"])
+    for hit in fused:
+        assert hit.score == pytest.approx(expected[hit.id])
+
+
+def test_rrf_fuse_keeps_the_vector_from_any_list():
+    fused = rrf_fuse([[_hit("a")], [_hit("a", vector=[1.0, 0.0])]], limit=1)
+
+    assert fused[0].vector == [1.0, 0.0]
+
+
+def test_mmr_skips_near_duplicates():
+    query = [1.0, 0.0, 0.0]
+    hits = [
+        _hit("best", vector=[1.0, 0.1, 0.0]),
+        _hit("duplicate", vector=[1.0, 0.11, 0.0]),
+        _hit("different", vector=[0.7, 0.0, 0.7]),
+    ]
+
+    assert [hit.id for hit in mmr_select(query, hits, 2, lambda_=0.5)] == ["best", "different"]
+    assert [hit.id for hit in mmr_select(query, hits, 2, lambda_=1.0)] == ["best", "duplicate"]
+
+
+@pytest.fixture
+def reference_corpus(stub_backend):
+    """Chunks that differ only in their reference number; fewer than HYBRID_FETCH_K so dense returns them all."""
+    texts = [f"Reference TN{i:03d}X: {TOPICS[i % len(TOPICS)]}." for i in range(18)]
+    embeddings = StubEncoder().encode(texts)
+    client = upload_embed_to_qdrant(
+        None, "retrieval_references", None, vector_size=embeddings.shape[1], data=make_chunks("tender", texts),
+        embeddings=embeddings, vector_backend="local"
+    )
+    return client
+
+
+def test_hybrid_search_ranks_exact_token_match_first(reference_corpus, stub_backend):
+    targets = range(18)
+
+    def top_chunk(search, i):
+        hits = search(f"TN{i:03d}X", reference_corpus, "retrieval_references", top_k=3, model_name="stub",
+                      backend=stub_backend)
+        return hits[0].payload["metadata"]["chunk_index"]
+
+    # The stub encoder ignores digits, so only BM25 can tell these chunks apart
+    assert [top_chunk(hybrid_search, i) for i in targets] == list(targets)
+    assert len({top_chunk(search_qdrant, i) for i in targets}) == 1
+
+
+def test_hybrid_search_falls_back_to_dense_without_bm25_index(stub_backend):
+    texts = [f"{TOPICS[i % len(TOPICS)]} number {i}" for i in range(12)]
+    embeddings = StubEncoder().encode(texts)
+    client = upload_embed_to_qdrant(
+        None, "retrieval_dense_only", None, vector_size=embeddings.shape[1], data=make_chunks("doc", texts),
+        embeddings=embeddings, vector_backend="local", sparse_index=False
+    )
+
+    kwargs = dict(top_k=4, model_name="stub", backend=stub_backend)
+    hybrid = hybrid_search("arbitration disputes", client, "retrieval_dense_only", **kwargs)
+    dense = search_qdrant("arbitration disputes", client, "retrieval_dense_only", **kwargs)
+
+    assert [hit.id for hit in hybrid] == [hit.id for hit in dense]
+
+
+def test_sparse_indexes_are_scoped_by_store_location(tmp_path):
+    first = open_vector_store("local", root=str(tmp_path / "first"))
+    second = open_vector_store("local", root=str(tmp_path / "second"))
+    assert sparse_index_path("shared", first.location) != sparse_index_path("shared", second.location)
+
+    index_points("shared", [("p1", "performance guarantee", {})], location=first.location)
+
+    assert [hit.id for hit in sparse_search("shared", "guarantee", location=first.location)] == ["p1"]
+    assert sparse_search("shared", "guarantee", location=second.location) == []
+
+
+def test_sparse_search_is_not_blocked_by_another_collections_writer(tmp_path):
+    location = f"local:{tmp_path}"
+    index_points("busy", [("b1", "performance guarantee", {})], location=location)
+    index_points("idle", [("i1", "performance guarantee", {})], location=location)
+    results = []
+
+    with get_sparse_index("busy", location).lock:
+        searcher = threading.Thread(target=lambda: results.append(sparse_search("idle", "guarantee", location=location)))
+        searcher.start()
+        searcher.join(timeout=5)
+
+        assert not searcher.is_alive()
+    assert [hit.id for hit in results[0]] == ["i1"]
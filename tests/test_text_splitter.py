@@ -0,0 +1,48 @@
+import random
+import pytest
+from langchain_text_splitters import RecursiveCharacterTextSplitter
+from utils.chunking import OffsetTextSplitter, DEFAULT_SEPARATORS
+
+PIECES = ["tender", "bidder", "clause", "security", "deposit", "Annexure-IV", "Rs.", "10,000", "shall", "submit"]
+SEPARATORS = [" ", " ", " ", " ", ", ", ". ", "; ", "? ", "\n", "\n\n", "\n\n\n", "  \n "]
+
+
+def _random_text(rng):
+    parts = []
+    for _ in range(rng.randint(0, 400)):
+        # Occasional long unbroken runs force the character-level split
+        parts.append("x" * rng.randint(50, 300) if rng.random() < 0.01 else rng.choice(PIECES))
+        parts.append(rng.choice(SEPARATORS))
+    return "".join(parts)
+
+
+def test_offset_splitter_matches_recursive_character_splitter():
+    for seed in range(300):
+        rng = random.Random(seed)
+        chunk_size = rng.choice([20, 50, 120, 300, 800])
+        chunk_overlap = rng.randint(0, chunk_size // 2)
+        text = _random_text(rng)
+        reference = RecursiveCharacterTextSplitter(
+            chunk_size=chunk_size, chunk_overlap=chunk_overlap, separators=DEFAULT_SEPARATORS, keep_separator=True
+        )
+        splitter = OffsetTextSplitter(chunk_size=chunk_size, chunk_overlap=chunk_overlap)
+
+        spans = splitter.split_offsets(text)
+
+        assert [text[start:end] for start, end in spans] == reference.split_text(text), f"seed {seed}"
+        assert [start for start, _ in spans] == sorted(start for start, _ in spans), f"seed {seed}"
+
+
+def test_split_offsets_of_a_slice_are_offsets_into_the_full_text():
+    text = "Preamble. " + "The bidder shall submit the form. " * 20 + "Annexure."
+    splitter = OffsetTextSplitter(chunk_size=100, chunk_overlap=20)
+
+    spans = splitter.split_offsets(text, 10, len(text) - 9)
+
+    assert spans[0][0] >= 10 and spans[-1][1] <= len(text) - 9
+    assert [text[s:e] for s, e in spans] == splitter.split_text(text[10:len(text) - 9])
+
+
+def test_overlap_larger_than_chunk_size_is_rejected():
+    with pytest.raises(ValueError):
+        OffsetTextSplitter(chunk_size=100, chunk_overlap=200)
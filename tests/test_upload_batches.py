@@ -0,0 +1,83 @@
+import time
+import threading
+import pytest
+from qdrant_client.models import PointStruct
+from utils.qdrant import upload_in_batches
+from utils.vector_store import VectorStore
+
+
+class RecordingStore(VectorStore):
+    """Records every upsert; batches whose first id is in `failures` fail that many times first."""
+
+    def __init__(self, failures=None, concurrent_writes=True, delay=0.01):
+        self.failures = dict(failures or {})
+        self.concurrent_writes = concurrent_writes
+        self.delay = delay
+        self.calls = []
+        self.stored = []
+        self.active = 0
+        self.max_active = 0
+        self._lock = threading.Lock()
+
+    def upsert(self, collection_name, points, wait=True):
+        first = points[0].id
+        with self._lock:
+            self.calls.append((first, wait))
+            self.active += 1
+            self.max_active = max(self.max_active, self.active)
+        try:
+            time.sleep(self.delay)
+            with self._lock:
+                if self.failures.get(first, 0) > 0:
+                    self.failures[first] -= 1
+                    raise ConnectionError(f"batch {first} rejected")
+                self.stored.extend(point.id for point in points)
+        finally:
+            with self._lock:
+                self.active -= 1
+
+
+def _points(count):
+    return (PointStruct(id=i, vector=[float(i), 1.0], payload={}) for i in range(count))
+
+
+def test_batches_go_out_without_waiting_and_the_last_one_is_a_barrier():
+    store = RecordingStore()
+
+    stats = upload_in_batches(store, "tenders", _points(50), batch_size=8, parallel=3, backoff=0)
+
+    assert (stats["points"], stats["batches"], stats["failed_batches"]) == (50, 7, 0)
+    assert sorted(store.stored) == list(range(50))
+    assert [wait for first, wait in store.calls if first != 48] == [False] * 6
+    # The wait=True batch is sent only after every other batch was acknowledged
+    assert store.calls[-1] == (48, True)
+    assert 1 < store.max_active <= 3
+
+
+def test_failed_batches_are_retried_and_then_counted():
+    store = RecordingStore(failures={8: 2, 16: 10, 24: 1})
+
+    stats = upload_in_batches(store, "tenders", _points(32), batch_size=8, parallel=2, retries=3, backoff=0)
+
+    assert (stats["points"], stats["failed_batches"], stats["failed_points"]) == (24, 1, 8)
+    assert sorted(store.stored) == [i for i in range(32) if not 16 <= i < 24]
+    assert sum(first == 8 for first, _ in store.calls) == 3
+    assert sum(first == 16 for first, _ in store.calls) == 4
+    assert store.calls[-1] == (24, True)
+
+
+def test_a_failing_final_batch_is_reported():
+    store = RecordingStore(failures={16: 5})
+
+    stats = upload_in_batches(store, "tenders", _points(20), batch_size=8, retries=1, backoff=0)
+
+    assert (stats["points"], stats["failed_batches"], stats["failed_points"]) == (16, 1, 4)
+
+
+def test_stores_without_concurrent_writes_get_one_request_at_a_time():
+    store = RecordingStore(concurrent_writes=False)
+
+    stats = upload_in_batches(store, "tenders", _points(40), batch_size=5, parallel=4, backoff=0)
+
+    assert stats["points"] == 40 and store.max_active == 1
+    assert [first for first, _ in store.calls] == list(range(0, 40, 5))
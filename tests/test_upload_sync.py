@@ -0,0 +1,110 @@
+import uuid
+import pytest
+from qdrant_client import QdrantClient
+from utils import qdrant
+from utils.qdrant import upload_embed_to_qdrant, point_id
+from utils.sparse_index import count_points
+from utils.vector_store import QdrantVectorStore
+from conftest import StubEncoder, make_chunks
+
+TEXTS = [f"Section {i}: the contractor shall maintain records of item {chr(97 + i)} for audit." for i in range(10)]
+
+
+@pytest.fixture(params=["local", "qdrant"])
+def upload(request, monkeypatch):
+    """Uploads chunks to a fresh collection of the local store or an in-memory Qdrant; returns (upload, collection name)."""
+    backend = request.param
+    if backend == "qdrant":
+        store = QdrantVectorStore(QdrantClient(":memory:"))
+        monkeypatch.setattr(qdrant, "open_vector_store", lambda *args, **kwargs: store)
+    name = f"sync_{backend}_{uuid.uuid4().hex[:8]}"
+
+    def run(chunks, mode="sync", upload_stats=None):
+        return upload_embed_to_qdrant(
+            None, name, None, vector_size=StubEncoder().get_sentence_embedding_dimension(), mode=mode,
+            data=chunks, embeddings=StubEncoder().encode([chunk["text"] for chunk in chunks]),
+            upload_stats=upload_stats, vector_backend=backend
+        )
+
+    return run, name
+
+
+def _stored_ids(store, name):
+    return {str(record.id) for record in store.scroll(name)}
+
+
+def _ids(chunks):
+    return {point_id(chunk["metadata"], chunk["text"]) for chunk in chunks}
+
+
+def test_point_id_is_deterministic_and_scoped_by_source():
+    [first] = make_chunks("a.pdf", TEXTS[:1])
+    [again] = make_chunks("a.pdf", TEXTS[:1])
+    [other] = make_chunks("b.pdf", TEXTS[:1])
+
+    assert point_id(first["metadata"], first["text"]) == point_id(again["metadata"], again["text"])
+    assert point_id(first["metadata"], first["text"]) != point_id(other["metadata"], other["text"])
+    assert point_id(first["metadata"], first["text"]) != point_id(first["metadata"], first["text"] + " ")
+
+
+def test_sync_skips_unchanged_and_deletes_stale_ids(upload):
+    run, name = upload
+    original = make_chunks("doc.pdf", TEXTS)
+    store = run(original)
+
+    stats = {}
+    run(original, upload_stats=stats)
+    assert (stats["points"], stats["skipped_points"], stats["deleted_points"]) == (0, 10, 0)
+
+    # Editing chunk 8 shifts the offsets of chunk 9 too: two new ids, two stale ones
+    edited = make_chunks("doc.pdf", TEXTS[:8] + ["Section 8: records are kept for seven years."] + TEXTS[9:])
+    stats = {}
+    run(edited, upload_stats=stats)
+
+    assert (stats["points"], stats["skipped_points"], stats["deleted_points"]) == (2, 8, 2)
+    assert _stored_ids(store, name) == _ids(edited)
+    assert count_points(name, location=store.location) == 10
+
+
+def test_sync_leaves_other_sources_alone(upload):
+    run, name = upload
+    other = make_chunks("other.pdf", TEXTS[:3])
+    run(other)
+    doc = make_chunks("doc.pdf", TEXTS)
+    run(doc)
+
+    store = run(doc[:6])
+
+    assert _stored_ids(store, name) == _ids(other) | _ids(doc[:6])
+
+
+def test_append_keeps_stale_ids(upload):
+    run, name = upload
+    doc = make_chunks("doc.pdf", TEXTS)
+    run(doc)
+    shortened = make_chunks("doc.pdf", ["A new preamble."] + TEXTS[1:])
+
+    stats = {}
+    store = run(shortened, mode="append", upload_stats=stats)
+
+    assert stats["deleted_points"] == 0
+    assert _stored_ids(store, name) == _ids(doc) | _ids(shortened)
+
+
+def test_replace_reuploads_every_chunk(upload):
+    run, name = upload
+    doc = make_chunks("doc.pdf", TEXTS)
+    run(doc)
+
+    stats = {}
+    store = run(doc[:7], mode="replace", upload_stats=stats)
+
+    assert (stats["points"], stats["skipped_points"], stats["deleted_points"]) == (7, 0, 3)
+    assert _stored_ids(store, name) == _ids(doc[:7])
+    assert count_points(name, location=store.location) == 7
+
+
+def test_unknown_mode_is_rejected(upload):
+    run, _ = upload
+    with pytest.raises(ValueError):
+        run(make_chunks("doc.pdf", TEXTS), mode="merge")
@@ -0,0 +1,75 @@
+import os
+import uuid
+import numpy as np
+import pytest
+from utils.records import write_vectors, load_vectors, vectors_path, read_records
+from utils.save_to_json import save_json_runnable
+from utils.qdrant import load_embed_artifact, upload_embed_to_qdrant
+from conftest import STUB_DIM, StubEncoder, make_chunks
+
+TEXTS = [f"Clause {i}: the bidder shall submit document {chr(97 + i)} with the bid." for i in range(6)]
+
+
+@pytest.fixture
+def embedded():
+    chunks = make_chunks("tender.pdf", TEXTS)
+    return chunks, StubEncoder().encode(TEXTS)
+
+
+def test_vectors_are_saved_as_a_memory_mapped_npy(tmp_path, embedded):
+    _, embeddings = embedded
+    path = str(tmp_path / "embed.npy")
+
+    assert write_vectors(embeddings, path) == len(TEXTS)
+    loaded = load_vectors(path)
+
+    assert isinstance(loaded, np.memmap) and loaded.dtype == np.float32
+    np.testing.assert_array_equal(loaded, embeddings)
+    assert not os.path.exists(path + ".tmp")
+    assert vectors_path(str(tmp_path / "embed.jsonl")) == str(tmp_path / "embed.vectors.npy")
+
+
+def test_float16_halves_the_file(tmp_path, embedded):
+    _, embeddings = embedded
+    write_vectors(embeddings, str(tmp_path / "f32.npy"))
+    write_vectors(embeddings, str(tmp_path / "f16.npy"), dtype="float16")
+
+    half = load_vectors(str(tmp_path / "f16.npy"))
+    assert half.dtype == np.float16
+    np.testing.assert_allclose(half, embeddings, atol=1e-3)
+    assert os.path.getsize(tmp_path / "f16.npy") < 0.6 * os.path.getsize(tmp_path / "f32.npy")
+    with pytest.raises(ValueError):
+        write_vectors(embeddings, str(tmp_path / "x.npy"), dtype="int8")
+
+
+def test_save_stage_keeps_vectors_out_of_the_records_unless_asked(tmp_path, embedded):
+    chunks, embeddings = embedded
+    binary_path, legacy_path = str(tmp_path / "binary.jsonl"), str(tmp_path / "legacy.jsonl")
+
+    binary = save_json_runnable().invoke({"embed_data": chunks, "embeddings": embeddings, "embed_json_path": binary_path})
+    legacy = save_json_runnable().invoke(
+        {"embed_data": chunks, "embeddings": embeddings, "embed_json_path": legacy_path, "vector_format": "json"}
+    )
+
+    assert binary["embed_vectors_path"] == vectors_path(binary_path)
+    assert "embedding" not in read_records(binary_path)[0]
+    assert legacy["embed_vectors_path"] is None and not os.path.exists(vectors_path(legacy_path))
+    assert read_records(legacy_path)[0]["embedding"] == pytest.approx(embeddings[0].tolist())
+    # Both layouts load back to the same records and vectors
+    data, vectors = load_embed_artifact(binary_path)
+    legacy_data = read_records(legacy_path)
+    assert data == chunks and vectors.shape == (len(TEXTS), STUB_DIM)
+    np.testing.assert_allclose(vectors, [record["embedding"] for record in legacy_data], atol=1e-6)
+
+
+def test_upload_reads_vectors_from_the_artifact(tmp_path, embedded):
+    chunks, embeddings = embedded
+    path = str(tmp_path / "embed.jsonl")
+    save_json_runnable().invoke({"embed_data": chunks, "embeddings": embeddings, "embed_json_path": path})
+    collection = f"artifact_{uuid.uuid4().hex[:8]}"
+
+    client = upload_embed_to_qdrant(path, collection, None, vector_size=STUB_DIM, vector_backend="local")
+
+    assert client.count(collection).count == len(TEXTS)
+    hit = client.search(collection, embeddings[3].tolist(), limit=1)[0]
+    assert hit.payload["text"] == TEXTS[3]
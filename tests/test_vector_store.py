@@ -0,0 +1,111 @@
+import numpy as np
+import pytest
+from qdrant_client.models import (
+    VectorParams, Distance, PointStruct, Filter, FieldCondition, MatchValue, Range, FilterSelector, PointIdsList
+)
+from utils import vector_store
+from utils.vector_store import LocalVectorStore
+
+
+def _points(vectors, source="doc", start=0):
+    return [
+        PointStruct(
+            id=start + i,
+            vector=vector.tolist(),
+            payload={"text": f"chunk {start + i}", "metadata": {"source": source, "page_number": (start + i) // 10 + 1}}
+        )
+        for i, vector in enumerate(vectors)
+    ]
+
+
+def _exact_top(vectors, query, limit):
+    normed = vectors / np.linalg.norm(vectors, axis=1, keepdims=True)
+    return list(np.argsort(-(normed @ (query / np.linalg.norm(query))))[:limit])
+
+
+@pytest.fixture
+def store(tmp_path):
+    store = LocalVectorStore(str(tmp_path / "store"))
+    store.create_collection("docs", VectorParams(size=16, distance=Distance.COSINE))
+    return store
+
+
+def test_search_returns_exact_cosine_order(store):
+    vectors = np.random.default_rng(0).standard_normal((200, 16)).astype(np.float32)
+    store.upsert("docs", _points(vectors))
+    query = vectors[17] + 0.05
+
+    hits = store.search("docs", query.tolist(), limit=5)
+
+    assert [hit.id for hit in hits] == _exact_top(vectors, query, 5)
+    assert hits[0].payload["text"] == "chunk 17"
+    assert hits[0].score == pytest.approx(max(hit.score for hit in hits))
+
+
+def test_filters_count_delete_and_scroll(store):
+    vectors = np.random.default_rng(1).standard_normal((60, 16)).astype(np.float32)
+    store.upsert("docs", _points(vectors[:30], source="a") + _points(vectors[30:], source="b", start=30))
+    only_b = Filter(must=[FieldCondition(key="metadata.source", match=MatchValue(value="b"))])
+
+    hits = store.search("docs", vectors[3].tolist(), limit=10, query_filter=only_b)
+    assert hits and all(hit.payload["metadata"]["source"] == "b" for hit in hits)
+    assert store.count("docs", count_filter=only_b).count == 30
+
+    first_pages = Filter(must=[
+        FieldCondition(key="metadata.source", match=MatchValue(value="b")),
+        FieldCondition(key="metadata.page_number", range=Range(lte=4)),
+    ])
+    store.delete("docs", FilterSelector(filter=first_pages))
+    store.delete("docs", PointIdsList(points=[0, 1]))
+
+    assert store.count("docs").count == 60 - 10 - 2
+    assert {record.id for record in store.scroll("docs", scroll_filter=only_b)} == set(range(40, 60))
+    assert [record.id for record in store.retrieve("docs", [0, 2, 35])] == [2]
+
+
+def test_upsert_overwrites_existing_id(store):
+    vectors = np.random.default_rng(2).standard_normal((10, 16)).astype(np.float32)
+    store.upsert("docs", _points(vectors))
+    store.upsert("docs", [PointStruct(id=4, vector=(-vectors[4]).tolist(), payload={"text": "replaced"})])
+
+    assert store.count("docs").count == 10
+    [record] = store.retrieve("docs", [4], with_vectors=True)
+    assert record.payload == {"text": "replaced"}
+    np.testing.assert_allclose(record.vector, -vectors[4] / np.linalg.norm(vectors[4]), rtol=1e-5, atol=1e-6)
+
+
+def test_round_trip_through_save_and_load(tmp_path):
+    root = str(tmp_path / "persisted")
+    vectors = np.random.default_rng(3).standard_normal((120, 16)).astype(np.float32)
+    store = LocalVectorStore(root)
+    store.create_collection("docs", VectorParams(size=16, distance=Distance.COSINE))
+    store.upsert("docs", _points(vectors), wait=False)
+    store.delete("docs", PointIdsList(points=[5, 6]), wait=False)
+    query = vectors[42].tolist()
+    before = [(hit.id, hit.payload) for hit in store.search("docs", query, limit=8)]
+    store.flush()
+
+    reopened = LocalVectorStore(root)
+
+    assert reopened.collection_exists("docs")
+    assert reopened.vectors_config("docs").size == 16
+    assert reopened.count("docs").count == 118
+    assert [(hit.id, hit.payload) for hit in reopened.search("docs", query, limit=8)] == before
+    assert not reopened.retrieve("docs", [5, 6])
+
+
+def test_graph_index_recall_on_large_collection(store, monkeypatch):
+    # Force the kNN graph path, which normally starts at 50k points
+    monkeypatch.setattr(vector_store, "EXACT_SEARCH_LIMIT", 500)
+    rng = np.random.default_rng(4)
+    centers = rng.standard_normal((30, 16))
+    vectors = (centers[rng.integers(30, size=4000)] + 0.3 * rng.standard_normal((4000, 16))).astype(np.float32)
+    store.upsert("docs", _points(vectors))
+
+    recalls = []
+    for query in vectors[rng.choice(4000, size=50, replace=False)] + 0.05:
+        found = {hit.id for hit in store.search("docs", query.tolist(), limit=10)}
+        recalls.append(len(found & set(_exact_top(vectors, query, 10))) / 10)
+
+    assert store._collections["docs"].graph is not None
+    assert np.mean(recalls) >= 0.9